@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+
+import typer
+
+import server
+
+cli = typer.Typer(help="Maintenance commands for the Shree Krishna Nursery backend")
+
+
+@cli.callback()
+def main():
+    """Commands run against MONGO_URL/DB_NAME from backend/.env"""
+
+
+def run(coro):
+    async def runner():
+        try:
+            return await coro
+        finally:
+            server.client.close()
+    return asyncio.run(runner())
+
+
+@cli.command()
+def reconcile_analytics(dry_run: bool = typer.Option(False, help="Report drift without rewriting the rollups")):
+    """Rebuild analytics_rollups from bills and plants"""
+    report = run(server.reconcile_dashboard_rollups(apply=not dry_run))
+    typer.echo(json.dumps(report, indent=2, default=str))
+    if report["drift"] and dry_run:
+        raise typer.Exit(code=1)
+
+
+@cli.command()
+def backfill_search_keys():
+    """Add search_terms/phone_keys to plants, customers, bills and quotations missing them"""
+    run(server.backfill_search_keys())
+    typer.echo("Search keys backfilled")
+
+
+@cli.command()
+def seed_opening_ledger():
+    """Add an opening stock_ledger entry for plants created before the ledger existed"""
+    seeded = run(server.seed_opening_ledger(force=True))
+    typer.echo(f"{seeded} opening ledger entries added")
+
+
+@cli.command()
+def refresh_names():
+    """Rewrite customer/plant names copied into bills and quotations for queued renames"""
+    finished = run(server.name_refresher.drain())
+    typer.echo(f"{finished} name refresh jobs finished")
+
+
+@cli.command()
+def backfill_sales_rollups(restart: bool = typer.Option(False, help="Empty the rollups and rebuild from the first month instead of resuming")):
+    """Rebuild sales_daily/sales_monthly from bills, resuming after the last finished month"""
+    state = run(server.backfill_sales_rollups(restart=restart))
+    typer.echo(json.dumps(state, indent=2, default=str))
+
+
+def import_file(collection_name, path, fmt):
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        rows = server.iter_import_rows(stream, server.import_format(path, fmt))
+        report = run(server.import_records(collection_name, rows, user_id="cli"))
+    typer.echo(json.dumps(report, indent=2, default=str))
+
+
+async def export_file(collection_name, path, fmt):
+    with open(path, "w", encoding="utf-8", newline="") as stream:
+        async for chunk in server.export_chunks(collection_name, fmt):
+            stream.write(chunk)
+
+
+@cli.command()
+def import_plants(path: str, format: str = typer.Option(None, help="csv or ndjson; defaults to the file extension")):
+    """Upsert plants from a CSV/NDJSON file, deduplicated on name + location"""
+    import_file("plants", path, format)
+
+
+@cli.command()
+def import_customers(path: str, format: str = typer.Option(None, help="csv or ndjson; defaults to the file extension")):
+    """Upsert customers from a CSV/NDJSON file, deduplicated on phone number"""
+    import_file("customers", path, format)
+
+
+@cli.command()
+def export_plants(path: str, format: str = typer.Option(None, help="csv or ndjson; defaults to the file extension")):
+    """Stream all plants to a CSV/NDJSON file"""
+    run(export_file("plants", path, server.import_format(path, format)))
+
+
+@cli.command()
+def export_customers(path: str, format: str = typer.Option(None, help="csv or ndjson; defaults to the file extension")):
+    """Stream all customers to a CSV/NDJSON file"""
+    run(export_file("customers", path, server.import_format(path, format)))
+
+
+@cli.command()
+def serve(
+    host: str = typer.Option("0.0.0.0"),
+    port: int = typer.Option(8001),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Worker processes, one event loop and Motor pool each"),
+    bus: str = typer.Option(None, help="Cache invalidation bus: local, mongo or changestream; defaults to mongo with several workers"),
+):
+    """Serve the API with several uvicorn workers sharing cache invalidations"""
+    import uvicorn
+
+    # Workers are fresh processes that import server.py with these settings
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    os.environ["INVALIDATION_BUS"] = bus or os.environ.get("INVALIDATION_BUS") or ("mongo" if workers > 1 else "local")
+    if workers > 1 and os.environ["INVALIDATION_BUS"] == "local":
+        raise typer.BadParameter("several workers need the mongo or changestream bus", param_hint="--bus")
+    if workers > 1 and os.environ.get("LIVE_EVENTS_SOURCE") == "local":
+        raise typer.BadParameter("several workers need LIVE_EVENTS_SOURCE=bus or changestream, or unset")
+    uvicorn.run("server:app", host=host, port=port, workers=workers)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,24 +1,337 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, CursorType, IndexModel, ReturnDocument, UpdateMany, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
 import os
+import re
+import asyncio
 import logging
+import time
+import base64
+import csv
+import io
+import json
+import threading
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import List, Optional, Dict, Any, Generic, TypeVar, Union, Iterator, AsyncIterator, Tuple, TextIO
 import uuid
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 import jwt
+import orjson
 from passlib.context import CryptContext
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Request Metrics
+# SERVER_TIMING=1 adds a Server-Timing header splitting each response into app and Mongo time
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+# When set, /api/metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestStats:
+    """Mongo work done on behalf of one HTTP request"""
+    __slots__ = ("mongo_seconds", "mongo_commands", "mongo_documents")
+
+    def __init__(self):
+        self.mongo_seconds = 0.0
+        self.mongo_commands = 0
+        self.mongo_documents = 0
+
+    def server_timing(self, total_seconds: float) -> bytes:
+        app_ms = max(total_seconds - self.mongo_seconds, 0.0) * 1000
+        mongo_ms = self.mongo_seconds * 1000
+        return f'app;dur={app_ms:.1f}, mongo;dur={mongo_ms:.1f};desc="{self.mongo_commands} commands"'.encode()
+
+# Motor runs commands on executor threads with a copy of the caller's context,
+# so the command listener sees the RequestStats of the request that issued them
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+def metric_labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+class MetricsRegistry:
+    """Process-wide request and Mongo command metrics, rendered in Prometheus text format"""
+    def __init__(self):
+        # Command events arrive on Motor's executor threads
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.response_bytes: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.mongo_seconds: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.mongo_commands: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.mongo_documents: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.commands: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.command_failures: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float, size: int, stats: RequestStats):
+        key = (method, route)
+        with self.lock:
+            self.requests[(method, route, status_code)] += 1
+            self.latency[key].observe(seconds)
+            self.response_bytes[key] += size
+            self.mongo_seconds[key] += stats.mongo_seconds
+            self.mongo_commands[key] += stats.mongo_commands
+            self.mongo_documents[key] += stats.mongo_documents
+
+    def observe_command(self, command: str, collection: str, seconds: float, failed: bool):
+        with self.lock:
+            self.commands[(command, collection)].observe(seconds)
+            if failed:
+                self.command_failures[(command, collection)] += 1
+
+    def render(self) -> str:
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        def histogram(name, help_text, histograms, label_names):
+            samples = []
+            for key, hist in sorted(histograms.items()):
+                labels = dict(zip(label_names, key))
+                cumulative = 0
+                for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    samples.append(f"{name}_bucket{metric_labels(**labels, le=le)} {cumulative}")
+                samples.append(f"{name}_sum{metric_labels(**labels)} {hist.sum}")
+                samples.append(f"{name}_count{metric_labels(**labels)} {cumulative}")
+            metric(name, "histogram", help_text, samples)
+
+        def per_route(name, kind, help_text, values):
+            metric(name, kind, help_text, [
+                f"{name}{metric_labels(method=method, route=route)} {value}"
+                for (method, route), value in sorted(values.items())
+            ])
+
+        with self.lock:
+            metric("http_requests_in_flight", "gauge", "Requests currently being served", [f"http_requests_in_flight {self.in_flight}"])
+            metric("http_requests_total", "counter", "Requests by route and status", [
+                f"http_requests_total{metric_labels(method=method, route=route, status=code)} {count}"
+                for (method, route, code), count in sorted(self.requests.items())
+            ])
+            histogram("http_request_duration_seconds", "Request latency by route", self.latency, ("method", "route"))
+            per_route("http_response_size_bytes_total", "counter", "Response body bytes by route", self.response_bytes)
+            per_route("mongo_request_seconds_total", "counter", "Mongo command time spent serving each route", self.mongo_seconds)
+            per_route("mongo_request_commands_total", "counter", "Mongo commands issued while serving each route", self.mongo_commands)
+            per_route("mongo_request_documents_total", "counter", "Documents returned or written by Mongo while serving each route", self.mongo_documents)
+            histogram("mongo_command_duration_seconds", "Mongo command latency", self.commands, ("command", "collection"))
+            metric("mongo_command_failures_total", "counter", "Failed Mongo commands", [
+                f"mongo_command_failures_total{metric_labels(command=command, collection=collection)} {count}"
+                for (command, collection), count in sorted(self.command_failures.items())
+            ])
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self.collections: Dict[int, str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        self.collections[event.request_id] = target if isinstance(target, str) else event.command.get("collection", "")
+
+    def succeeded(self, event):
+        documents = 0
+        reply = event.reply
+        cursor = reply.get("cursor")
+        if isinstance(cursor, dict):
+            documents = len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+        elif isinstance(reply.get("n"), int):
+            documents = reply["n"]
+        self._record(event, documents, failed=False)
+
+    def failed(self, event):
+        self._record(event, 0, failed=True)
+
+    def _record(self, event, documents: int, failed: bool):
+        seconds = event.duration_micros / 1_000_000
+        collection = self.collections.pop(event.request_id, "")
+        metrics.observe_command(event.command_name, collection, seconds, failed)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.mongo_seconds += seconds
+            stats.mongo_commands += 1
+            stats.mongo_documents += documents
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every request; pure ASGI so streamed responses pass through untouched"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing(time.perf_counter() - start)))
+                    headers.append((b"timing-allow-origin", b"*"))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            metrics.in_flight -= 1
+            current_request_stats.reset(token)
+            # Route templates keep label cardinality bounded; unrouted paths share one label
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            metrics.observe_request(scope["method"], route_path, status_code, time.perf_counter() - start, size, stats)
+
+# Query Plan Capture
+# Debug mode: QUERY_PLAN_CAPTURE=1 records every distinct query shape so it can be explained;
+# QUERY_PLAN_REPORT names a JSON file the report is written to on shutdown
+QUERY_PLAN_CAPTURE = os.environ.get('QUERY_PLAN_CAPTURE', '').lower() in ('1', 'true', 'yes')
+QUERY_PLAN_REPORT = os.environ.get('QUERY_PLAN_REPORT')
+QUERY_PLAN_MAX_SHAPES = 500
+# Flag plans examining more than this many documents per document returned
+QUERY_PLAN_RATIO_THRESHOLD = float(os.environ.get('QUERY_PLAN_RATIO_THRESHOLD', '10'))
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Session and write-concern fields explain rejects or that do not affect the plan
+UNEXPLAINABLE_FIELDS = {
+    "lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "readConcern",
+    "writeConcern", "startTransaction", "autocommit", "signature",
+}
+
+def query_shape(value):
+    """The structure of a filter, sort or pipeline with literal values replaced by their type"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, (dict, list, tuple)) for item in value):
+            return [query_shape(item) for item in value]
+        kinds = sorted({query_shape(item) for item in value})
+        return f"<list:{','.join(kinds)}>"
+    if isinstance(value, bool):
+        return "<bool>"
+    if isinstance(value, (int, float)):
+        return "<number>"
+    if value is None:
+        return "<null>"
+    if isinstance(value, str):
+        return "<str>"
+    if isinstance(value, datetime):
+        return "<date>"
+    return f"<{type(value).__name__.lower()}>"
+
+def command_statements(command: dict, name: str) -> List[Tuple[dict, dict]]:
+    """(shape, explainable command) pairs; batched writes yield one per statement"""
+    base = {key: value for key, value in command.items() if key not in UNEXPLAINABLE_FIELDS}
+    if name in ("update", "delete"):
+        field = "updates" if name == "update" else "deletes"
+        statements = []
+        for statement in base.pop(field, []):
+            shape = {"q": query_shape(statement.get("q"))}
+            if name == "update":
+                shape["multi"] = statement.get("multi", False)
+            statements.append((shape, {**base, field: [statement]}))
+        return statements
+    shape = {
+        key: query_shape(value)
+        for key, value in base.items()
+        if key not in (name, "update", "new", "upsert", "limit", "skip", "batchSize", "cursor")
+    }
+    if name in ("find", "findAndModify"):
+        # Sort and projection specs are structure, not literals
+        for key in ("sort", "projection", "fields"):
+            if key in base:
+                shape[key] = base[key]
+    if name == "aggregate":
+        base["cursor"] = {}
+    return [(shape, base)]
+
+class QueryPlanRecorder(monitoring.CommandListener):
+    """Keeps one example command per distinct (collection, command, shape) for explain()"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shapes: Dict[str, Dict[str, Any]] = {}
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        for shape, command in command_statements(dict(event.command), event.command_name):
+            key = f"{collection}.{event.command_name} {json.dumps(shape, default=str)}"
+            with self.lock:
+                entry = self.shapes.get(key)
+                if entry is not None:
+                    entry["calls"] += 1
+                elif len(self.shapes) < QUERY_PLAN_MAX_SHAPES:
+                    self.shapes[key] = {
+                        "collection": collection,
+                        "command": event.command_name,
+                        "shape": shape,
+                        "example": command,
+                        "calls": 1,
+                    }
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return {key: dict(entry) for key, entry in self.shapes.items()}
+
+query_plans = QueryPlanRecorder()
+
 # MongoDB connection
+# Every uvicorn/gunicorn worker opens its own pool; by default they split a budget of 100 connections
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', str(max(10, 100 // WEB_CONCURRENCY))))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+command_listeners = [MongoCommandMetrics()] + ([query_plans] if QUERY_PLAN_CAPTURE else [])
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=command_listeners,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+)
 db = client[os.environ['DB_NAME']]
 
 # Security
@@ -29,6 +342,69 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Bill/quotation numbers reserved per worker in one round-trip
+SEQUENCE_BLOCK_SIZE = int(os.environ.get('SEQUENCE_BLOCK_SIZE', '10'))
+
+# Authenticated users kept in-process between requests
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+USER_CACHE_MAXSIZE = int(os.environ.get('USER_CACHE_MAXSIZE', '1024'))
+# Plant names and selling prices used to price bill/quotation lines
+PRICE_CACHE_TTL_SECONDS = float(os.environ.get('PRICE_CACHE_TTL_SECONDS', '300'))
+PRICE_CACHE_MAXSIZE = int(os.environ.get('PRICE_CACHE_MAXSIZE', '4096'))
+# local (single worker), mongo (capped collection) or changestream (replica sets only)
+INVALIDATION_BUS = os.environ.get('INVALIDATION_BUS', 'local')
+INVALIDATION_LOG_BYTES = 1024 * 1024
+
+# Most bills one bulk approve/reject call will touch
+BULK_BILL_LIMIT = 5000
+
+# Renamed customer/plant names copied into bills and quotations, rewritten in throttled batches
+NAME_REFRESH_BATCH_SIZE = int(os.environ.get('NAME_REFRESH_BATCH_SIZE', '500'))
+NAME_REFRESH_THROTTLE_SECONDS = float(os.environ.get('NAME_REFRESH_THROTTLE_SECONDS', '0.1'))
+NAME_REFRESH_LEASE_SECONDS = 60
+NAME_REFRESH_POLL_SECONDS = 30
+
+# Largest page served by cursor pagination
+MAX_PAGE_SIZE = 100
+
+# Documents fetched per collection before ranking search results
+SEARCH_CANDIDATES = 50
+
+# Rows validated and written per bulk_write during imports/exports
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+
+# Chatbot: LLM_BACKEND=fake answers locally without calling Gemini
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+FAKE_LLM_DELAY_SECONDS = float(os.environ.get('FAKE_LLM_DELAY_SECONDS', '0'))
+CHAT_CLIENT_POOL_SIZE = int(os.environ.get('CHAT_CLIENT_POOL_SIZE', '256'))
+CHAT_CLIENT_IDLE_SECONDS = float(os.environ.get('CHAT_CLIENT_IDLE_SECONDS', '900'))
+AI_CONTEXT_TTL_SECONDS = float(os.environ.get('AI_CONTEXT_TTL_SECONDS', '60'))
+
+# Live updates: "local" publishes from this worker's own writes; "bus" sends them over the cache
+# invalidation bus and "changestream" watches bills and plants (replica sets only), so every
+# worker sees every write. Several workers sharing a bus default to "bus".
+LIVE_EVENTS_SOURCE = os.environ.get('LIVE_EVENTS_SOURCE', 'local' if INVALIDATION_BUS == 'local' else 'bus')
+LIVE_QUEUE_SIZE = 256
+LIVE_KEEPALIVE_SECONDS = 15
+# Answers to general plant-care questions are reused; an embedding model name enables near-duplicate matching
+CHAT_CACHE_MAXSIZE = int(os.environ.get('CHAT_CACHE_MAXSIZE', '1000'))
+CHAT_CACHE_TTL_SECONDS = float(os.environ.get('CHAT_CACHE_TTL_SECONDS', '86400'))
+CHAT_CACHE_EMBEDDING_MODEL = os.environ.get('CHAT_CACHE_EMBEDDING_MODEL', '')
+CHAT_CACHE_SIMILARITY = float(os.environ.get('CHAT_CACHE_SIMILARITY', '0.92'))
+# Chat history keeps the newest CHAT_HISTORY_MAX_MESSAGES turns per session, trimmed once it is
+# CHAT_HISTORY_TRIM_BATCH turns over; sessions idle for CHAT_SESSION_TTL_DAYS expire with their history
+CHAT_HISTORY_PAGE_SIZE = 20
+CHAT_HISTORY_MAX_MESSAGES = int(os.environ.get('CHAT_HISTORY_MAX_MESSAGES', '200'))
+CHAT_HISTORY_TRIM_BATCH = 20
+CHAT_SESSION_TTL_DAYS = int(os.environ.get('CHAT_SESSION_TTL_DAYS', '90'))
+CHAT_EXPIRY_CHECK_SECONDS = 3600
+CHAT_EXPIRY_BATCH = 500
+
+# bcrypt runs off the event loop; concurrency caps how many hashes run at once
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', str(PASSWORD_HASH_WORKERS)))
+
 # Create the main app without a prefix
 app = FastAPI(title="Shree Krishna Nursery Management System")
 
@@ -36,12 +412,226 @@ app = FastAPI(title="Shree Krishna Nursery Management System")
 api_router = APIRouter(prefix="/api")
 
 # Utility Functions
+class TTLCache:
+    """Small LRU cache whose entries also expire after `ttl` seconds"""
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+
+    def get(self, key):
+        value = self.peek(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def peek(self, key):
+        """get() without touching the hit/miss counters"""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] >= time.monotonic()
+
+    def __len__(self):
+        return len(self._data)
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class InvalidationBus:
+    """Fans cache invalidations out to every worker.
+
+    Handlers run in the publishing worker immediately. With INVALIDATION_BUS=mongo (tailable
+    cursor on a capped collection, works on standalone servers) or changestream (needs a
+    replica set), other workers receive them from the cache_invalidations collection.
+    A handler called with key None drops everything for its topic; that also happens after
+    the listener reconnects, since invalidations may have been missed meanwhile.
+    """
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.worker_id = uuid.uuid4().hex
+        self.handlers: Dict[str, List[Any]] = defaultdict(list)
+        self.published = 0
+        self.received = 0
+        self.reconnects = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, topic: str, handler):
+        self.handlers[topic].append(handler)
+
+    def deliver(self, topic: str, key: Optional[str] = None):
+        for handler in self.handlers[topic]:
+            handler(key)
+
+    def deliver_all(self):
+        for topic in self.handlers:
+            self.deliver(topic)
+
+    async def publish(self, topic: str, key: Optional[str] = None):
+        self.deliver(topic, key)
+        self.published += 1
+        if self.backend == "local":
+            return
+        try:
+            await db.cache_invalidations.insert_one({
+                "topic": topic, "key": key, "origin": self.worker_id, "at": datetime.now(timezone.utc)
+            })
+        except Exception as e:
+            # Other workers fall back to their cache TTLs
+            logger.error(f"Could not publish {topic} invalidation: {str(e)}")
+
+    def receive(self, message: dict):
+        if message.get("origin") != self.worker_id:
+            self.received += 1
+            self.deliver(message["topic"], message.get("key"))
+
+    async def start(self):
+        if self.backend == "local":
+            if WEB_CONCURRENCY > 1:
+                logger.warning("WEB_CONCURRENCY > 1 with INVALIDATION_BUS=local: workers will serve stale cached data")
+            return
+        try:
+            await db.create_collection("cache_invalidations", capped=True, size=INVALIDATION_LOG_BYTES)
+        except CollectionInvalid:
+            pass
+        self._task = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def listen(self):
+        since = datetime.now(timezone.utc)
+        while True:
+            try:
+                if self.backend == "changestream":
+                    await self._watch()
+                else:
+                    since = await self._tail(since)
+                    # A tailable cursor dies while nothing matches it yet; reopen shortly
+                    await asyncio.sleep(0.5)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener disconnected: {str(e)}")
+                await asyncio.sleep(1)
+            self.reconnects += 1
+            self.deliver_all()
+
+    async def _tail(self, since: datetime) -> datetime:
+        cursor = db.cache_invalidations.find({"at": {"$gte": since}}, cursor_type=CursorType.TAILABLE_AWAIT)
+        async for message in cursor:
+            # Redelivering a same-millisecond message on reopen is harmless
+            since = message["at"]
+            self.receive(message)
+        return since
+
+    async def _watch(self):
+        async with db.cache_invalidations.watch([{"$match": {"operationType": "insert"}}]) as stream:
+            async for change in stream:
+                self.receive(change["fullDocument"])
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "worker_id": self.worker_id,
+            "published": self.published,
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+cache_bus = InvalidationBus(INVALIDATION_BUS)
+
+user_cache = TTLCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL_SECONDS)
+cache_bus.subscribe("users", lambda username: user_cache.clear() if username is None else user_cache.pop(username))
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool so logins never block the event loop"""
+    def __init__(self, workers: int, concurrency: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.workers = workers
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.queued = 0
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+
+    async def _run(self, fn, *args):
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        waiting = True
+        try:
+            async with self._semaphore:
+                self.queued -= 1
+                waiting = False
+                self.in_flight += 1
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+                finally:
+                    self.in_flight -= 1
+                    self.completed += 1
+        finally:
+            if waiting:
+                self.queued -= 1
+
+    async def hash(self, password):
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password, hashed_password):
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "concurrency": self.concurrency,
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+        }
+
+password_hasher = PasswordHasher(workers=PASSWORD_HASH_WORKERS, concurrency=PASSWORD_HASH_CONCURRENCY)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -60,13 +650,141 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
         
-        user = await db.users.find_one({"username": username})
+        user = user_cache.get(username)
         if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return User(**user)
+            user_doc = await db.users.find_one({"username": username})
+            if user_doc is None:
+                raise HTTPException(status_code=401, detail="User not found")
+            user = User(**user_doc)
+            user_cache.set(username, user)
+        if not user.is_active:
+            raise HTTPException(status_code=401, detail="User is inactive")
+        return user
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
+class SequenceAllocator:
+    """Unique sequence numbers backed by the counters collection.
+
+    Each worker reserves a block of numbers with a single atomic $inc and serves
+    allocations from it locally, so blocks never overlap across workers.
+    """
+    def __init__(self, name: str, block_size: int = SEQUENCE_BLOCK_SIZE):
+        self.name = name
+        self.block_size = max(block_size, 1)
+        self._next = 1
+        self._last = 0
+        self._lock = asyncio.Lock()
+
+    async def seed(self, value: int):
+        await db.counters.update_one({"_id": self.name}, {"$max": {"seq": value}}, upsert=True)
+
+    async def next(self) -> int:
+        async with self._lock:
+            if self._next > self._last:
+                counter = await db.counters.find_one_and_update(
+                    {"_id": self.name},
+                    {"$inc": {"seq": self.block_size}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                self._last = counter["seq"]
+                self._next = self._last - self.block_size + 1
+            value = self._next
+            self._next += 1
+            return value
+
+bill_sequence = SequenceAllocator("bills")
+quotation_sequence = SequenceAllocator("quotations")
+
+async def seed_sequences():
+    # Continue numbering after documents created before the counters collection existed
+    for sequence, collection in ((bill_sequence, db.bills), (quotation_sequence, db.quotations)):
+        if not await db.counters.find_one({"_id": sequence.name}):
+            await sequence.seed(await collection.count_documents({}))
+
+def encode_cursor(doc: dict, field: str = "created_at") -> str:
+    raw = json.dumps({"t": doc[field].isoformat(), "i": doc['id']})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str, field: str = "created_at", ascending: bool = False) -> dict:
+    """Filter matching documents that sort after the cursor on (field, id), descending unless ascending"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(position['t'])
+        last_id = position['i']
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    after = "$gt" if ascending else "$lt"
+    return {"$or": [
+        {field: {after: created_at}},
+        {field: created_at, "id": {after: last_id}}
+    ]}
+
+async def keyset_page(collection, query: dict, cursor: str, limit: int, projection: Optional[dict] = None, field: str = "created_at"):
+    """One page ordered newest first, served by a (field, id) index at any depth"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor, field)]} if query else decode_cursor(cursor, field)
+    docs = await collection.find(query, projection).sort([(field, -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], field) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+class TrustedDocs:
+    """Read path for documents this app wrote and validated itself.
+
+    Queries are projected to the model's fields and results are encoded straight to
+    JSON with orjson, skipping per-document model construction and FastAPI's
+    response_model re-validation. Defaults fill in fields older documents lack.
+    """
+    def __init__(self, model):
+        self.projection = {field: 1 for field in model.model_fields}
+        self.projection['_id'] = 0
+        self.defaults = {
+            name: field.default
+            for name, field in model.model_fields.items()
+            if not field.is_required() and field.default_factory is None
+        }
+
+    def fill(self, doc: dict) -> dict:
+        return doc if self.defaults.keys() <= doc.keys() else {**self.defaults, **doc}
+
+    def response(self, docs: List[dict]) -> Response:
+        return Response(orjson.dumps([self.fill(doc) for doc in docs]), media_type="application/json")
+
+    def page_response(self, docs: List[dict], next_cursor: Optional[str]) -> Response:
+        body = {"items": [self.fill(doc) for doc in docs], "next_cursor": next_cursor}
+        return Response(orjson.dumps(body), media_type="application/json")
+
+    def stream_response(self, cursor, fmt: str) -> StreamingResponse:
+        """Stream a cursor as NDJSON or as a chunked JSON array"""
+        if fmt not in ("json", "ndjson"):
+            raise HTTPException(status_code=400, detail=f"Unsupported stream format: {fmt}")
+        
+        async def chunks():
+            batch = []
+            first = True
+            if fmt == "json":
+                yield b"["
+            async for doc in cursor.batch_size(IMPORT_BATCH_SIZE):
+                batch.append(orjson.dumps(self.fill(doc)))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    yield self._join(batch, fmt, first)
+                    batch, first = [], False
+            if batch:
+                yield self._join(batch, fmt, first)
+            if fmt == "json":
+                yield b"]"
+        
+        media_type = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+        return StreamingResponse(chunks(), media_type=media_type)
+
+    @staticmethod
+    def _join(batch: List[bytes], fmt: str, first: bool) -> bytes:
+        if fmt == "ndjson":
+            return b"\n".join(batch) + b"\n"
+        return (b"" if first else b",") + b",".join(batch)
+
 def require_role(allowed_roles: List[str]):
     def role_checker(current_user: "User" = Depends(get_current_user)):
         if current_user.role not in allowed_roles:
@@ -91,6 +809,12 @@ class UserCreate(BaseModel):
     password: str
     role: str
 
+class UserUpdate(BaseModel):
+    email: Optional[EmailStr] = None
+    full_name: Optional[str] = None
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -115,6 +839,10 @@ class Plant(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class LowStockPlant(Plant):
+    stock_headroom: int
+    low_stock_since: Optional[datetime] = None
+
 class PlantCreate(BaseModel):
     name: str
     category: str
@@ -127,6 +855,18 @@ class PlantCreate(BaseModel):
     location: str
     description: Optional[str] = None
 
+class PlantUpdate(BaseModel):
+    name: Optional[str] = None
+    category: Optional[str] = None
+    variants: Optional[List[str]] = None
+    current_stock: Optional[int] = None
+    min_stock_threshold: Optional[int] = None
+    cost_price: Optional[float] = None
+    selling_price: Optional[float] = None
+    investment: Optional[float] = None
+    location: Optional[str] = None
+    description: Optional[str] = None
+
 class Customer(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -141,6 +881,12 @@ class CustomerCreate(BaseModel):
     email: Optional[EmailStr] = None
     address: Optional[str] = None
 
+class CustomerUpdate(BaseModel):
+    name: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[EmailStr] = None
+    address: Optional[str] = None
+
 class BillItem(BaseModel):
     plant_id: str
     plant_name: str
@@ -149,6 +895,12 @@ class BillItem(BaseModel):
     unit_price: float
     total_price: float
 
+class BillItemCreate(BaseModel):
+    """A line as clients send it; the name and prices come from the plant"""
+    plant_id: str
+    variant: Optional[str] = None
+    quantity: int
+
 class Bill(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     bill_number: str
@@ -160,18 +912,28 @@ class Bill(BaseModel):
     discount: float = 0
     total_amount: float
     payment_method: str  # cash, online, both
-    status: str = "pending"  # pending, approved, completed
+    status: str = "pending"  # pending, approved, rejected, completed
     created_by: str  # user_id
     approved_by: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class BillCreate(BaseModel):
     customer_id: str
-    items: List[BillItem]
+    items: List[BillItemCreate]
     tax: float = 0
     discount: float = 0
     payment_method: str
 
+class BillBulkAction(BaseModel):
+    """Pending bills to approve or reject, by id or by filter"""
+    action: str  # approve, reject
+    bill_ids: Optional[List[str]] = None
+    cashier_id: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    max_amount: Optional[float] = None
+    limit: int = 1000
+
 class Quotation(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     quotation_number: str
@@ -189,11 +951,161 @@ class Quotation(BaseModel):
 
 class QuotationCreate(BaseModel):
     customer_id: str
-    items: List[BillItem]
+    items: List[BillItemCreate]
     tax: float = 0
     discount: float = 0
     valid_days: int = 30
 
+class StockLedgerEntry(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    plant_id: str
+    plant_name: str
+    quantity_change: int
+    reason: str  # opening, sale, adjustment
+    bill_id: Optional[str] = None
+    bill_number: Optional[str] = None
+    created_by: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+# Search Keys
+# Lowercased words and phrases stored in search_terms (and customer phone digits in
+# phone_keys) so searches are anchored prefix matches on a multikey index.
+SEARCH_FIELDS = {
+    "plants": ("name", "category", "location"),
+    "customers": ("name", "phone", "email"),
+    "bills": ("bill_number", "customer_name"),
+    "quotations": ("quotation_number", "customer_name"),
+}
+
+def normalize_search_text(value) -> str:
+    return " ".join(str(value).lower().split())
+
+def search_terms(*values) -> List[str]:
+    terms = set()
+    for value in values:
+        if not value:
+            continue
+        text = normalize_search_text(value)
+        terms.add(text)
+        for token in re.findall(r"[a-z0-9]+", text):
+            terms.add(token)
+            # SKN-000123 should be found by "123"
+            if token.isdigit():
+                terms.add(token.lstrip("0") or "0")
+    return sorted(terms)
+
+def phone_keys(phone: Optional[str]) -> List[str]:
+    digits = re.sub(r"\D", "", phone or "")
+    # Full number plus the 10-digit national number, so +91 prefixes are optional
+    return sorted({digits, digits[-10:]} - {""})
+
+def search_fields(collection_name: str, doc: dict) -> dict:
+    fields = {"search_terms": search_terms(*(doc.get(field) for field in SEARCH_FIELDS[collection_name]))}
+    if collection_name == "customers":
+        fields["phone_keys"] = phone_keys(doc.get("phone"))
+    return fields
+
+def search_query(collection_name: str, q: str) -> Optional[dict]:
+    text = normalize_search_text(q)
+    tokens = re.findall(r"[a-z0-9]+", text)
+    if not tokens:
+        return None
+    digits = re.sub(r"\D", "", text)
+    if collection_name == "customers" and len(digits) >= 3 and not re.search(r"[a-z]", text):
+        return {"phone_keys": {"$regex": f"^{digits}"}}
+    clauses = [{"search_terms": {"$regex": f"^{re.escape(token)}"}} for token in tokens]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def search_tiers(collection_name: str, q: str, query: dict) -> List[dict]:
+    """Queries from strongest to weakest match: exact term, whole-phrase prefix, any prefix"""
+    text = normalize_search_text(q)
+    if "phone_keys" in query:
+        return [{"phone_keys": re.sub(r"\D", "", text)}, query]
+    phrase = {"search_terms": {"$regex": f"^{re.escape(text)}"}}
+    return [{"search_terms": text}] + ([phrase] if phrase != query else []) + [query]
+
+async def run_search(collection_name: str, q: str, limit: int) -> List[dict]:
+    """Exact and whole-phrase matches first, then other prefix matches.
+
+    Each tier is its own index lookup, so a strong match is never crowded out of the
+    candidates by weaker ones; within a tier the shortest primary field comes first.
+    """
+    query = search_query(collection_name, q)
+    if query is None:
+        return []
+    primary_field = SEARCH_FIELDS[collection_name][0]
+    
+    docs: List[dict] = []
+    for tier in search_tiers(collection_name, q, query):
+        if docs:
+            tier = {"$and": [tier, {"_id": {"$nin": [doc['_id'] for doc in docs]}}]}
+        found = await db[collection_name].find(tier).limit(SEARCH_CANDIDATES).to_list(SEARCH_CANDIDATES)
+        found.sort(key=lambda doc: len(str(doc.get(primary_field, ""))))
+        docs.extend(found[:limit - len(docs)])
+        if len(docs) >= limit:
+            break
+    return docs
+
+async def backfill_search_keys():
+    """Add search keys to documents written before they existed (index-backed once done)"""
+    for collection_name in SEARCH_FIELDS:
+        collection = db[collection_name]
+        while True:
+            docs = await collection.find({"search_terms": {"$exists": False}}).limit(1000).to_list(1000)
+            if not docs:
+                break
+            await collection.bulk_write([
+                UpdateOne({"_id": doc['_id']}, {"$set": search_fields(collection_name, doc)})
+                for doc in docs
+            ], ordered=False)
+
+# Low Stock Tracking
+# stock_headroom (current_stock - min_stock_threshold) is stored and indexed so low
+# stock is a range query; low_stock_since records when a plant last went low.
+LOW_STOCK_QUERY = {"stock_headroom": {"$lte": 0}}
+
+def low_stock_fields(doc: dict) -> dict:
+    headroom = doc['current_stock'] - doc['min_stock_threshold']
+    return {
+        "stock_headroom": headroom,
+        "low_stock_since": datetime.now(timezone.utc) if headroom <= 0 else None
+    }
+
+def stock_headroom_pipeline(now: datetime) -> List[dict]:
+    """Update pipeline stages recomputing headroom from the document's own stock and threshold"""
+    return [
+        {"$set": {"stock_headroom": {"$subtract": ["$current_stock", "$min_stock_threshold"]}}},
+        {"$set": {"low_stock_since": {"$cond": [
+            {"$lte": ["$stock_headroom", 0]},
+            {"$ifNull": ["$low_stock_since", now]},
+            None
+        ]}}}
+    ]
+
+async def mark_newly_low_stock(plant_ids: List[str]):
+    await db.plants.update_many(
+        {"id": {"$in": plant_ids}, "stock_headroom": {"$lte": 0}, "low_stock_since": None},
+        {"$set": {"low_stock_since": datetime.now(timezone.utc)}}
+    )
+
+async def backfill_stock_headroom():
+    await db.plants.update_many(
+        {"stock_headroom": {"$exists": False}},
+        stock_headroom_pipeline(datetime.now(timezone.utc))
+    )
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+plant_reads = TrustedDocs(Plant)
+low_stock_reads = TrustedDocs(LowStockPlant)
+customer_reads = TrustedDocs(Customer)
+bill_reads = TrustedDocs(Bill)
+quotation_reads = TrustedDocs(Quotation)
+
 # Authentication Routes
 @api_router.post("/auth/register", response_model=User)
 async def register(user_data: UserCreate, current_user: User = Depends(require_role(["admin"]))):
@@ -203,7 +1115,7 @@ async def register(user_data: UserCreate, current_user: User = Depends(require_r
         raise HTTPException(status_code=400, detail="Username or email already registered")
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     user_dict = user_data.dict()
     del user_dict['password']
     user_obj = User(**user_dict)
@@ -212,13 +1124,34 @@ async def register(user_data: UserCreate, current_user: User = Depends(require_r
     user_doc['hashed_password'] = hashed_password
     
     await db.users.insert_one(user_doc)
+    await cache_bus.publish("users", user_obj.username)
     return user_obj
 
+@api_router.put("/auth/users/{user_id}", response_model=User)
+async def update_user(user_id: str, user_data: UserUpdate, current_user: User = Depends(require_role(["admin"]))):
+    updates = user_data.dict(exclude_unset=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    user = await db.users.find_one_and_update(
+        {"id": user_id},
+        {"$set": updates},
+        return_document=ReturnDocument.AFTER
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Role and active flag are checked from the cache on every request
+    await cache_bus.publish("users", user['username'])
+    return User(**user)
+
 @api_router.post("/auth/login", response_model=Token)
 async def login(user_credentials: UserLogin):
     user = await db.users.find_one({"username": user_credentials.username})
-    if not user or not verify_password(user_credentials.password, user.get('hashed_password')):
+    if not user or not await password_hasher.verify(user_credentials.password, user.get('hashed_password')):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
+    if not user.get('is_active', True):
+        raise HTTPException(status_code=401, detail="User is inactive")
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -232,22 +1165,312 @@ async def login(user_credentials: UserLogin):
 async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+# Bulk Import/Export
+# Plants are deduplicated on name + location and customers on their national phone
+# number; dedupe_key stores that identity so imports can upsert by it. A plant's key is
+# unique everywhere. A customer's key only matches imported rows to existing customers:
+# households share phones, so the API never rejects a customer for a duplicate key.
+def dedupe_key(collection_name: str, doc: dict) -> str:
+    if collection_name == "plants":
+        return f"{normalize_search_text(doc['name'])}|{normalize_search_text(doc['location'])}"
+    digits = re.sub(r"\D", "", doc['phone'])
+    return digits[-10:] or normalize_search_text(doc['phone'])
+
+async def identity_updates(collection_name: str, doc_id: str, updates: dict) -> dict:
+    """search_fields and dedupe_key to write alongside updates that touch searchable fields"""
+    if not set(updates) & set(SEARCH_FIELDS[collection_name]):
+        return {}
+    current = await db[collection_name].find_one({"id": doc_id})
+    if not current:
+        return {}
+    merged = {**current, **updates}
+    return {**search_fields(collection_name, merged), "dedupe_key": dedupe_key(collection_name, merged)}
+
+def duplicate_plant_error() -> HTTPException:
+    return HTTPException(status_code=409, detail="A plant with this name and location already exists")
+
+async def backfill_dedupe_keys():
+    for collection_name in ("plants", "customers"):
+        collection = db[collection_name]
+        last_id = None
+        while True:
+            query: Dict[str, Any] = {"dedupe_key": {"$exists": False}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            docs = await collection.find(query).sort("_id", 1).limit(IMPORT_BATCH_SIZE).to_list(IMPORT_BATCH_SIZE)
+            if not docs:
+                break
+            last_id = docs[-1]['_id']
+            try:
+                await collection.bulk_write([
+                    UpdateOne({"_id": doc['_id']}, {"$set": {"dedupe_key": dedupe_key(collection_name, doc)}})
+                    for doc in docs
+                ], ordered=False)
+            except BulkWriteError as e:
+                # Legacy duplicate plants keep no key until they are merged by hand
+                logger.error(f"{len(e.details.get('writeErrors', []))} duplicate {collection_name} left without dedupe_key")
+
+def import_format(filename: Optional[str], requested: Optional[str]) -> str:
+    fmt = (requested or Path(filename or "").suffix.lstrip(".") or "csv").lower()
+    if fmt in ("jsonl", "json"):
+        fmt = "ndjson"
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    return fmt
+
+def iter_import_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (row_number, row) lazily; unparseable rows come through as the exception"""
+    if fmt == "csv":
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            row = {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, "")}
+            if "variants" in row:
+                row['variants'] = [variant.strip() for variant in row['variants'].split(";") if variant.strip()]
+            yield row_number, row
+        return
+    for row_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, e
+
+async def import_batch(collection_name: str, batch: List[Tuple[int, Any]], user_id: str, report: dict):
+    model = PlantCreate if collection_name == "plants" else CustomerCreate
+    valid: Dict[str, Tuple[int, BaseModel]] = {}
+    for row_number, row in batch:
+        if isinstance(row, Exception):
+            report['errors'].append({"row": row_number, "errors": [f"Invalid JSON: {row}"]})
+            continue
+        if not isinstance(row, dict):
+            report['errors'].append({"row": row_number, "errors": ["Row must be an object"]})
+            continue
+        try:
+            record = model(**row)
+        except ValidationError as e:
+            messages = [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()]
+            report['errors'].append({"row": row_number, "errors": messages})
+            continue
+        key = dedupe_key(collection_name, record.dict())
+        if key in valid:
+            report['duplicates'] += 1
+        valid[key] = (row_number, record)
+    if not valid:
+        return
+    
+    now = datetime.now(timezone.utc)
+    existing = {
+        doc['dedupe_key']: doc
+        for doc in await db[collection_name].find(
+            {"dedupe_key": {"$in": list(valid)}}, {"_id": 0, "dedupe_key": 1, "id": 1, "name": 1}
+        ).to_list(None)
+    }
+    ops, rows, new_ids = [], [], []
+    for key, (row_number, record) in valid.items():
+        fields = record.dict()
+        fields.update(search_fields(collection_name, fields))
+        on_insert = {"id": str(uuid.uuid4()), "created_at": now}
+        if collection_name == "plants":
+            # Existing plants keep their stock; stock changes go through the ledger
+            on_insert['current_stock'] = fields.pop('current_stock')
+            fields['updated_at'] = now
+        ops.append(UpdateOne({"dedupe_key": key}, {"$set": fields, "$setOnInsert": on_insert}, upsert=True))
+        rows.append((row_number, record))
+        new_ids.append(on_insert['id'])
+    
+    try:
+        result = await db[collection_name].bulk_write(ops, ordered=False)
+        upserted = set(result.upserted_ids)
+        failed = {}
+    except BulkWriteError as e:
+        upserted = {item['index'] for item in e.details.get('upserted', [])}
+        failed = {error['index']: error['errmsg'] for error in e.details.get('writeErrors', [])}
+    for index, message in failed.items():
+        report['errors'].append({"row": rows[index][0], "errors": [message]})
+    report['inserted'] += len(upserted)
+    report['updated'] += len(ops) - len(upserted) - len(failed)
+    
+    # Upserts matched on dedupe_key can still change the display name
+    renames = {
+        existing[key]['id']: record.name
+        for index, (key, (row_number, record)) in enumerate(valid.items())
+        if index not in failed and key in existing and existing[key]['name'] != record.name
+    }
+    if renames:
+        await enqueue_name_refreshes("plant" if collection_name == "plants" else "customer", renames)
+    
+    if collection_name == "plants":
+        keys = [key for index, key in enumerate(valid) if index not in failed]
+        await db.plants.update_many({"dedupe_key": {"$in": keys}}, stock_headroom_pipeline(now))
+        if upserted:
+            await db.stock_ledger.insert_many([
+                StockLedgerEntry(
+                    plant_id=new_ids[index],
+                    plant_name=rows[index][1].name,
+                    quantity_change=rows[index][1].current_stock,
+                    reason="opening",
+                    created_by=user_id,
+                    created_at=now
+                ).dict()
+                for index in sorted(upserted)
+            ])
+            await db.analytics_rollups.update_one(
+                {"_id": DASHBOARD_ROLLUP_ID}, {"$inc": {"total_plants": len(upserted)}}, upsert=True
+            )
+
+async def import_records(collection_name: str, rows: Iterator[Tuple[int, Any]], user_id: str) -> dict:
+    """Validate and upsert rows in batches, returning counts and a per-row error report"""
+    report = {"received": 0, "inserted": 0, "updated": 0, "duplicates": 0, "errors": []}
+    batch = []
+    for row in rows:
+        report['received'] += 1
+        batch.append(row)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await import_batch(collection_name, batch, user_id, report)
+            batch = []
+    if batch:
+        await import_batch(collection_name, batch, user_id, report)
+    report['failed'] = len(report['errors'])
+    return report
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+async def export_chunks(collection_name: str, fmt: str) -> AsyncIterator[str]:
+    """Stream a collection as NDJSON or CSV, one batch of rows per chunk"""
+    fields = list((Plant if collection_name == "plants" else Customer).model_fields)
+    projection = {field: 1 for field in fields}
+    projection['_id'] = 0
+    cursor = db[collection_name].find({}, projection).sort("created_at", 1).batch_size(IMPORT_BATCH_SIZE)
+    
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore") if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    rows = 0
+    async for doc in cursor:
+        if writer:
+            if 'variants' in doc:
+                doc['variants'] = ";".join(doc['variants'])
+            writer.writerow({key: json_default(value) if isinstance(value, datetime) else value for key, value in doc.items()})
+        else:
+            buffer.write(json.dumps(doc, default=json_default) + "\n")
+        rows += 1
+        if rows % IMPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_response(collection_name: str, fmt: str) -> StreamingResponse:
+    fmt = import_format(None, fmt)
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_chunks(collection_name, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{collection_name}.{fmt}"'}
+    )
+
 # Plant Management Routes
 @api_router.post("/plants", response_model=Plant)
 async def create_plant(plant_data: PlantCreate, current_user: User = Depends(require_role(["admin", "manager"]))):
     plant_obj = Plant(**plant_data.dict())
-    await db.plants.insert_one(plant_obj.dict())
+    plant_doc = plant_obj.dict()
+    plant_doc.update(search_fields("plants", plant_doc))
+    plant_doc.update(low_stock_fields(plant_doc))
+    plant_doc['dedupe_key'] = dedupe_key("plants", plant_doc)
+    try:
+        await db.plants.insert_one(plant_doc)
+    except DuplicateKeyError:
+        raise duplicate_plant_error()
+    opening = StockLedgerEntry(
+        plant_id=plant_obj.id,
+        plant_name=plant_obj.name,
+        quantity_change=plant_obj.current_stock,
+        reason="opening",
+        created_by=current_user.id
+    )
+    await db.stock_ledger.insert_one(opening.dict())
+    await db.analytics_rollups.update_one({"_id": DASHBOARD_ROLLUP_ID}, {"$inc": {"total_plants": 1}}, upsert=True)
+    await cache_bus.publish("plants", plant_obj.id)
+    await live_events.publish_stock([plant_obj.id], created=True)
     return plant_obj
 
-@api_router.get("/plants", response_model=List[Plant])
-async def get_plants(skip: int = 0, limit: int = 100, current_user: User = Depends(get_current_user)):
-    plants = await db.plants.find().skip(skip).limit(limit).to_list(limit)
-    return [Plant(**plant) for plant in plants]
+@api_router.get("/plants", response_model=Union[List[Plant], Page[Plant]])
+async def get_plants(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, stream: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    # Passing cursor (empty for the first page) switches to keyset pagination
+    if cursor is not None:
+        plants, next_cursor = await keyset_page(db.plants, {}, cursor, limit, plant_reads.projection)
+        return plant_reads.page_response(plants, next_cursor)
+    query = db.plants.find({}, plant_reads.projection).skip(skip).limit(limit)
+    if stream:
+        return plant_reads.stream_response(query, stream)
+    return plant_reads.response(await query.to_list(limit or None))
 
-@api_router.get("/plants/low-stock", response_model=List[Plant])
+@api_router.post("/plants/import")
+async def import_plants(file: UploadFile = File(...), format: Optional[str] = None, current_user: User = Depends(require_role(["admin", "manager"]))):
+    rows = iter_import_rows(io.TextIOWrapper(file.file, encoding="utf-8-sig"), import_format(file.filename, format))
+    report = await import_records("plants", rows, current_user.id)
+    await cache_bus.publish("plants")
+    await live_events.publish("resync", {})
+    return report
+
+@api_router.get("/plants/export")
+async def export_plants(format: str = "ndjson", current_user: User = Depends(require_role(["admin", "manager"]))):
+    return export_response("plants", format)
+
+@api_router.get("/plants/low-stock", response_model=List[LowStockPlant])
 async def get_low_stock_plants(current_user: User = Depends(get_current_user)):
-    plants = await db.plants.find({"$expr": {"$lte": ["$current_stock", "$min_stock_threshold"]}}).to_list(1000)
-    return [Plant(**plant) for plant in plants]
+    # Most urgent (furthest below threshold) first
+    plants = await db.plants.find(LOW_STOCK_QUERY, low_stock_reads.projection).sort("stock_headroom", 1).to_list(1000)
+    return low_stock_reads.response(plants)
+
+@api_router.get("/plants/low-stock/feed")
+async def get_low_stock_feed(since: Optional[datetime] = None, cursor: Optional[str] = None, limit: int = 100, current_user: User = Depends(get_current_user)):
+    """Plants that went low after `since`; poll again with the returned next_cursor.
+
+    Plants marked low by one bill share a timestamp, so the position is (low_stock_since, id).
+    """
+    if cursor:
+        query = decode_cursor(cursor, "low_stock_since", ascending=True)
+    elif since is not None:
+        query = {"low_stock_since": {"$gt": since}}
+    else:
+        raise HTTPException(status_code=400, detail="Pass since or cursor")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    plants = await db.plants.find(query).sort([("low_stock_since", 1), ("id", 1)]).limit(limit).to_list(limit)
+    return {
+        "plants": [LowStockPlant(**plant) for plant in plants],
+        "next_cursor": encode_cursor(plants[-1], "low_stock_since") if plants else cursor,
+        "next_since": plants[-1]['low_stock_since'] if plants else since
+    }
+
+@api_router.get("/plants/top-sellers")
+async def get_top_sellers(by: str = "units_30d", limit: int = 10, current_user: User = Depends(get_current_user)):
+    if by not in SALES_RANKINGS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(SALES_RANKINGS)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    plants = await db.plants.find({f"sales.{by}": {"$gt": 0}}, VELOCITY_PROJECTION).sort(f"sales.{by}", -1).limit(limit).to_list(limit)
+    return [velocity_response(plant) for plant in plants]
+
+@api_router.get("/plants/slow-movers")
+async def get_slow_movers(by: str = "units_30d", limit: int = 10, current_user: User = Depends(get_current_user)):
+    """In-stock plants that sold least, never-sold plants first"""
+    if by not in SALES_RANKINGS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(SALES_RANKINGS)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    plants = await db.plants.find({"current_stock": {"$gt": 0}}, VELOCITY_PROJECTION).sort(f"sales.{by}", 1).limit(limit).to_list(limit)
+    return [velocity_response(plant) for plant in plants]
+
+@api_router.get("/plants/{plant_id}/velocity")
+async def get_plant_velocity(plant_id: str, current_user: User = Depends(get_current_user)):
+    plant = await db.plants.find_one({"id": plant_id}, VELOCITY_PROJECTION)
+    if not plant:
+        raise HTTPException(status_code=404, detail="Plant not found")
+    return velocity_response(plant)
 
 @api_router.get("/plants/{plant_id}", response_model=Plant)
 async def get_plant(plant_id: str, current_user: User = Depends(get_current_user)):
@@ -256,29 +1479,851 @@ async def get_plant(plant_id: str, current_user: User = Depends(get_current_user
         raise HTTPException(status_code=404, detail="Plant not found")
     return Plant(**plant)
 
+@api_router.put("/plants/{plant_id}", response_model=Plant)
+async def update_plant(plant_id: str, plant_data: PlantUpdate, current_user: User = Depends(require_role(["admin", "manager"]))):
+    updates = plant_data.dict(exclude_unset=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    # Only fields that default to None on Plant may be cleared
+    not_nullable = sorted(field for field, value in updates.items() if value is None and Plant.model_fields[field].default is not None)
+    if not_nullable:
+        raise HTTPException(status_code=400, detail=f"Fields cannot be null: {', '.join(not_nullable)}")
+    now = datetime.now(timezone.utc)
+    updates['updated_at'] = now
+    identity = await identity_updates("plants", plant_id, updates)
+    
+    # One atomic pipeline update keeps headroom consistent with the new stock/threshold
+    try:
+        before = await db.plants.find_one_and_update(
+            {"id": plant_id},
+            [{"$set": {field: {"$literal": value} for field, value in {**updates, **identity}.items()}}] + stock_headroom_pipeline(now),
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise duplicate_plant_error()
+    if not before:
+        raise HTTPException(status_code=404, detail="Plant not found")
+    plant = {**before, **updates}
+    
+    if plant['current_stock'] != before['current_stock']:
+        adjustment = StockLedgerEntry(
+            plant_id=plant_id,
+            plant_name=plant['name'],
+            quantity_change=plant['current_stock'] - before['current_stock'],
+            reason="adjustment",
+            created_by=current_user.id,
+            created_at=now
+        )
+        await db.stock_ledger.insert_one(adjustment.dict())
+    if plant['name'] != before['name']:
+        await enqueue_name_refreshes("plant", {plant_id: plant['name']})
+    await cache_bus.publish("plants", plant_id)
+    if plant['current_stock'] != before['current_stock']:
+        await live_events.publish_stock([plant_id])
+    return Plant(**plant)
+
+@api_router.get("/plants/{plant_id}/stock-ledger", response_model=List[StockLedgerEntry])
+async def get_plant_stock_ledger(plant_id: str, limit: int = 100, current_user: User = Depends(get_current_user)):
+    entries = await db.stock_ledger.find({"plant_id": plant_id}).sort("created_at", -1).limit(limit).to_list(limit)
+    return [StockLedgerEntry(**entry) for entry in entries]
+
 # Customer Management Routes
 @api_router.post("/customers", response_model=Customer)
 async def create_customer(customer_data: CustomerCreate, current_user: User = Depends(get_current_user)):
     customer_obj = Customer(**customer_data.dict())
-    await db.customers.insert_one(customer_obj.dict())
+    customer_doc = customer_obj.dict()
+    customer_doc.update(search_fields("customers", customer_doc))
+    customer_doc['dedupe_key'] = dedupe_key("customers", customer_doc)
+    await db.customers.insert_one(customer_doc)
     return customer_obj
 
-@api_router.get("/customers", response_model=List[Customer])
-async def get_customers(skip: int = 0, limit: int = 100, current_user: User = Depends(get_current_user)):
-    customers = await db.customers.find().skip(skip).limit(limit).to_list(limit)
-    return [Customer(**customer) for customer in customers]
+@api_router.get("/customers", response_model=Union[List[Customer], Page[Customer]])
+async def get_customers(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, stream: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    if cursor is not None:
+        customers, next_cursor = await keyset_page(db.customers, {}, cursor, limit, customer_reads.projection)
+        return customer_reads.page_response(customers, next_cursor)
+    query = db.customers.find({}, customer_reads.projection).skip(skip).limit(limit)
+    if stream:
+        return customer_reads.stream_response(query, stream)
+    return customer_reads.response(await query.to_list(limit or None))
+
+@api_router.post("/customers/import")
+async def import_customers(file: UploadFile = File(...), format: Optional[str] = None, current_user: User = Depends(require_role(["admin", "manager"]))):
+    rows = iter_import_rows(io.TextIOWrapper(file.file, encoding="utf-8-sig"), import_format(file.filename, format))
+    return await import_records("customers", rows, current_user.id)
+
+@api_router.get("/customers/export")
+async def export_customers(format: str = "ndjson", current_user: User = Depends(require_role(["admin", "manager"]))):
+    return export_response("customers", format)
+
+@api_router.put("/customers/{customer_id}", response_model=Customer)
+async def update_customer(customer_id: str, customer_data: CustomerUpdate, current_user: User = Depends(get_current_user)):
+    updates = customer_data.dict(exclude_unset=True)
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    # Only fields that default to None on Customer may be cleared
+    not_nullable = sorted(field for field, value in updates.items() if value is None and Customer.model_fields[field].default is not None)
+    if not_nullable:
+        raise HTTPException(status_code=400, detail=f"Fields cannot be null: {', '.join(not_nullable)}")
+    identity = await identity_updates("customers", customer_id, updates)
+    before = await db.customers.find_one_and_update(
+        {"id": customer_id}, {"$set": {**updates, **identity}}, return_document=ReturnDocument.BEFORE
+    )
+    if not before:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    customer = {**before, **updates}
+    if customer['name'] != before['name']:
+        await enqueue_name_refreshes("customer", {customer_id: customer['name']})
+    return Customer(**customer)
 
 @api_router.get("/customers/search")
 async def search_customers(q: str, current_user: User = Depends(get_current_user)):
-    customers = await db.customers.find({
-        "$or": [
-            {"name": {"$regex": q, "$options": "i"}},
-            {"phone": {"$regex": q, "$options": "i"}},
-            {"email": {"$regex": q, "$options": "i"}}
-        ]
-    }).limit(10).to_list(10)
+    customers = await run_search("customers", q, 10)
     return [Customer(**customer) for customer in customers]
 
+# Denormalized Names
+# Bills and quotations embed customer_name and items[].plant_name so reads need no
+# lookups. A rename upserts a job into denormalization_jobs; NameRefreshWorker leases
+# jobs and rewrites the affected documents in throttled batches, found through the
+# customer_id / items.plant_id indexes. Rewritten documents stop matching the stale
+# query, so a job interrupted by a restart simply resumes where it left off.
+DENORMALIZED_COLLECTIONS = ("bills", "quotations")
+
+def stale_name_query(kind: str, entity_id: str, name: str) -> dict:
+    if kind == "customer":
+        return {"customer_id": entity_id, "customer_name": {"$ne": name}}
+    return {"items": {"$elemMatch": {"plant_id": entity_id, "plant_name": {"$ne": name}}}}
+
+def name_refresh_ops(kind: str, entity_id: str, name: str, collection_name: str, docs: List[dict]) -> list:
+    if kind == "customer":
+        # customer_name feeds search_terms, so those are rebuilt per document
+        number_field = SEARCH_FIELDS[collection_name][0]
+        return [
+            UpdateOne({"_id": doc['_id']}, {"$set": {
+                "customer_name": name,
+                **search_fields(collection_name, {number_field: doc.get(number_field), "customer_name": name}),
+            }})
+            for doc in docs
+        ]
+    return [UpdateMany(
+        {"_id": {"$in": [doc['_id'] for doc in docs]}},
+        {"$set": {"items.$[item].plant_name": name}},
+        array_filters=[{"item.plant_id": entity_id}]
+    )]
+
+async def enqueue_name_refreshes(kind: str, renames: Dict[str, str]):
+    """Queue a refresh per renamed customer/plant; a later rename of the same one replaces the job"""
+    now = datetime.now(timezone.utc)
+    await db.denormalization_jobs.bulk_write([
+        UpdateOne(
+            {"_id": f"{kind}:{entity_id}"},
+            {
+                "$set": {"kind": kind, "entity_id": entity_id, "name": name, "status": "pending", "requested_at": now},
+                "$setOnInsert": {"documents_updated": 0},
+            },
+            upsert=True
+        )
+        for entity_id, name in renames.items()
+    ], ordered=False)
+    name_refresher.wake()
+
+class NameRefreshWorker:
+    """Background task draining denormalization_jobs; safe to run in every worker"""
+    def __init__(self):
+        self.owner = uuid.uuid4().hex
+        self.jobs_completed = 0
+        self.documents_updated = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self):
+        self._wake.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def run(self):
+        while True:
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Name refresh failed: {str(e)}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), NAME_REFRESH_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain(self) -> int:
+        """Run jobs until none are left to claim; returns how many finished"""
+        finished = 0
+        while True:
+            job = await self.claim()
+            if job is None:
+                return finished
+            if await self.refresh(job):
+                finished += 1
+
+    async def claim(self) -> Optional[dict]:
+        # Pending jobs, or running ones whose worker stopped renewing its lease
+        now = datetime.now(timezone.utc)
+        return await db.denormalization_jobs.find_one_and_update(
+            {"$or": [{"status": "pending"}, {"status": "running", "lease_until": {"$lt": now}}]},
+            {"$set": {
+                "status": "running",
+                "lease_owner": self.owner,
+                "lease_until": now + timedelta(seconds=NAME_REFRESH_LEASE_SECONDS),
+            }},
+            sort=[("requested_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def renew(self, job_id: str) -> Optional[dict]:
+        """Extend the lease and pick up the latest name; None once another worker took over"""
+        return await db.denormalization_jobs.find_one_and_update(
+            {"_id": job_id, "lease_owner": self.owner},
+            {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=NAME_REFRESH_LEASE_SECONDS)}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def refresh(self, job: dict) -> bool:
+        for collection_name in DENORMALIZED_COLLECTIONS:
+            collection = db[collection_name]
+            number_field = SEARCH_FIELDS[collection_name][0]
+            while True:
+                job = await self.renew(job['_id'])
+                if job is None:
+                    return False
+                docs = await collection.find(
+                    stale_name_query(job['kind'], job['entity_id'], job['name']), {"_id": 1, number_field: 1}
+                ).limit(NAME_REFRESH_BATCH_SIZE).to_list(NAME_REFRESH_BATCH_SIZE)
+                if not docs:
+                    break
+                await collection.bulk_write(
+                    name_refresh_ops(job['kind'], job['entity_id'], job['name'], collection_name, docs), ordered=False
+                )
+                await db.denormalization_jobs.update_one({"_id": job['_id']}, {"$inc": {"documents_updated": len(docs)}})
+                self.documents_updated += len(docs)
+                await asyncio.sleep(NAME_REFRESH_THROTTLE_SECONDS)
+        
+        # A rename that arrived meanwhile set the job back to pending, so it runs again
+        result = await db.denormalization_jobs.update_one(
+            {"_id": job['_id'], "lease_owner": self.owner, "status": "running"},
+            {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc)}, "$unset": {"lease_owner": "", "lease_until": ""}}
+        )
+        if result.modified_count:
+            self.jobs_completed += 1
+        return bool(result.modified_count)
+
+    def stats(self):
+        return {
+            "owner": self.owner,
+            "running": bool(self._task and not self._task.done()),
+            "jobs_completed": self.jobs_completed,
+            "documents_updated": self.documents_updated,
+        }
+
+name_refresher = NameRefreshWorker()
+
+# Inventory Movements
+def bill_quantities(bill: Bill) -> Tuple[Dict[str, int], Dict[str, str]]:
+    quantities: Dict[str, int] = defaultdict(int)
+    names: Dict[str, str] = {}
+    for item in bill.items:
+        if item.quantity > 0:
+            quantities[item.plant_id] += item.quantity
+            names[item.plant_id] = item.plant_name
+    return quantities, names
+
+async def take_stock(quantities: Dict[str, int], hold: str, now: datetime) -> bool:
+    """Decrement every plant in one unordered bulk_write of conditional $inc updates.
+
+    Each matched plant is tagged with `hold` so a partial failure can be undone exactly;
+    returns False, with nothing changed, if any plant lacked the stock.
+    """
+    result = await db.plants.bulk_write([
+        UpdateOne(
+            {"id": plant_id, "current_stock": {"$gte": quantity}, "stock_holds": {"$ne": hold}},
+            {
+                "$inc": {"current_stock": -quantity, "stock_headroom": -quantity},
+                "$push": {"stock_holds": hold},
+                "$set": {"updated_at": now}
+            }
+        )
+        for plant_id, quantity in quantities.items()
+    ], ordered=False)
+    
+    if result.matched_count < len(quantities):
+        await db.plants.bulk_write([
+            UpdateOne(
+                {"id": plant_id, "stock_holds": hold},
+                {"$inc": {"current_stock": quantity, "stock_headroom": quantity}, "$pull": {"stock_holds": hold}}
+            )
+            for plant_id, quantity in quantities.items()
+        ], ordered=False)
+        return False
+    
+    await db.plants.update_many({"stock_holds": hold}, {"$pull": {"stock_holds": hold}})
+    await mark_newly_low_stock(list(quantities))
+    return True
+
+def sale_ledger_entries(bill: Bill, user_id: str, now: datetime) -> List[dict]:
+    quantities, names = bill_quantities(bill)
+    return [
+        StockLedgerEntry(
+            plant_id=plant_id,
+            plant_name=names[plant_id],
+            quantity_change=-quantity,
+            reason="sale",
+            bill_id=bill.id,
+            bill_number=bill.bill_number,
+            created_by=user_id,
+            created_at=now
+        ).dict()
+        for plant_id, quantity in quantities.items()
+    ]
+
+async def apply_bill_stock_movement(bill: Bill, user_id: str):
+    """Decrement stock for every line of an approved bill, rejecting oversells"""
+    quantities, names = bill_quantities(bill)
+    if not quantities:
+        return
+    
+    now = datetime.now(timezone.utc)
+    if not await take_stock(quantities, f"bill:{bill.id}", now):
+        plants = await db.plants.find(
+            {"id": {"$in": list(quantities)}}, {"id": 1, "current_stock": 1}
+        ).to_list(len(quantities))
+        in_stock = {plant['id']: plant['current_stock'] for plant in plants}
+        short = [
+            f"{names[plant_id]} (requested {quantity}, available {in_stock.get(plant_id, 0)})"
+            for plant_id, quantity in quantities.items()
+            if in_stock.get(plant_id, 0) < quantity
+        ]
+        raise HTTPException(status_code=409, detail=f"Insufficient stock: {', '.join(short) or 'please retry'}")
+    
+    try:
+        await db.stock_ledger.insert_many(sale_ledger_entries(bill, user_id, now))
+    except Exception:
+        # A sale cannot stand without its ledger rows: give the stock back
+        await db.stock_ledger.delete_many({"bill_id": bill.id, "reason": "sale"})
+        await db.plants.bulk_write([
+            UpdateOne({"id": plant_id}, [{"$set": {"current_stock": {"$add": ["$current_stock", quantity]}}}] + stock_headroom_pipeline(now))
+            for plant_id, quantity in quantities.items()
+        ], ordered=False)
+        raise
+
+async def ledger_totals(plant_id: Optional[str] = None) -> Dict[str, dict]:
+    """Sum of ledger movements per plant, and whether the plant has an opening entry"""
+    match = {"plant_id": plant_id} if plant_id else {}
+    totals = await db.stock_ledger.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$plant_id",
+            "ledger_stock": {"$sum": "$quantity_change"},
+            "opened": {"$max": {"$eq": ["$reason", "opening"]}}
+        }}
+    ]).to_list(None)
+    return {total['_id']: total for total in totals}
+
+OPENING_LEDGER_ID = "opening_ledger"
+
+async def seed_opening_ledger(force: bool = False) -> int:
+    """Give plants that predate the ledger an opening entry so their movements sum to current_stock.
+
+    The opening quantity is whatever current_stock held before the first recorded movement.
+    The _id is derived from the plant, so workers seeding at the same time insert it once.
+    Plants created since then get their opening entry on insert, so startup seeds only once.
+    """
+    if not force and await db.backfill_state.find_one({"_id": OPENING_LEDGER_ID, "status": "done"}):
+        return 0
+    totals = await ledger_totals()
+    now = datetime.now(timezone.utc)
+    seeded = 0
+    batch = []
+    plants = db.plants.find({}, {"id": 1, "name": 1, "current_stock": 1, "created_at": 1})
+    async for plant in plants:
+        total = totals.get(plant['id'], {})
+        if total.get('opened'):
+            continue
+        entry = StockLedgerEntry(
+            plant_id=plant['id'],
+            plant_name=plant['name'],
+            quantity_change=plant['current_stock'] - total.get('ledger_stock', 0),
+            reason="opening",
+            created_by="system",
+            created_at=plant.get('created_at') or now
+        ).dict()
+        batch.append({"_id": f"opening:{plant['id']}", **entry})
+        if len(batch) == IMPORT_BATCH_SIZE:
+            seeded += await insert_opening_entries(batch)
+            batch = []
+    if batch:
+        seeded += await insert_opening_entries(batch)
+    await db.backfill_state.update_one(
+        {"_id": OPENING_LEDGER_ID}, {"$set": {"status": "done", "seeded": seeded, "finished_at": now}}, upsert=True
+    )
+    return seeded
+
+async def insert_opening_entries(entries: List[dict]) -> int:
+    try:
+        result = await db.stock_ledger.insert_many(entries, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        # Another worker seeded some of these plants first
+        return e.details.get('nInserted', 0)
+
+async def verify_stock_against_ledger(plant_id: Optional[str] = None, rebuild: bool = False):
+    """Compare current_stock with the sum of ledger movements, optionally resetting it to the ledger.
+
+    Plants without an opening entry are listed as unseeded and never rebuilt: their ledger
+    only holds the movements since it was introduced, not the stock they started with.
+    """
+    totals = await ledger_totals(plant_id)
+    
+    query = {"id": plant_id} if plant_id else {}
+    drift = []
+    unseeded = []
+    checked = 0
+    async for plant in db.plants.find(query, {"id": 1, "name": 1, "current_stock": 1}):
+        checked += 1
+        total = totals.get(plant['id'])
+        if not total or not total['opened']:
+            unseeded.append(plant['id'])
+            continue
+        expected = total['ledger_stock']
+        if expected != plant['current_stock']:
+            drift.append({
+                "plant_id": plant['id'],
+                "name": plant['name'],
+                "current_stock": plant['current_stock'],
+                "ledger_stock": expected
+            })
+            if rebuild:
+                await db.plants.update_one(
+                    {"id": plant['id']},
+                    [{"$set": {"current_stock": expected}}] + stock_headroom_pipeline(datetime.now(timezone.utc))
+                )
+    return {"checked": checked, "drift": drift, "unseeded": unseeded, "rebuilt": rebuild}
+
+# Analytics Rollups
+# analytics_rollups holds one "dashboard" document with running totals plus one
+# "day:YYYY-MM-DD" bucket per sales day, all maintained with $inc on write.
+DASHBOARD_ROLLUP_ID = "dashboard"
+# Bill statuses that count as sales; pending and rejected bills do not
+SALE_STATUSES = ["approved", "completed"]
+
+def rollup_day(moment: datetime) -> str:
+    # Stored datetimes come back from Mongo as naive UTC
+    return moment.strftime("%Y-%m-%d")
+
+async def record_sale_in_rollups(bill: Bill):
+    await record_sales_in_rollups([bill])
+
+async def record_sales_in_rollups(bills: List[Bill]):
+    """One bulk_write per rollup collection however many bills: the dashboard total, one $inc per
+    sales day, the sales_daily/sales_monthly report buckets and the plants' sales counters.
+
+    Each call bumps the dashboard's sales_version and publishes the new total with it, so live
+    clients keep the newest total however events are ordered or repeated.
+    """
+    if not bills:
+        return
+    await record_sales_in_reports(bills)
+    await record_plant_sales(bills)
+    days: Dict[str, Dict[str, float]] = defaultdict(lambda: {"total_sales": 0, "bill_count": 0})
+    for bill in bills:
+        day = days[rollup_day(bill.created_at)]
+        day["total_sales"] += bill.total_amount
+        day["bill_count"] += 1
+    total = {
+        "total_sales": sum(day["total_sales"] for day in days.values()),
+        "bill_count": len(bills),
+    }
+    dashboard = await db.analytics_rollups.find_one_and_update(
+        {"_id": DASHBOARD_ROLLUP_ID},
+        {"$inc": {**total, "sales_version": 1}},
+        projection={"_id": 0, "total_sales": 1, "sales_version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    await db.analytics_rollups.bulk_write([
+        UpdateOne({"_id": f"day:{day}"}, {"$inc": inc, "$set": {"date": day}}, upsert=True)
+        for day, inc in days.items()
+    ], ordered=False)
+    await live_events.publish("sales_total", dashboard)
+
+async def reconcile_dashboard_rollups(apply: bool = True):
+    """Rebuild analytics_rollups from bills and plants and report how far it had drifted"""
+    days = await db.bills.aggregate([
+        {"$match": {"status": {"$in": SALE_STATUSES}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "total_sales": {"$sum": "$total_amount"},
+            "bill_count": {"$sum": 1}
+        }}
+    ]).to_list(None)
+    expected = {
+        f"day:{day['_id']}": {"date": day['_id'], "total_sales": day['total_sales'], "bill_count": day['bill_count']}
+        for day in days
+    }
+    expected[DASHBOARD_ROLLUP_ID] = {
+        "total_sales": sum(day['total_sales'] for day in days),
+        "bill_count": sum(day['bill_count'] for day in days),
+        "total_plants": await db.plants.count_documents({})
+    }
+    
+    stored = {doc['_id']: doc async for doc in db.analytics_rollups.find()}
+    drift = []
+    for rollup_id in sorted(set(expected) | set(stored)):
+        want = expected.get(rollup_id, {})
+        have = stored.get(rollup_id, {})
+        for field in ("total_sales", "bill_count", "total_plants"):
+            if field not in want and field not in have:
+                continue
+            if round(want.get(field, 0), 2) != round(have.get(field, 0), 2):
+                drift.append({"rollup": rollup_id, "field": field, "stored": have.get(field), "expected": want.get(field, 0)})
+    
+    if apply:
+        await db.analytics_rollups.delete_many({"_id": {"$nin": list(expected)}})
+        await db.analytics_rollups.bulk_write([
+            UpdateOne({"_id": rollup_id}, {"$set": fields}, upsert=True)
+            for rollup_id, fields in expected.items()
+        ], ordered=False)
+    return {"rollups": len(expected), "drift": drift, "applied": apply}
+
+async def seed_dashboard_rollups():
+    if not await db.analytics_rollups.find_one({"_id": DASHBOARD_ROLLUP_ID}):
+        await reconcile_dashboard_rollups()
+
+# Line Pricing
+# Lines are priced from Plant.selling_price, never from the client. Prices for every
+# plant on a bill come from the cache or one $in query; plant writes invalidate them.
+plant_prices = TTLCache(maxsize=PRICE_CACHE_MAXSIZE, ttl=PRICE_CACHE_TTL_SECONDS)
+cache_bus.subscribe("plants", lambda plant_id: plant_prices.clear() if plant_id is None else plant_prices.pop(plant_id))
+
+async def lookup_plants(plant_ids: List[str]) -> Dict[str, dict]:
+    """id, name, category and selling_price for each existing plant"""
+    plants = {plant_id: plant_prices.get(plant_id) for plant_id in set(plant_ids)}
+    missing = [plant_id for plant_id, plant in plants.items() if plant is None]
+    if missing:
+        async for plant in db.plants.find({"id": {"$in": missing}}, {"_id": 0, "id": 1, "name": 1, "category": 1, "selling_price": 1}):
+            plants[plant['id']] = plant
+            plant_prices.set(plant['id'], plant)
+    return {plant_id: plant for plant_id, plant in plants.items() if plant is not None}
+
+async def get_plant_prices(plant_ids: List[str]) -> Dict[str, dict]:
+    prices = await lookup_plants(plant_ids)
+    unknown = sorted(set(plant_ids) - set(prices))
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Plants not found: {', '.join(unknown)}")
+    return prices
+
+async def price_items(items: List[BillItemCreate]) -> Tuple[List[BillItem], float]:
+    """Price lines at current selling prices; returns the priced lines and their subtotal"""
+    if any(item.quantity <= 0 for item in items):
+        raise HTTPException(status_code=400, detail="Quantities must be positive")
+    prices = await get_plant_prices([item.plant_id for item in items])
+    priced = [
+        BillItem(
+            plant_id=item.plant_id,
+            plant_name=prices[item.plant_id]['name'],
+            variant=item.variant,
+            quantity=item.quantity,
+            unit_price=prices[item.plant_id]['selling_price'],
+            total_price=round(prices[item.plant_id]['selling_price'] * item.quantity, 2),
+        )
+        for item in items
+    ]
+    return priced, round(sum(item.total_price for item in priced), 2)
+
+# Sales Rollups
+# sales_daily holds one document per (day, dimension, key) and sales_monthly one per
+# (month, dimension, key), both $inc'd whenever bills become sales. Dimensions are
+# "all", cashier and payment_method (bill totals) plus plant and category (line totals,
+# before bill-level tax and discount). Reports read these instead of scanning bills.
+SALES_DIMENSIONS = ("all", "plant", "category", "cashier", "payment_method")
+SALES_METRICS = ("revenue", "bill_count", "units")
+SALES_BACKFILL_ID = "sales_rollups"
+
+def rollup_week(day: str) -> str:
+    """ISO week bucket, named after its Monday"""
+    moment = datetime.strptime(day, "%Y-%m-%d")
+    return (moment - timedelta(days=moment.weekday())).strftime("%Y-%m-%d")
+
+def sales_rollup_rows(bills: List[Bill], plants: Dict[str, dict]) -> Dict[Tuple[str, str, str], dict]:
+    """Sum bills into {(day, dimension, key): {label, revenue, bill_count, units}}"""
+    rows: Dict[Tuple[str, str, str], dict] = {}
+    
+    def add(day, dimension, key, label, revenue, units):
+        row = rows.setdefault((day, dimension, key), {"label": label, "revenue": 0, "bill_count": 0, "units": 0})
+        row["revenue"] += revenue
+        row["units"] += units
+        row["bill_count"] += 1
+    
+    for bill in bills:
+        day = rollup_day(bill.created_at)
+        units = sum(item.quantity for item in bill.items)
+        add(day, "all", "all", "All sales", bill.total_amount, units)
+        add(day, "cashier", bill.created_by, bill.created_by, bill.total_amount, units)
+        add(day, "payment_method", bill.payment_method, bill.payment_method, bill.total_amount, units)
+        # A bill counts once per plant and category however many lines it has
+        lines: Dict[Tuple[str, str, str], List[float]] = defaultdict(lambda: [0, 0])
+        for item in bill.items:
+            category = plants.get(item.plant_id, {}).get("category") or "Uncategorized"
+            for dimension, key, label in (("plant", item.plant_id, item.plant_name), ("category", category, category)):
+                lines[(dimension, key, label)][0] += item.total_price
+                lines[(dimension, key, label)][1] += item.quantity
+        for (dimension, key, label), (revenue, quantity) in lines.items():
+            add(day, dimension, key, label, revenue, quantity)
+    return rows
+
+def sales_rollup_ops(rows: Dict[Tuple[str, str, str], dict], replace: bool = False) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+    """Daily and monthly upserts for the rows; replace=True $sets the metrics instead of $inc"""
+    months: Dict[Tuple[str, str, str], dict] = {}
+    for (day, dimension, key), row in rows.items():
+        month = months.setdefault((day[:7], dimension, key), {"label": row["label"], "revenue": 0, "bill_count": 0, "units": 0})
+        for metric in SALES_METRICS:
+            month[metric] += row[metric]
+    
+    def update(fields, row):
+        metrics = {metric: row[metric] for metric in SALES_METRICS}
+        if replace:
+            return {"$set": {**fields, "label": row["label"], **metrics}}
+        return {"$set": {**fields, "label": row["label"]}, "$inc": metrics}
+    
+    daily = [
+        UpdateOne(
+            {"_id": f"{day}|{dimension}|{key}"},
+            update({"date": day, "week": rollup_week(day), "month": day[:7], "dimension": dimension, "key": key}, row),
+            upsert=True
+        )
+        for (day, dimension, key), row in rows.items()
+    ]
+    monthly = [
+        UpdateOne(
+            {"_id": f"{month}|{dimension}|{key}"},
+            update({"month": month, "dimension": dimension, "key": key}, row),
+            upsert=True
+        )
+        for (month, dimension, key), row in months.items()
+    ]
+    return daily, monthly
+
+async def record_sales_in_reports(bills: List[Bill]):
+    plants = await lookup_plants([item.plant_id for bill in bills for item in bill.items])
+    daily, monthly = sales_rollup_ops(sales_rollup_rows(bills, plants))
+    await db.sales_daily.bulk_write(daily, ordered=False)
+    await db.sales_monthly.bulk_write(monthly, ordered=False)
+
+async def backfill_sales_rollups(restart: bool = False, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Rebuild sales_daily/sales_monthly from bills one calendar month at a time.
+
+    Each month is recomputed in full and $set, so rerunning a month is harmless; progress
+    is saved after every month. A run left "running" continues from there; otherwise the
+    rollups are rewritten in place from the first month. Only restart empties them first,
+    which also drops rows no bill accounts for any more.
+    Sales recorded live meanwhile land on top of rebuilt months or inside months that
+    are rebuilt later; only one recorded while its own month is being rewritten can be
+    missed or counted twice, and rerunning that month fixes it.
+    A newer run takes over: the one it replaces stops at its next month boundary.
+    """
+    state = await db.backfill_state.find_one({"_id": SALES_BACKFILL_ID})
+    run_id = uuid.uuid4().hex
+    if restart:
+        await db.sales_daily.delete_many({})
+        await db.sales_monthly.delete_many({})
+    if restart or not state or state.get("status") != "running":
+        state = {"_id": SALES_BACKFILL_ID, "next_month": None, "months": 0, "bills": 0, "status": "running",
+                 "run_id": run_id, "started_at": datetime.now(timezone.utc)}
+        await db.backfill_state.replace_one({"_id": SALES_BACKFILL_ID}, state, upsert=True)
+    else:
+        state["run_id"] = run_id
+        await db.backfill_state.update_one({"_id": SALES_BACKFILL_ID}, {"$set": {"run_id": run_id}})
+    owned = {"_id": SALES_BACKFILL_ID, "run_id": run_id}
+    
+    sale_query: Dict[str, Any] = {"status": {"$in": SALE_STATUSES}}
+    while True:
+        query = dict(sale_query)
+        if state["next_month"]:
+            query["created_at"] = {"$gte": state["next_month"]}
+        first = await db.bills.find(query, {"_id": 0, "created_at": 1}).sort("created_at", 1).limit(1).to_list(1)
+        if not first:
+            break
+        month_start = first[0]["created_at"].replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        month_end = (month_start + timedelta(days=32)).replace(day=1)
+        
+        rows: Dict[Tuple[str, str, str], dict] = {}
+        cursor = db.bills.find({**sale_query, "created_at": {"$gte": month_start, "$lt": month_end}}, bill_reads.projection)
+        batch, bill_count = [], 0
+        async for doc in cursor:
+            batch.append(Bill(**doc))
+            if len(batch) >= batch_size:
+                merge_sales_rows(rows, sales_rollup_rows(batch, await lookup_plants([i.plant_id for b in batch for i in b.items])))
+                bill_count += len(batch)
+                batch = []
+        if batch:
+            merge_sales_rows(rows, sales_rollup_rows(batch, await lookup_plants([i.plant_id for b in batch for i in b.items])))
+            bill_count += len(batch)
+        
+        daily, monthly = sales_rollup_ops(rows, replace=True)
+        for collection, ops in ((db.sales_daily, daily), (db.sales_monthly, monthly)):
+            for start in range(0, len(ops), batch_size):
+                await collection.bulk_write(ops[start:start + batch_size], ordered=False)
+        state.update(next_month=month_end, months=state["months"] + 1, bills=state["bills"] + bill_count)
+        saved = await db.backfill_state.update_one(owned, {"$set": {
+            "next_month": month_end, "months": state["months"], "bills": state["bills"]
+        }})
+        if not saved.matched_count:
+            return state
+    
+    state.update(status="done", finished_at=datetime.now(timezone.utc))
+    saved = await db.backfill_state.update_one(owned, {"$set": {
+        "status": "done", "finished_at": state["finished_at"]
+    }})
+    if saved.matched_count:
+        await refresh_sales_velocity(force=True)
+    return state
+
+async def seed_sales_rollups():
+    """Start the first backfill in the background, or resume one that a crash left running.
+
+    Only the worker that records the first backfill starts it.
+    """
+    global sales_backfill_task
+    try:
+        await db.backfill_state.insert_one({"_id": SALES_BACKFILL_ID, "status": "pending"})
+    except DuplicateKeyError:
+        state = await db.backfill_state.find_one({"_id": SALES_BACKFILL_ID}, {"status": 1})
+        if state["status"] != "running":
+            return
+    sales_backfill_task = asyncio.create_task(backfill_sales_rollups())
+
+def merge_sales_rows(into: Dict[Tuple[str, str, str], dict], rows: Dict[Tuple[str, str, str], dict]):
+    for row_key, row in rows.items():
+        if row_key not in into:
+            into[row_key] = row
+            continue
+        for metric in SALES_METRICS:
+            into[row_key][metric] += row[metric]
+
+# Plant Sales Velocity
+# Each plant carries a `sales` subdocument: lifetime units/revenue, last_sold_at, and
+# units/revenue over the last 7 and 30 days. Approvals $inc it; once a day the windows
+# are recomputed from sales_daily so days that age out drop off. Rankings read the
+# sales.* indexes on plants, and days of stock remaining is current_stock over the
+# 30-day daily rate.
+SALES_RANKINGS = ("units", "units_7d", "units_30d", "revenue_30d")
+SALES_VELOCITY_ID = "sales_velocity"
+SALES_VELOCITY_CHECK_SECONDS = 3600
+
+async def record_plant_sales(bills: List[Bill]):
+    now = datetime.now(timezone.utc)
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"units": 0, "revenue": 0})
+    for bill in bills:
+        for item in bill.items:
+            totals[item.plant_id]["units"] += item.quantity
+            totals[item.plant_id]["revenue"] += item.total_price
+    await db.plants.bulk_write([
+        UpdateOne({"id": plant_id}, {
+            "$inc": {
+                f"sales.{field}{window}": total[field]
+                for field in ("units", "revenue") for window in ("", "_7d", "_30d")
+            },
+            "$max": {"sales.last_sold_at": now},
+        })
+        for plant_id, total in totals.items()
+    ], ordered=False)
+
+async def refresh_sales_velocity(force: bool = False) -> bool:
+    """Recompute the rolling windows from sales_daily; runs once per day across all workers"""
+    today = rollup_day(datetime.now(timezone.utc))
+    try:
+        claimed = await db.backfill_state.update_one(
+            {"_id": SALES_VELOCITY_ID, **({} if force else {"day": {"$ne": today}})},
+            {"$set": {"day": today, "refreshed_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Another worker already refreshed today
+        return False
+    if not (claimed.modified_count or claimed.upserted_id):
+        return False
+    
+    try:
+        await apply_sales_velocity()
+    except Exception:
+        # Release today's claim so the next hourly check retries
+        await db.backfill_state.update_one({"_id": SALES_VELOCITY_ID, "day": today}, {"$unset": {"day": ""}})
+        raise
+    return True
+
+async def apply_sales_velocity():
+    """$set each plant's rolling windows from sales_daily and lifetime totals from sales_monthly"""
+    since_30d = rollup_day(datetime.now(timezone.utc) - timedelta(days=29))
+    since_7d = rollup_day(datetime.now(timezone.utc) - timedelta(days=6))
+    windows = await db.sales_daily.aggregate([
+        {"$match": {"dimension": "plant", "date": {"$gte": since_30d}}},
+        {"$group": {
+            "_id": "$key",
+            "units_30d": {"$sum": "$units"},
+            "revenue_30d": {"$sum": "$revenue"},
+            "units_7d": {"$sum": {"$cond": [{"$gte": ["$date", since_7d]}, "$units", 0]}},
+            "revenue_7d": {"$sum": {"$cond": [{"$gte": ["$date", since_7d]}, "$revenue", 0]}},
+        }}
+    ]).to_list(None)
+    lifetime = await db.sales_monthly.aggregate([
+        {"$match": {"dimension": "plant"}},
+        {"$group": {"_id": "$key", "units": {"$sum": "$units"}, "revenue": {"$sum": "$revenue"}}}
+    ]).to_list(None)
+    
+    ops = [
+        UpdateOne({"id": row['_id']}, {"$set": {f"sales.{field}": row[field] for field in row if field != "_id"}})
+        for row in windows + lifetime
+    ]
+    # Plants that sold within the old window but not in the new one
+    ops.append(UpdateMany(
+        {"sales.units_30d": {"$gt": 0}, "id": {"$nin": [row['_id'] for row in windows]}},
+        {"$set": {f"sales.{field}": 0 for field in ("units_7d", "revenue_7d", "units_30d", "revenue_30d")}}
+    ))
+    await db.plants.bulk_write(ops, ordered=False)
+
+async def sales_velocity_loop():
+    while True:
+        try:
+            await refresh_sales_velocity()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Sales velocity refresh failed: {str(e)}")
+        await asyncio.sleep(SALES_VELOCITY_CHECK_SECONDS)
+
+def days_of_stock(plant: dict) -> Optional[float]:
+    """Days until current stock runs out at the last 30 days' pace; None if it has not sold"""
+    units_30d = plant.get("sales", {}).get("units_30d", 0)
+    if units_30d <= 0:
+        return None
+    return round(plant['current_stock'] / (units_30d / 30), 1)
+
+def velocity_response(plant: dict) -> dict:
+    return {
+        "id": plant['id'],
+        "name": plant['name'],
+        "category": plant['category'],
+        "current_stock": plant['current_stock'],
+        "sales": plant.get("sales", {}),
+        "days_of_stock": days_of_stock(plant),
+    }
+
+VELOCITY_PROJECTION = {"_id": 0, "id": 1, "name": 1, "category": 1, "current_stock": 1, "sales": 1}
+
 # Bill Management Routes
 @api_router.post("/bills", response_model=Bill)
 async def create_bill(bill_data: BillCreate, current_user: User = Depends(get_current_user)):
@@ -287,19 +2332,18 @@ async def create_bill(bill_data: BillCreate, current_user: User = Depends(get_cu
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    # Calculate totals
-    subtotal = sum(item.total_price for item in bill_data.items)
+    items, subtotal = await price_items(bill_data.items)
     total_amount = subtotal + bill_data.tax - bill_data.discount
     
     # Generate bill number
-    bill_count = await db.bills.count_documents({}) + 1
-    bill_number = f"SKN-{bill_count:06d}"
+    bill_seq = await bill_sequence.next()
+    bill_number = f"SKN-{bill_seq:06d}"
     
     bill_obj = Bill(
         bill_number=bill_number,
         customer_id=bill_data.customer_id,
         customer_name=customer['name'],
-        items=bill_data.items,
+        items=items,
         subtotal=subtotal,
         tax=bill_data.tax,
         discount=bill_data.discount,
@@ -309,29 +2353,203 @@ async def create_bill(bill_data: BillCreate, current_user: User = Depends(get_cu
         status="pending" if current_user.role == "cashier" else "approved"
     )
     
-    await db.bills.insert_one(bill_obj.dict())
+    bill_doc = bill_obj.dict()
+    bill_doc.update(search_fields("bills", bill_doc))
+    await db.bills.insert_one(bill_doc)
+    
+    # Cashier bills move stock when an admin approves them. The bill is stored first, so
+    # stock never leaves without one; a failed movement takes the bill back out.
+    if bill_obj.status == "approved":
+        try:
+            await apply_bill_stock_movement(bill_obj, current_user.id)
+        except Exception:
+            await db.bills.delete_one({"id": bill_obj.id})
+            raise
+        await record_sale_in_rollups(bill_obj)
+    await cache_bus.publish("analytics")
+    await live_events.publish("bill_created", bill_obj.model_dump(mode="json"))
+    if bill_obj.status == "approved":
+        await live_events.publish_stock([item.plant_id for item in bill_obj.items])
     return bill_obj
 
-@api_router.get("/bills", response_model=List[Bill])
-async def get_bills(skip: int = 0, limit: int = 100, current_user: User = Depends(get_current_user)):
-    bills = await db.bills.find().skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
-    return [Bill(**bill) for bill in bills]
+@api_router.get("/bills", response_model=Union[List[Bill], Page[Bill]])
+async def get_bills(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, stream: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    if cursor is not None:
+        bills, next_cursor = await keyset_page(db.bills, {}, cursor, limit, bill_reads.projection)
+        return bill_reads.page_response(bills, next_cursor)
+    query = db.bills.find({}, bill_reads.projection).skip(skip).limit(limit).sort("created_at", -1)
+    if stream:
+        return bill_reads.stream_response(query, stream)
+    return bill_reads.response(await query.to_list(limit or None))
 
 @api_router.get("/bills/pending", response_model=List[Bill])
 async def get_pending_bills(current_user: User = Depends(require_role(["admin"]))):
-    bills = await db.bills.find({"status": "pending"}).sort("created_at", -1).to_list(100)
-    return [Bill(**bill) for bill in bills]
+    return Response(orjson.dumps(await pending_bills_snapshot()), media_type="application/json")
 
 @api_router.put("/bills/{bill_id}/approve")
 async def approve_bill(bill_id: str, current_user: User = Depends(require_role(["admin"]))):
-    result = await db.bills.update_one(
-        {"id": bill_id},
-        {"$set": {"status": "approved", "approved_by": current_user.id}}
+    # Claiming the pending bill first means a double click can never move stock twice
+    bill = await db.bills.find_one_and_update(
+        {"id": bill_id, "status": "pending"},
+        {"$set": {"status": "approved", "approved_by": current_user.id}},
+        return_document=ReturnDocument.AFTER
     )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Bill not found")
+    if not bill:
+        existing = await db.bills.find_one({"id": bill_id}, {"_id": 0, "status": 1})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Bill not found")
+        if existing['status'] != "approved":
+            raise HTTPException(status_code=409, detail=f"Bill is {existing['status']}")
+        return {"message": "Bill already approved"}
+    
+    bill_obj = Bill(**bill)
+    try:
+        await apply_bill_stock_movement(bill_obj, current_user.id)
+    except Exception:
+        await db.bills.update_one({"id": bill_id}, {"$set": {"status": "pending", "approved_by": None}})
+        raise
+    await record_sale_in_rollups(bill_obj)
+    await cache_bus.publish("analytics")
+    await live_events.publish("bill_approved", bill_obj.model_dump(mode="json"))
+    await live_events.publish_stock([item.plant_id for item in bill_obj.items])
     return {"message": "Bill approved successfully"}
 
+def bulk_bill_query(action: BillBulkAction) -> dict:
+    query: Dict[str, Any] = {"status": "pending"}
+    if action.bill_ids is not None:
+        query["id"] = {"$in": action.bill_ids}
+    if action.cashier_id:
+        query["created_by"] = action.cashier_id
+    created: Dict[str, datetime] = {}
+    if action.created_from:
+        created["$gte"] = action.created_from
+    if action.created_to:
+        created["$lte"] = action.created_to
+    if created:
+        query["created_at"] = created
+    if action.max_amount is not None:
+        query["total_amount"] = {"$lte": action.max_amount}
+    if len(query) == 1:
+        raise HTTPException(status_code=400, detail="Pass bill_ids or at least one filter")
+    return query
+
+def allocate_stock(bills: List[Bill], in_stock: Dict[str, int]) -> Tuple[List[Bill], Dict[str, str]]:
+    """Approve bills oldest first while stock lasts; returns accepted bills and shortages by bill id"""
+    remaining = dict(in_stock)
+    accepted, short = [], {}
+    for bill in bills:
+        quantities, names = bill_quantities(bill)
+        missing = [
+            f"{names[plant_id]} (requested {quantity}, available {remaining.get(plant_id, 0)})"
+            for plant_id, quantity in quantities.items()
+            if remaining.get(plant_id, 0) < quantity
+        ]
+        if missing:
+            short[bill.id] = f"Insufficient stock: {', '.join(missing)}"
+            continue
+        for plant_id, quantity in quantities.items():
+            remaining[plant_id] -= quantity
+        accepted.append(bill)
+    return accepted, short
+
+async def approve_claimed_bills(bills: List[Bill], user_id: str) -> Tuple[List[Bill], Dict[str, str]]:
+    """Move stock for already-claimed bills, in one bulk_write when nothing changes underneath"""
+    plant_ids = list({item.plant_id for bill in bills for item in bill.items})
+    plants = await db.plants.find({"id": {"$in": plant_ids}}, {"_id": 0, "id": 1, "current_stock": 1}).to_list(None)
+    accepted, short = allocate_stock(bills, {plant['id']: plant['current_stock'] for plant in plants})
+    
+    totals: Dict[str, int] = defaultdict(int)
+    for bill in accepted:
+        for plant_id, quantity in bill_quantities(bill)[0].items():
+            totals[plant_id] += quantity
+    now = datetime.now(timezone.utc)
+    if not totals or await take_stock(totals, f"bulk:{uuid.uuid4()}", now):
+        ledger = [entry for bill in accepted for entry in sale_ledger_entries(bill, user_id, now)]
+        if ledger:
+            await db.stock_ledger.insert_many(ledger)
+        return accepted, short
+    
+    # A concurrent sale took stock since it was read; settle bill by bill instead
+    settled = []
+    for bill in accepted:
+        try:
+            await apply_bill_stock_movement(bill, user_id)
+            settled.append(bill)
+        except HTTPException as e:
+            short[bill.id] = e.detail
+    return settled, short
+
+@api_router.post("/bills/bulk-status")
+async def bulk_update_bill_status(action: BillBulkAction, current_user: User = Depends(require_role(["admin"]))):
+    """Approve or reject many pending bills in one call, reporting an outcome per bill"""
+    if action.action not in ("approve", "reject"):
+        raise HTTPException(status_code=400, detail="action must be approve or reject")
+    query = bulk_bill_query(action)
+    limit = max(1, min(action.limit, BULK_BILL_LIMIT))
+    if action.bill_ids is not None and len(action.bill_ids) > limit:
+        raise HTTPException(status_code=400, detail=f"At most {limit} bill_ids per request")
+    candidates = await db.bills.find(query, {"_id": 0, "id": 1}).sort("created_at", 1).limit(limit).to_list(limit)
+    ids = [candidate['id'] for candidate in candidates]
+    
+    # Claim every bill in one write, as approve_bill does for one, so no bill is settled twice
+    claim = str(uuid.uuid4())
+    new_status = "approved" if action.action == "approve" else "rejected"
+    await db.bills.update_many(
+        {"id": {"$in": ids}, "status": "pending"},
+        {"$set": {"status": new_status, "approved_by": current_user.id, "bulk_claim": claim}}
+    )
+    claimed_docs = await db.bills.find(
+        {"id": {"$in": ids}, "bulk_claim": claim}, bill_reads.projection
+    ).sort("created_at", 1).to_list(None)
+    claimed = [Bill(**doc) for doc in claimed_docs]
+    
+    succeeded, failed = claimed, {}
+    if action.action == "approve" and claimed:
+        succeeded, failed = await approve_claimed_bills(claimed, current_user.id)
+    if claimed:
+        await db.bills.bulk_write([
+            UpdateMany(
+                {"id": {"$in": list(failed)}, "bulk_claim": claim},
+                {"$set": {"status": "pending", "approved_by": None}, "$unset": {"bulk_claim": ""}}
+            ),
+            UpdateMany({"id": {"$in": ids}, "bulk_claim": claim}, {"$unset": {"bulk_claim": ""}}),
+        ], ordered=True)
+    
+    results = [
+        {"bill_id": bill.id, "bill_number": bill.bill_number, "outcome": "insufficient_stock", "detail": failed[bill.id]}
+        if bill.id in failed else
+        {"bill_id": bill.id, "bill_number": bill.bill_number, "outcome": new_status}
+        for bill in claimed
+    ]
+    claimed_ids = {bill.id for bill in claimed}
+    # Requested ids that were not claimed: settled by someone else meanwhile, or never existed
+    unclaimed = [bill_id for bill_id in (action.bill_ids or ids) if bill_id not in claimed_ids]
+    if unclaimed:
+        statuses = {
+            doc['id']: doc['status']
+            for doc in await db.bills.find({"id": {"$in": unclaimed}}, {"_id": 0, "id": 1, "status": 1}).to_list(None)
+        }
+        results.extend(
+            {"bill_id": bill_id, "outcome": "not_pending", "detail": f"Bill is {statuses[bill_id]}"}
+            if bill_id in statuses else
+            {"bill_id": bill_id, "outcome": "not_found"}
+            for bill_id in unclaimed
+        )
+    
+    if action.action == "approve" and succeeded:
+        await record_sales_in_rollups(succeeded)
+        await cache_bus.publish("analytics")
+        await live_events.publish_stock([item.plant_id for bill in succeeded for item in bill.items])
+    await live_events.publish_many([(f"bill_{new_status}", bill.model_dump(mode="json")) for bill in succeeded])
+    
+    return {
+        "action": action.action,
+        "matched": len(ids),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "results": results,
+    }
+
 # Quotation Management Routes
 @api_router.post("/quotations", response_model=Quotation)
 async def create_quotation(quotation_data: QuotationCreate, current_user: User = Depends(get_current_user)):
@@ -339,11 +2557,11 @@ async def create_quotation(quotation_data: QuotationCreate, current_user: User =
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    subtotal = sum(item.total_price for item in quotation_data.items)
+    items, subtotal = await price_items(quotation_data.items)
     total_amount = subtotal + quotation_data.tax - quotation_data.discount
     
-    quotation_count = await db.quotations.count_documents({}) + 1
-    quotation_number = f"SKN-Q-{quotation_count:06d}"
+    quotation_seq = await quotation_sequence.next()
+    quotation_number = f"SKN-Q-{quotation_seq:06d}"
     
     valid_until = datetime.now(timezone.utc) + timedelta(days=quotation_data.valid_days)
     
@@ -351,7 +2569,7 @@ async def create_quotation(quotation_data: QuotationCreate, current_user: User =
         quotation_number=quotation_number,
         customer_id=quotation_data.customer_id,
         customer_name=customer['name'],
-        items=quotation_data.items,
+        items=items,
         subtotal=subtotal,
         tax=quotation_data.tax,
         discount=quotation_data.discount,
@@ -360,69 +2578,347 @@ async def create_quotation(quotation_data: QuotationCreate, current_user: User =
         created_by=current_user.id
     )
     
-    await db.quotations.insert_one(quotation_obj.dict())
+    quotation_doc = quotation_obj.dict()
+    quotation_doc.update(search_fields("quotations", quotation_doc))
+    await db.quotations.insert_one(quotation_doc)
     return quotation_obj
 
-@api_router.get("/quotations", response_model=List[Quotation])
-async def get_quotations(skip: int = 0, limit: int = 100, current_user: User = Depends(get_current_user)):
-    quotations = await db.quotations.find().skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
-    return [Quotation(**quotation) for quotation in quotations]
+@api_router.get("/quotations", response_model=Union[List[Quotation], Page[Quotation]])
+async def get_quotations(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, stream: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    if cursor is not None:
+        quotations, next_cursor = await keyset_page(db.quotations, {}, cursor, limit, quotation_reads.projection)
+        return quotation_reads.page_response(quotations, next_cursor)
+    query = db.quotations.find({}, quotation_reads.projection).skip(skip).limit(limit).sort("created_at", -1)
+    if stream:
+        return quotation_reads.stream_response(query, stream)
+    return quotation_reads.response(await query.to_list(limit or None))
 
-# Dashboard Analytics Routes
-@api_router.get("/analytics/dashboard")
-async def get_dashboard_analytics(current_user: User = Depends(get_current_user)):
-    # Total sales
-    total_sales_pipeline = [
-        {"$match": {"status": {"$ne": "pending"}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-    ]
-    total_sales_result = await db.bills.aggregate(total_sales_pipeline).to_list(1)
-    total_sales = total_sales_result[0]['total'] if total_sales_result else 0
-    
-    # Total plants
-    total_plants = await db.plants.count_documents({})
+# Search Routes
+SEARCH_MODELS = {"plants": Plant, "customers": Customer, "bills": Bill, "quotations": Quotation}
+
+@api_router.get("/search")
+async def search(q: str, types: str = "plants,customers,bills,quotations", limit: int = 10, current_user: User = Depends(get_current_user)):
+    limit = max(1, min(limit, SEARCH_CANDIDATES))
+    results = {}
+    for collection_name in types.split(","):
+        collection_name = collection_name.strip()
+        if collection_name not in SEARCH_MODELS:
+            raise HTTPException(status_code=400, detail=f"Unknown search type: {collection_name}")
+        docs = await run_search(collection_name, q, limit)
+        results[collection_name] = [SEARCH_MODELS[collection_name](**doc) for doc in docs]
+    return results
+
+# Live Updates
+class LiveEventHub:
+    """Pushes bill and stock events to /live subscribers.
+
+    Each event is encoded once and queued for every subscriber. A subscriber that falls
+    LIVE_QUEUE_SIZE events behind gets a resync event and is disconnected, to reconnect
+    for a fresh snapshot.
+    """
+    def __init__(self, source: str):
+        self.source = source
+        self.subscribers: set = set()
+        self.published = 0
+        self.resyncs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def broadcast(self, event: str, data):
+        payload = sse_event(event, data)
+        self.published += 1
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.resyncs += 1
+                self.disconnect(queue)
+
+    def disconnect(self, queue: asyncio.Queue):
+        # Drop whatever is queued so the end-of-stream marker fits
+        self.unsubscribe(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def publish(self, event: str, data):
+        """Called by the write paths; with change streams the watcher publishes instead"""
+        await self.publish_many([(event, data)])
+
+    async def publish_many(self, events: List[Tuple[str, Any]]):
+        if not events:
+            return
+        if self.source == "bus":
+            # One bus message per call; every worker, this one included, broadcasts it on delivery
+            await cache_bus.publish("live", orjson.dumps(events).decode())
+        elif self.source == "local" and self.subscribers:
+            for event, data in events:
+                self.broadcast(event, data)
+
+    def receive(self, message: Optional[str]):
+        if not self.subscribers:
+            return
+        if message is None:
+            # The bus listener reconnected and may have missed events
+            self.broadcast("resync", {})
+            return
+        for event, data in orjson.loads(message):
+            self.broadcast(event, data)
+
+    async def publish_stock(self, plant_ids: List[str], created: bool = False):
+        if self.source == "bus" or (self.source == "local" and self.subscribers):
+            plants = await db.plants.find({"id": {"$in": list(set(plant_ids))}}, {"_id": 0}).to_list(None)
+            await self.publish_many(await self.stock_events(plants, created))
+
+    async def stock_events(self, plants: List[dict], created: bool = False) -> List[Tuple[str, dict]]:
+        low_stock_alerts = await db.plants.count_documents(LOW_STOCK_QUERY)
+        return [("stock_changed", {
+            "plant_id": plant['id'],
+            "name": plant['name'],
+            "current_stock": plant['current_stock'],
+            "low_stock": plant.get('stock_headroom', 1) <= 0,
+            "low_stock_alerts": low_stock_alerts,
+            "created": created,
+        }) for plant in plants]
+
+    async def start(self):
+        if self.source == "changestream":
+            self._task = asyncio.create_task(self.watch())
+        elif self.source == "bus":
+            cache_bus.subscribe("live", self.receive)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for queue in list(self.subscribers):
+            self.disconnect(queue)
+
+    async def watch(self):
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": ["bills", "plants", "analytics_rollups"]},
+            "operationType": {"$in": ["insert", "update", "replace"]},
+        }}]
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup") as stream:
+                    async for change in stream:
+                        await self.on_change(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Live updates change stream disconnected: {str(e)}")
+                await asyncio.sleep(1)
+            # Changes made while disconnected were missed
+            self.broadcast("resync", {})
+
+    async def on_change(self, change: dict):
+        doc = change.get("fullDocument")
+        if not doc:
+            return
+        updated = change.get("updateDescription", {}).get("updatedFields", {})
+        inserted = change["operationType"] == "insert"
+        if change["ns"]["coll"] == "analytics_rollups":
+            if doc['_id'] == DASHBOARD_ROLLUP_ID and "sales_version" in updated:
+                self.broadcast("sales_total", {"total_sales": doc['total_sales'], "sales_version": doc['sales_version']})
+        elif change["ns"]["coll"] == "bills":
+            if inserted:
+                self.broadcast("bill_created", Bill(**doc).model_dump(mode="json"))
+            elif updated.get("status") in ("approved", "rejected"):
+                self.broadcast(f"bill_{updated['status']}", Bill(**doc).model_dump(mode="json"))
+        elif inserted or "current_stock" in updated or change["operationType"] == "replace":
+            for event, data in await self.stock_events([doc], created=inserted):
+                self.broadcast(event, data)
+
+    def stats(self):
+        return {
+            "source": self.source,
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+live_events = LiveEventHub(LIVE_EVENTS_SOURCE)
+
+async def dashboard_snapshot() -> dict:
+    # Total sales and plants come from the running rollup
+    rollup = await db.analytics_rollups.find_one({"_id": DASHBOARD_ROLLUP_ID}) or {}
+    total_sales = rollup.get('total_sales', 0)
+    total_plants = rollup.get('total_plants', 0)
+    sales_version = rollup.get('sales_version', 0)
     
     # Low stock alerts
-    low_stock_count = await db.plants.count_documents({"$expr": {"$lte": ["$current_stock", "$min_stock_threshold"]}})
+    low_stock_count = await db.plants.count_documents(LOW_STOCK_QUERY)
     
     # Recent bills
-    recent_bills = await db.bills.find().sort("created_at", -1).limit(5).to_list(5)
+    recent_bills = await db.bills.find({}, bill_reads.projection).sort("created_at", -1).limit(5).to_list(5)
     
     return {
         "total_sales": total_sales,
+        "sales_version": sales_version,
         "total_plants": total_plants,
         "low_stock_alerts": low_stock_count,
-        "recent_bills": [Bill(**bill) for bill in recent_bills]
+        "recent_bills": [bill_reads.fill(bill) for bill in recent_bills]
     }
 
+async def pending_bills_snapshot() -> List[dict]:
+    bills = await db.bills.find({"status": "pending"}, bill_reads.projection).sort("created_at", -1).to_list(100)
+    return [bill_reads.fill(bill) for bill in bills]
+
+@api_router.get("/live")
+async def live_updates(current_user: User = Depends(get_current_user)):
+    """Server-sent events: one snapshot, then bill_created, bill_approved, bill_rejected, sales_total, stock_changed and resync deltas"""
+    queue = live_events.subscribe()
+    
+    async def events():
+        try:
+            # Subscribed before the snapshot is read, so no event falls in between; clients dedupe
+            # bills by id and keep the sales_total with the highest sales_version
+            snapshot = {
+                "dashboard": await dashboard_snapshot(),
+                "pending_bills": await pending_bills_snapshot() if current_user.role == "admin" else [],
+            }
+            yield sse_event("snapshot", snapshot)
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if payload is None:
+                    yield sse_event("resync", {})
+                    return
+                yield payload
+        finally:
+            live_events.unsubscribe(queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Dashboard Analytics Routes
+@api_router.get("/analytics/dashboard")
+async def get_dashboard_analytics(current_user: User = Depends(get_current_user)):
+    return await dashboard_snapshot()
+
+@api_router.get("/analytics/daily")
+async def get_daily_analytics(days: int = 30, current_user: User = Depends(get_current_user)):
+    since = rollup_day(datetime.now(timezone.utc) - timedelta(days=days))
+    buckets = await db.analytics_rollups.find(
+        {"_id": {"$gte": f"day:{since}", "$lte": "day:9999-12-31"}}, {"_id": 0}
+    ).sort("_id", 1).to_list(days + 1)
+    return buckets
+
+@api_router.get("/reports/sales")
+async def get_sales_report(
+    group_by: str = "all",
+    period: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    key: Optional[str] = None,
+    current_user: User = Depends(require_role(["admin", "manager"]))
+):
+    """Revenue, bill count, average ticket and units per bucket, read from the sales rollups.
+
+    Plant and category revenue is line revenue before bill-level tax and discount. Month
+    buckets always cover whole calendar months.
+    """
+    if group_by not in SALES_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(SALES_DIMENSIONS)}")
+    if period not in ("day", "week", "month"):
+        raise HTTPException(status_code=400, detail="period must be day, week or month")
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    
+    query: Dict[str, Any] = {"dimension": group_by}
+    if key is not None:
+        query["key"] = key
+    projection = {"_id": 0, "key": 1, "label": 1, **{metric: 1 for metric in SALES_METRICS}}
+    if period == "month":
+        query["month"] = {"$gte": start.strftime("%Y-%m"), "$lte": end.strftime("%Y-%m")}
+        rows = await db.sales_monthly.find(query, {**projection, "month": 1}).to_list(None)
+        for row in rows:
+            row['bucket'] = row.pop('month')
+    else:
+        query["date"] = {"$gte": start.isoformat(), "$lte": end.isoformat()}
+        if period == "day":
+            rows = await db.sales_daily.find(query, {**projection, "date": 1}).to_list(None)
+            for row in rows:
+                row['bucket'] = row.pop('date')
+        else:
+            rows = await db.sales_daily.aggregate([
+                {"$match": query},
+                {"$group": {
+                    "_id": {"bucket": "$week", "key": "$key"},
+                    "label": {"$last": "$label"},
+                    **{metric: {"$sum": f"${metric}"} for metric in SALES_METRICS},
+                }},
+                {"$project": {"_id": 0, "bucket": "$_id.bucket", "key": "$_id.key", "label": 1, **{metric: 1 for metric in SALES_METRICS}}},
+            ]).to_list(None)
+    
+    if group_by == "cashier":
+        users = await db.users.find({"id": {"$in": list({row['key'] for row in rows})}}, {"_id": 0, "id": 1, "full_name": 1}).to_list(None)
+        names = {user['id']: user['full_name'] for user in users}
+        for row in rows:
+            row['label'] = names.get(row['key'], row['label'])
+    for row in rows:
+        row['revenue'] = round(row['revenue'], 2)
+        row['average_ticket'] = round(row['revenue'] / row['bill_count'], 2) if row['bill_count'] else 0
+    rows.sort(key=lambda row: (row['bucket'], -row['revenue']))
+    return {"group_by": group_by, "period": period, "start": start, "end": end, "buckets": rows}
+
+@api_router.post("/admin/analytics/sales-backfill")
+async def start_sales_backfill(restart: bool = False, current_user: User = Depends(require_role(["admin"]))):
+    global sales_backfill_task
+    if sales_backfill_task and not sales_backfill_task.done():
+        raise HTTPException(status_code=409, detail="Sales backfill already running")
+    # Cancelled on shutdown rather than awaited; it resumes on the next call
+    sales_backfill_task = asyncio.create_task(backfill_sales_rollups(restart=restart))
+    return {"started": True, "restart": restart}
+
+@api_router.get("/admin/analytics/sales-backfill")
+async def get_sales_backfill(current_user: User = Depends(require_role(["admin"]))):
+    state = await db.backfill_state.find_one({"_id": SALES_BACKFILL_ID}, {"_id": 0})
+    return {"running": bool(sales_backfill_task and not sales_backfill_task.done()), "state": state}
+
+sales_backfill_task: Optional[asyncio.Task] = None
+sales_velocity_task: Optional[asyncio.Task] = None
+
 # Chat History Models
 class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     session_id: str
     user_message: str
     ai_response: str
+    cached: bool = False
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ChatMessageCreate(BaseModel):
     session_id: str
     user_message: str
 
-# Chatbot Routes
-@api_router.post("/chat", response_model=ChatMessage)
-async def chat_with_ai(chat_data: ChatMessageCreate, current_user: User = Depends(get_current_user)):
-    try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        
-        # Get Gemini API key from environment
-        gemini_api_key = os.environ.get('GEMINI_API_KEY')
-        if not gemini_api_key:
-            raise HTTPException(status_code=500, detail="Gemini API key not configured")
-        
-        # Initialize Gemini chat
-        chat = LlmChat(
-            api_key=gemini_api_key,
-            session_id=chat_data.session_id,
-            system_message="""You are an AI assistant for Shree Krishna Nursery Management System. 
+class ChatSession(BaseModel):
+    """Per-session summary kept next to chat_history, so opening a chat never scans its messages"""
+    session_id: str
+    user_id: Optional[str] = None
+    title: str
+    message_count: int = 0
+    started_at: datetime
+    last_message_at: datetime
+    last_user_message: str = ""
+    last_ai_response: str = ""
+
+chat_message_reads = TrustedDocs(ChatMessage)
+
+# Chat Clients
+KRISHNA_AI_SYSTEM_MESSAGE = """You are an AI assistant for Shree Krishna Nursery Management System. 
             You are Krishna AI, an expert plant care specialist and nursery management assistant for Shree Krishna Nursery. 
             You have extensive knowledge about:
             
@@ -460,20 +2956,236 @@ async def chat_with_ai(chat_data: ChatMessageCreate, current_user: User = Depend
             
             Always provide practical, actionable advice. Be friendly, professional, and demonstrate deep 
             plant knowledge while helping users maximize their nursery management efficiency."""
-        ).with_model("gemini", "gemini-2.0-flash")
+
+class FakeUserMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeLlmChat:
+    """Offline stand-in for LlmChat, selected with LLM_BACKEND=fake"""
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.messages: List[str] = []
+
+    async def send_message(self, user_message) -> str:
+        self.messages.append(user_message.text)
+        if FAKE_LLM_DELAY_SECONDS:
+            await asyncio.sleep(FAKE_LLM_DELAY_SECONDS)
+        return f"Krishna AI (offline) reply #{len(self.messages)}"
+
+    async def stream_message(self, user_message) -> AsyncIterator[str]:
+        self.messages.append(user_message.text)
+        words = f"Krishna AI (offline) reply #{len(self.messages)}".split(" ")
+        for index, word in enumerate(words):
+            if FAKE_LLM_DELAY_SECONDS:
+                await asyncio.sleep(FAKE_LLM_DELAY_SECONDS / len(words))
+            yield word if index == 0 else f" {word}"
+
+def create_chat_client(session_id: str):
+    if LLM_BACKEND == "fake":
+        return FakeLlmChat(session_id)
+    from emergentintegrations.llm.chat import LlmChat
+    
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="Gemini API key not configured")
+    return LlmChat(
+        api_key=GEMINI_API_KEY,
+        session_id=session_id,
+        system_message=KRISHNA_AI_SYSTEM_MESSAGE
+    ).with_model("gemini", "gemini-2.0-flash")
+
+def create_user_message(text: str):
+    if LLM_BACKEND == "fake":
+        return FakeUserMessage(text)
+    from emergentintegrations.llm.chat import UserMessage
+    return UserMessage(text=text)
+
+async def stream_chat_reply(chat, user_message) -> AsyncIterator[str]:
+    """Reply tokens as the backend produces them.
+
+    LlmChat only exposes send_message, so Gemini replies arrive as a single chunk;
+    clients with stream_message (the fake backend) stream token by token.
+    """
+    if hasattr(chat, "stream_message"):
+        async for token in chat.stream_message(user_message):
+            yield token
+    else:
+        yield await chat.send_message(user_message)
+
+# Idle sessions drop out after CHAT_CLIENT_IDLE_SECONDS; each use renews the deadline
+chat_clients = TTLCache(maxsize=CHAT_CLIENT_POOL_SIZE, ttl=CHAT_CLIENT_IDLE_SECONDS)
+
+def get_chat_client(session_id: str):
+    chat = chat_clients.get(session_id)
+    if chat is None:
+        chat = create_chat_client(session_id)
+    chat_clients.set(session_id, chat)
+    return chat
+
+class AIContextSnapshot:
+    """get_app_context_for_ai() result shared by every chat turn.
+
+    Once warm, an expired or invalidated snapshot is served while a single background
+    task rebuilds it, so chat turns never wait on the context queries.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.value: Optional[str] = None
+        self.expires_at = 0.0
+        self.refreshes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self) -> str:
+        if self.value is None:
+            await self.refresh()
+        elif time.monotonic() >= self.expires_at and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.refresh())
+        return self.value
+
+    async def refresh(self):
+        self.value = await get_app_context_for_ai()
+        self.expires_at = time.monotonic() + self.ttl
+        self.refreshes += 1
+
+    def invalidate(self):
+        self.expires_at = 0.0
+
+    def stats(self):
+        return {"ttl_seconds": self.ttl, "refreshes": self.refreshes, "warm": self.value is not None}
+
+ai_context = AIContextSnapshot(ttl=AI_CONTEXT_TTL_SECONDS)
+cache_bus.subscribe("plants", lambda plant_id: ai_context.invalidate())
+cache_bus.subscribe("analytics", lambda _: ai_context.invalidate())
+
+# Questions touching live nursery data get a fresh answer from the current context every time
+INVENTORY_TERMS = {
+    "stock", "inventory", "available", "availability", "left", "remaining", "sales", "sold", "selling",
+    "revenue", "profit", "bill", "bills", "quotation", "quotations", "customer", "customers", "order",
+    "orders", "price", "prices", "cost", "today", "yesterday", "week", "month", "dashboard", "report",
+    "total", "count", "many", "reorder", "pending", "approve", "approved", "cashier", "payment",
+}
+
+def normalize_question(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def depends_on_inventory(question: str) -> bool:
+    return any(word in INVENTORY_TERMS for word in question.split())
+
+class ChatResponseCache:
+    """Reuses Krishna AI answers to general questions, keyed on the normalized question text.
+
+    With CHAT_CACHE_EMBEDDING_MODEL set (needs sentence-transformers), a miss on the exact key
+    falls back to the closest cached question whose cosine similarity reaches CHAT_CACHE_SIMILARITY.
+    """
+    def __init__(self, maxsize: int, ttl: float, embedding_model: str = "", similarity: float = 0.92):
+        self.answers = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.embedding_model = embedding_model
+        self.similarity = similarity
+        self.vectors: Dict[str, Any] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._encoder = None
+
+    def cacheable(self, question: str) -> bool:
+        if depends_on_inventory(question):
+            self.bypassed += 1
+            return False
+        return True
+
+    async def embed(self, question: str):
+        if self._encoder is None:
+            from sentence_transformers import SentenceTransformer
+            self._encoder = await asyncio.to_thread(SentenceTransformer, self.embedding_model)
+        return await asyncio.to_thread(self._encoder.encode, question, normalize_embeddings=True)
+
+    async def get(self, question: str) -> Optional[str]:
+        answer = self.answers.peek(question)
+        if answer is None and self.embedding_model:
+            answer = await self.nearest(question)
+            if answer is not None:
+                self.semantic_hits += 1
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer
+
+    async def nearest(self, question: str) -> Optional[str]:
+        # Drop vectors whose answers were evicted or expired
+        self.vectors = {key: vector for key, vector in self.vectors.items() if key in self.answers}
+        if not self.vectors:
+            return None
+        import numpy as np
+        vector = await self.embed(question)
+        keys = list(self.vectors)
+        scores = np.stack([self.vectors[key] for key in keys]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        return self.answers.peek(keys[best])
+
+    async def set(self, question: str, answer: str):
+        self.answers.set(question, answer)
+        if self.embedding_model:
+            self.vectors[question] = await self.embed(question)
+
+    def clear(self) -> int:
+        purged = len(self.answers)
+        self.answers.clear()
+        self.vectors.clear()
+        return purged
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            **self.answers.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "semantic_hits": self.semantic_hits,
+            "bypassed_inventory": self.bypassed,
+            "embedding_model": self.embedding_model or None,
+        }
+
+chat_responses = ChatResponseCache(
+    maxsize=CHAT_CACHE_MAXSIZE,
+    ttl=CHAT_CACHE_TTL_SECONDS,
+    embedding_model=CHAT_CACHE_EMBEDDING_MODEL,
+    similarity=CHAT_CACHE_SIMILARITY,
+)
+# Only purged by an admin; reconnects of the invalidation listener leave it alone
+cache_bus.subscribe("chat_responses", lambda key: chat_responses.clear() if key == "purge" else None)
+
+# Chatbot Routes
+@api_router.post("/chat", response_model=ChatMessage)
+async def chat_with_ai(chat_data: ChatMessageCreate, current_user: User = Depends(get_current_user)):
+    try:
+        question = normalize_question(chat_data.user_message)
+        cacheable = chat_responses.cacheable(question)
+        ai_response = await chat_responses.get(question) if cacheable else None
+        cached = ai_response is not None
         
-        # Send message to Gemini
-        user_message = UserMessage(text=chat_data.user_message)
-        ai_response = await chat.send_message(user_message)
+        if not cached:
+            chat = get_chat_client(chat_data.session_id)
+            context = await ai_context.get()
+            
+            # Send message to Gemini with the current nursery snapshot
+            user_message = create_user_message(f"{context}\nUser message: {chat_data.user_message}")
+            ai_response = await chat.send_message(user_message)
+            if cacheable:
+                await chat_responses.set(question, ai_response)
         
         # Save chat history to database
         chat_message = ChatMessage(
             session_id=chat_data.session_id,
             user_message=chat_data.user_message,
-            ai_response=ai_response
+            ai_response=ai_response,
+            cached=cached
         )
         
-        await db.chat_history.insert_one(chat_message.dict())
+        await record_chat_turn(chat_message, current_user.id)
         
         return chat_message
         
@@ -481,10 +3193,189 @@ async def chat_with_ai(chat_data: ChatMessageCreate, current_user: User = Depend
         logger.error(f"Chat error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Chat service error: {str(e)}")
 
-@api_router.get("/chat/history/{session_id}")
-async def get_chat_history(session_id: str, current_user: User = Depends(get_current_user)):
-    chat_history = await db.chat_history.find({"session_id": session_id}).sort("timestamp", 1).to_list(100)
-    return [ChatMessage(**chat) for chat in chat_history]
+# In-flight streamed generations on this worker, by stream id
+active_generations: Dict[str, asyncio.Task] = {}
+background_tasks: set = set()
+
+def run_in_background(coro):
+    # Keep a reference so the task is not garbage collected before it finishes
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def sse_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+def chat_preview(text: str, length: int = 200) -> str:
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+async def record_chat_turn(chat_message: ChatMessage, user_id: str):
+    await db.chat_history.insert_one(chat_message.dict())
+    session = await db.chat_sessions.find_one_and_update(
+        {"session_id": chat_message.session_id},
+        {
+            "$inc": {"message_count": 1},
+            "$set": {
+                "last_message_at": chat_message.timestamp,
+                "last_user_message": chat_preview(chat_message.user_message),
+                "last_ai_response": chat_preview(chat_message.ai_response),
+            },
+            "$setOnInsert": {
+                "user_id": user_id,
+                "title": chat_preview(chat_message.user_message, 80),
+                "started_at": chat_message.timestamp,
+            },
+        },
+        upsert=True,
+        projection={"message_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if session["message_count"] >= CHAT_HISTORY_MAX_MESSAGES + CHAT_HISTORY_TRIM_BATCH:
+        deleted = await trim_chat_history(chat_message.session_id)
+        # message_count is the number of turns kept, so it comes down with the trim
+        if deleted:
+            update = {"$inc": {"message_count": -deleted}}
+        else:
+            update = {"$set": {"message_count": await db.chat_history.count_documents({"session_id": chat_message.session_id})}}
+        await db.chat_sessions.update_one({"session_id": chat_message.session_id}, update)
+
+async def trim_chat_history(session_id: str) -> int:
+    """Delete all but the newest CHAT_HISTORY_MAX_MESSAGES turns of a session"""
+    oldest_kept = await db.chat_history.find(
+        {"session_id": session_id}, {"_id": 0, "timestamp": 1, "id": 1}
+    ).sort([("timestamp", -1), ("id", -1)]).skip(CHAT_HISTORY_MAX_MESSAGES - 1).limit(1).to_list(1)
+    if not oldest_kept:
+        return 0
+    older = decode_cursor(encode_cursor(oldest_kept[0], "timestamp"), "timestamp")
+    result = await db.chat_history.delete_many({"session_id": session_id, **older})
+    return result.deleted_count
+
+async def expire_chat_sessions() -> int:
+    """Delete sessions idle for CHAT_SESSION_TTL_DAYS together with their history.
+
+    A session is deleted only while still idle, and only messages from before the cutoff go
+    with it; a turn landing meanwhile starts a fresh session instead of being lost.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=CHAT_SESSION_TTL_DAYS)
+    expired = 0
+    while True:
+        sessions = await db.chat_sessions.find(
+            {"last_message_at": {"$lt": cutoff}}, {"_id": 0, "session_id": 1}
+        ).limit(CHAT_EXPIRY_BATCH).to_list(CHAT_EXPIRY_BATCH)
+        if not sessions:
+            return expired
+        for session in sessions:
+            if await db.chat_sessions.find_one_and_delete({"session_id": session['session_id'], "last_message_at": {"$lt": cutoff}}):
+                await db.chat_history.delete_many({"session_id": session['session_id'], "timestamp": {"$lt": cutoff}})
+                expired += 1
+
+async def chat_expiry_loop():
+    while True:
+        try:
+            expired = await expire_chat_sessions()
+            if expired:
+                logger.info(f"Expired {expired} idle chat sessions")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Chat session expiry failed: {str(e)}")
+        await asyncio.sleep(CHAT_EXPIRY_CHECK_SECONDS)
+
+chat_expiry_task: Optional[asyncio.Task] = None
+
+async def save_chat_turn(chat_message: ChatMessage, user_id: str):
+    try:
+        await record_chat_turn(chat_message, user_id)
+    except Exception as e:
+        logger.error(f"Could not save chat turn {chat_message.id}: {str(e)}")
+
+@api_router.post("/chat/stream")
+async def stream_chat_with_ai(chat_data: ChatMessageCreate, request: Request, current_user: User = Depends(get_current_user)):
+    """Server-sent events: start, token..., then done (the saved ChatMessage), error or cancelled"""
+    question = normalize_question(chat_data.user_message)
+    cacheable = chat_responses.cacheable(question)
+    try:
+        cached_response = await chat_responses.get(question) if cacheable else None
+        chat = get_chat_client(chat_data.session_id) if cached_response is None else None
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Chat service error: {str(e)}")
+    stream_id = str(uuid.uuid4())
+    
+    async def events():
+        tokens: asyncio.Queue = asyncio.Queue()
+        
+        async def generate():
+            if cached_response is not None:
+                await tokens.put(cached_response)
+                return
+            context = await ai_context.get()
+            user_message = create_user_message(f"{context}\nUser message: {chat_data.user_message}")
+            async for token in stream_chat_reply(chat, user_message):
+                await tokens.put(token)
+        
+        producer = asyncio.create_task(generate())
+        producer.add_done_callback(lambda _: tokens.put_nowait(None))
+        active_generations[stream_id] = producer
+        reply = []
+        try:
+            yield sse_event("start", {"stream_id": stream_id})
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    break
+                reply.append(token)
+                yield sse_event("token", {"text": token})
+            
+            if producer.cancelled():
+                yield sse_event("cancelled", {"stream_id": stream_id})
+                return
+            if producer.exception():
+                logger.error(f"Chat error: {str(producer.exception())}")
+                yield sse_event("error", {"detail": f"Chat service error: {str(producer.exception())}"})
+                return
+            
+            chat_message = ChatMessage(
+                session_id=chat_data.session_id,
+                user_message=chat_data.user_message,
+                ai_response="".join(reply),
+                cached=cached_response is not None
+            )
+            if cacheable and cached_response is None:
+                await chat_responses.set(question, chat_message.ai_response)
+            # The client has the full reply; saving it must not hold the response open
+            run_in_background(save_chat_turn(chat_message, current_user.id))
+            yield sse_event("done", chat_message.model_dump(mode="json"))
+        finally:
+            # Also reached when the client disconnects mid-stream
+            producer.cancel()
+            active_generations.pop(stream_id, None)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@api_router.post("/chat/stream/{stream_id}/cancel")
+async def cancel_chat_stream(stream_id: str, current_user: User = Depends(get_current_user)):
+    producer = active_generations.get(stream_id)
+    if producer is None:
+        raise HTTPException(status_code=404, detail="No active generation with this id")
+    producer.cancel()
+    return {"message": "Generation cancelled"}
+
+@api_router.get("/chat/history/{session_id}", response_model=Page[ChatMessage])
+async def get_chat_history(session_id: str, cursor: Optional[str] = None, limit: int = CHAT_HISTORY_PAGE_SIZE, current_user: User = Depends(get_current_user)):
+    """Newest turns first; pass next_cursor back to load earlier ones"""
+    docs, next_cursor = await keyset_page(
+        db.chat_history, {"session_id": session_id}, cursor, limit, chat_message_reads.projection, field="timestamp"
+    )
+    return chat_message_reads.page_response(docs, next_cursor)
+
+@api_router.get("/chat/sessions/{session_id}", response_model=ChatSession)
+async def get_chat_session(session_id: str, current_user: User = Depends(get_current_user)):
+    session = await db.chat_sessions.find_one({"session_id": session_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return ChatSession(**session)
 
 # Real-time data context for AI
 async def get_app_context_for_ai():
@@ -492,27 +3383,25 @@ async def get_app_context_for_ai():
     try:
         # Get current inventory summary
         total_plants = await db.plants.count_documents({})
-        low_stock_plants = await db.plants.count_documents({"$expr": {"$lte": ["$current_stock", "$min_stock_threshold"]}})
+        low_stock_plants = await db.plants.count_documents(LOW_STOCK_QUERY)
         
         # Get recent sales data
-        recent_sales_pipeline = [
-            {"$match": {"status": {"$ne": "pending"}, "created_at": {"$gte": datetime.now(timezone.utc) - timedelta(days=30)}}},
-            {"$group": {"_id": None, "total": {"$sum": "$total_amount"}, "count": {"$sum": 1}}}
-        ]
-        recent_sales = await db.bills.aggregate(recent_sales_pipeline).to_list(1)
-        monthly_sales = recent_sales[0] if recent_sales else {"total": 0, "count": 0}
+        recent_days = await db.sales_daily.find(
+            {"dimension": "all", "date": {"$gte": rollup_day(datetime.now(timezone.utc) - timedelta(days=30))}},
+            {"_id": 0, "revenue": 1, "bill_count": 1}
+        ).to_list(None)
+        monthly_sales = {
+            "total": sum(day['revenue'] for day in recent_days),
+            "count": sum(day['bill_count'] for day in recent_days),
+        }
         
         # Get customer count
         total_customers = await db.customers.count_documents({})
         
-        # Get top selling plants (based on bill items)
-        top_plants_pipeline = [
-            {"$unwind": "$items"},
-            {"$group": {"_id": "$items.plant_name", "quantity_sold": {"$sum": "$items.quantity"}}},
-            {"$sort": {"quantity_sold": -1}},
-            {"$limit": 5}
-        ]
-        top_plants = await db.bills.aggregate(top_plants_pipeline).to_list(5)
+        # Get top selling plants (lifetime sales counters)
+        top_plants = await db.plants.find(
+            {"sales.units": {"$gt": 0}}, {"_id": 0, "name": 1, "sales.units": 1}
+        ).sort("sales.units", -1).limit(5).to_list(5)
         
         # Get recent customer activity
         recent_customers = await db.customers.find().sort("created_at", -1).limit(5).to_list(5)
@@ -532,7 +3421,7 @@ async def get_app_context_for_ai():
         - Recent customers: {[c['name'] for c in recent_customers]}
         
         TOP SELLING PLANTS:
-        {[f"- {plant['_id']}: {plant['quantity_sold']} units sold" for plant in top_plants]}
+        {[f"- {plant['name']}: {plant['sales']['units']} units sold" for plant in top_plants]}
         
         Use this real-time data to provide accurate, current information in your responses.
         """
@@ -558,14 +3447,235 @@ async def initialize_admin():
     )
     
     admin_doc = admin_user.dict()
-    admin_doc['hashed_password'] = get_password_hash("admin123")
+    admin_doc['hashed_password'] = await password_hasher.hash("admin123")
     
     await db.users.insert_one(admin_doc)
     return {"message": "Admin user created successfully", "username": "admin", "password": "admin123"}
 
+# Database Indexes
+# Every query shape issued above is backed by one of these. Names are pinned so
+# the startup check can compare what exists against what is declared.
+DECLARED_INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "plants": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("stock_holds", ASCENDING)], name="stock_holds", sparse=True),
+        IndexModel([("stock_headroom", ASCENDING)], name="stock_headroom"),
+        IndexModel([("dedupe_key", ASCENDING)], name="dedupe_key_unique", unique=True,
+                   partialFilterExpression={"dedupe_key": {"$type": "string"}}),
+        IndexModel([("low_stock_since", ASCENDING), ("id", ASCENDING)], name="low_stock_since_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("search_terms", ASCENDING)], name="search_terms"),
+        IndexModel([("sales.units", DESCENDING)], name="sales_units"),
+        IndexModel([("sales.units_7d", DESCENDING)], name="sales_units_7d"),
+        IndexModel([("sales.units_30d", DESCENDING)], name="sales_units_30d"),
+        IndexModel([("sales.revenue_30d", DESCENDING)], name="sales_revenue_30d"),
+    ],
+    "customers": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("phone_keys", ASCENDING)], name="phone_keys"),
+        IndexModel([("dedupe_key", ASCENDING)], name="dedupe_key"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("search_terms", ASCENDING)], name="search_terms"),
+    ],
+    "bills": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("bill_number", ASCENDING)], name="bill_number_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("search_terms", ASCENDING)], name="search_terms"),
+        IndexModel([("customer_id", ASCENDING)], name="customer_id"),
+        IndexModel([("items.plant_id", ASCENDING)], name="items_plant_id"),
+    ],
+    "quotations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("quotation_number", ASCENDING)], name="quotation_number_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("search_terms", ASCENDING)], name="search_terms"),
+        IndexModel([("customer_id", ASCENDING)], name="customer_id"),
+        IndexModel([("items.plant_id", ASCENDING)], name="items_plant_id"),
+    ],
+    "sales_daily": [
+        IndexModel([("dimension", ASCENDING), ("date", ASCENDING), ("key", ASCENDING)], name="dimension_date_key"),
+    ],
+    "sales_monthly": [
+        IndexModel([("dimension", ASCENDING), ("month", ASCENDING), ("key", ASCENDING)], name="dimension_month_key"),
+    ],
+    "denormalization_jobs": [
+        IndexModel([("status", ASCENDING), ("requested_at", ASCENDING)], name="status_requested_at"),
+    ],
+    "stock_ledger": [
+        IndexModel([("plant_id", ASCENDING), ("created_at", DESCENDING)], name="plant_id_created_at"),
+        IndexModel([("bill_id", ASCENDING)], name="bill_id", sparse=True),
+    ],
+    "chat_history": [
+        IndexModel([("session_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="session_id_timestamp_id"),
+    ],
+    "chat_sessions": [
+        IndexModel([("session_id", ASCENDING)], name="session_id_unique", unique=True),
+        IndexModel([("last_message_at", ASCENDING)], name="last_message_at"),
+    ],
+}
+
+async def ensure_indexes():
+    for collection_name, indexes in DECLARED_INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                # Usually duplicate values blocking a unique index; keep serving and surface it in the report
+                logger.error(f"Could not create index {collection_name}.{index.document['name']}: {e}")
+
+async def get_index_report():
+    """Compare declared indexes with the live ones and their usage since server start"""
+    report = {"missing": [], "unused": [], "undeclared": [], "collections": {}}
+    for collection_name, indexes in DECLARED_INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        try:
+            stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+            ops_by_name = {stat["name"]: stat["accesses"]["ops"] for stat in stats}
+        except (OperationFailure, NotImplementedError):
+            # NotImplementedError comes from the in-memory stand-in used by backend_loadtest.py
+            ops_by_name = {}
+        
+        declared_names = [index.document["name"] for index in indexes]
+        for name in declared_names:
+            if name not in existing:
+                report["missing"].append(f"{collection_name}.{name}")
+            elif ops_by_name.get(name) == 0:
+                report["unused"].append(f"{collection_name}.{name}")
+        for name in existing:
+            if name != "_id_" and name not in declared_names:
+                report["undeclared"].append(f"{collection_name}.{name}")
+        
+        report["collections"][collection_name] = {
+            name: {"key": dict(info["key"]), "ops": ops_by_name.get(name)}
+            for name, info in existing.items()
+        }
+    return report
+
+def plan_summary(plan: dict, stages: List[str], indexes: List[str]):
+    plan = plan.get("queryPlan", plan)
+    stages.append(plan.get("stage", "?"))
+    if plan.get("indexName"):
+        indexes.append(plan["indexName"])
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            plan_summary(child, stages, indexes)
+
+def explain_summary(explained: dict) -> Dict[str, Any]:
+    # Aggregations that are not fully pushed down nest the find plan under their first stage
+    cursor_stage = next((stage["$cursor"] for stage in explained.get("stages", []) if "$cursor" in stage), None)
+    source = cursor_stage or explained
+    stages, indexes = [], []
+    plan_summary(source.get("queryPlanner", {}).get("winningPlan", {}), stages, indexes)
+    execution = source.get("executionStats", {})
+    docs_examined = execution.get("totalDocsExamined", 0)
+    returned = execution.get("nReturned", 0)
+    ratio = round(docs_examined / max(returned, 1), 2)
+    flags = []
+    if "COLLSCAN" in stages:
+        flags.append("COLLSCAN")
+    if ratio > QUERY_PLAN_RATIO_THRESHOLD:
+        flags.append("HIGH_EXAMINED_RATIO")
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "keys_examined": execution.get("totalKeysExamined", 0),
+        "docs_examined": docs_examined,
+        "returned": returned,
+        "examined_per_returned": ratio,
+        "flags": flags,
+    }
+
+async def build_query_plan_report() -> Dict[str, Any]:
+    """Explain every captured query shape; sorted and free of timings so reports diff cleanly"""
+    queries = []
+    for key, entry in sorted(query_plans.snapshot().items()):
+        example = entry.pop("example")
+        try:
+            explained = await db.command({"explain": example, "verbosity": "executionStats"})
+            entry.update(explain_summary(explained))
+        except OperationFailure as e:
+            entry["error"] = str(e)
+        queries.append({"key": key, **entry})
+    return {
+        "capturing": QUERY_PLAN_CAPTURE,
+        "flagged": [query["key"] for query in queries if query.get("flags")],
+        "queries": queries,
+    }
+
+async def write_query_plan_report(path: str):
+    report = await build_query_plan_report()
+    with open(path, "w", encoding="utf-8") as stream:
+        json.dump(report, stream, indent=2, default=str)
+        stream.write("\n")
+
+@api_router.get("/admin/query-plans")
+async def get_query_plans(current_user: User = Depends(require_role(["admin"]))):
+    if not QUERY_PLAN_CAPTURE:
+        raise HTTPException(status_code=404, detail="Query plan capture is off; start the server with QUERY_PLAN_CAPTURE=1")
+    return await build_query_plan_report()
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(current_user: User = Depends(require_role(["admin"]))):
+    return {
+        "users": user_cache.stats(),
+        "plant_prices": plant_prices.stats(),
+        "chat_clients": chat_clients.stats(),
+        "ai_context": ai_context.stats(),
+        "chat_responses": chat_responses.stats(),
+        "invalidation_bus": cache_bus.stats(),
+        "live_events": live_events.stats(),
+    }
+
+@api_router.delete("/admin/chat-cache")
+async def purge_chat_cache(current_user: User = Depends(require_role(["admin"]))):
+    purged = len(chat_responses.answers)
+    await cache_bus.publish("chat_responses", "purge")
+    return {"purged": purged}
+
+@api_router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus scrape endpoint"""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/admin/pool-stats")
+async def get_pool_stats(current_user: User = Depends(require_role(["admin"]))):
+    return {"password_hashing": password_hasher.stats()}
+
+@api_router.get("/admin/denormalization-jobs")
+async def get_denormalization_jobs(current_user: User = Depends(require_role(["admin"]))):
+    jobs = await db.denormalization_jobs.find(
+        {"status": {"$in": ["pending", "running"]}}, {"lease_owner": 0}
+    ).sort("requested_at", 1).to_list(100)
+    return {"worker": name_refresher.stats(), "jobs": jobs}
+
+@api_router.get("/admin/stock/verify")
+async def verify_stock(plant_id: Optional[str] = None, rebuild: bool = False, current_user: User = Depends(require_role(["admin"]))):
+    return await verify_stock_against_ledger(plant_id, rebuild)
+
+@api_router.post("/admin/analytics/reconcile")
+async def reconcile_analytics(apply: bool = True, current_user: User = Depends(require_role(["admin"]))):
+    return await reconcile_dashboard_rollups(apply)
+
+@api_router.get("/admin/indexes")
+async def get_indexes(current_user: User = Depends(require_role(["admin"]))):
+    return await get_index_report()
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(RequestMetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -581,6 +3691,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_db_client():
+    global sales_velocity_task, chat_expiry_task
+    await ensure_indexes()
+    await seed_sequences()
+    await seed_dashboard_rollups()
+    await seed_sales_rollups()
+    await backfill_search_keys()
+    await backfill_stock_headroom()
+    await backfill_dedupe_keys()
+    await seed_opening_ledger()
+    report = await get_index_report()
+    if report["missing"]:
+        logger.warning(f"Missing database indexes: {', '.join(report['missing'])}")
+    await cache_bus.start()
+    await live_events.start()
+    await name_refresher.start()
+    sales_velocity_task = asyncio.create_task(sales_velocity_loop())
+    chat_expiry_task = asyncio.create_task(chat_expiry_loop())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await cache_bus.stop()
+    await live_events.stop()
+    await name_refresher.stop()
+    for task in (sales_backfill_task, sales_velocity_task, chat_expiry_task):
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    if background_tasks:
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+    if QUERY_PLAN_CAPTURE and QUERY_PLAN_REPORT:
+        await write_query_plan_report(QUERY_PLAN_REPORT)
+    client.close()
+    password_hasher.executor.shutdown(wait=False)
\ No newline at end of file
@@ -0,0 +1,379 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+import httpx
+
+
+def summarize(latencies):
+    """p50/p95/p99 and mean in milliseconds"""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"count": 0}
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+class NurseryBenchmark:
+    def __init__(self, mongo_url="mongodb://localhost:27017", db_name="nursery_bench", capture_query_plans=False):
+        # server.py reads its connection settings at import time
+        os.environ['MONGO_URL'] = mongo_url
+        os.environ['DB_NAME'] = db_name
+        if capture_query_plans:
+            os.environ['QUERY_PLAN_CAPTURE'] = '1'
+        # Benchmarks never call the paid Gemini API
+        os.environ['LLM_BACKEND'] = 'fake'
+        os.environ.setdefault('FAKE_LLM_DELAY_SECONDS', '1.0')
+        # chat_ttfb repeats one question; cached answers would hide the LLM latency it measures
+        os.environ['CHAT_CACHE_MAXSIZE'] = '0'
+        sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+        import server
+
+        self.server = server
+        self.db = server.db
+        self.http = None
+        self.live = None
+        self.live_server = None
+        self.headers = {}
+        self.test_data = {}
+        self.results = {}
+
+    async def setup(self):
+        """Start from an empty database with an admin, a customer and a plant"""
+        await self.server.client.drop_database(self.db.name)
+        await self.server.startup_db_client()
+        self.http = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.server.app),
+            base_url="http://bench/api",
+            timeout=60,
+        )
+
+        await self.http.post("/init-admin")
+        response = await self.http.post("/auth/login", json={"username": "admin", "password": "admin123"})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await self.http.post("/customers", headers=self.headers, json={
+            "name": "Bench Customer",
+            "phone": "9876543210",
+        })
+        self.test_data['customer'] = response.json()
+
+        response = await self.http.post("/plants", headers=self.headers, json={
+            "name": "Rose Plant",
+            "category": "Flowering",
+            "current_stock": 1_000_000,
+            "cost_price": 25.0,
+            "selling_price": 50.0,
+            "investment": 25_000_000.0,
+            "location": "Section A-1",
+        })
+        self.test_data['plant'] = response.json()
+
+    async def start_live_server(self, port=0):
+        """Serve the app over real HTTP in this event loop, for measurements that need streaming"""
+        import uvicorn
+
+        config = uvicorn.Config(self.server.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+        self.live_server = uvicorn.Server(config)
+        task = asyncio.create_task(self.live_server.serve())
+        while not self.live_server.started:
+            if task.done():
+                task.result()
+            await asyncio.sleep(0.05)
+        bound_port = self.live_server.servers[0].sockets[0].getsockname()[1]
+        self.live = httpx.AsyncClient(base_url=f"http://127.0.0.1:{bound_port}/api", headers=self.headers, timeout=60)
+        self.live_task = task
+
+    async def teardown(self):
+        if self.live:
+            await self.live.aclose()
+            self.live_server.should_exit = True
+            await self.live_task
+        if self.http:
+            await self.http.aclose()
+        await self.server.client.drop_database(self.db.name)
+
+    async def timed(self, method, endpoint, **kwargs):
+        start = time.perf_counter()
+        response = await self.http.request(method, endpoint, headers=self.headers, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        response.raise_for_status()
+        return elapsed, response
+
+    def bill_payload(self):
+        plant = self.test_data['plant']
+        return {
+            "customer_id": self.test_data['customer']['id'],
+            "items": [{
+                "plant_id": plant['id'],
+                "plant_name": plant['name'],
+                "quantity": 1,
+                "unit_price": plant['selling_price'],
+                "total_price": plant['selling_price'],
+            }],
+            "payment_method": "cash",
+        }
+
+    async def grow_bills(self, target):
+        """Insert filler bills directly until the collection holds `target` documents"""
+        current = await self.db.bills.count_documents({})
+        batch = []
+        for i in range(current, target):
+            batch.append({
+                "id": str(uuid.uuid4()),
+                "bill_number": f"FILL-{i:09d}",
+                "customer_id": self.test_data['customer']['id'],
+                "customer_name": self.test_data['customer']['name'],
+                "items": [],
+                "subtotal": 0,
+                "tax": 0,
+                "discount": 0,
+                "total_amount": 0,
+                "payment_method": "cash",
+                "status": "approved",
+                "created_by": "bench",
+                "created_at": datetime.now(timezone.utc),
+            })
+            if len(batch) == 10_000:
+                await self.db.bills.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await self.db.bills.insert_many(batch, ordered=False)
+
+    async def bench_bill_creation(self, sizes, samples):
+        """POST /bills latency at increasing bills collection sizes"""
+        print("\n📋 Bill creation latency vs. bills collection size")
+        results = {}
+        for size in sizes:
+            await self.grow_bills(size)
+            latencies = []
+            for _ in range(samples):
+                elapsed, _ = await self.timed("POST", "/bills", json=self.bill_payload())
+                latencies.append(elapsed)
+            results[str(size)] = summarize(latencies)
+            print(f"   {size:>9,} bills: {results[str(size)]}")
+        self.results['bill_creation'] = results
+
+    async def sample_reads(self, samples):
+        latencies = {"/bills": [], "/plants": []}
+        for _ in range(samples):
+            for endpoint in latencies:
+                elapsed, _ = await self.timed("GET", endpoint)
+                latencies[endpoint].append(elapsed)
+        return latencies
+
+    async def bench_login_burst(self, logins, samples):
+        """GET /bills and /plants latency while a burst of logins hashes passwords"""
+        print(f"\n📋 Read latency during a burst of {logins} concurrent logins")
+        baseline = await self.sample_reads(samples)
+
+        async def login():
+            response = await self.http.post("/auth/login", json={"username": "admin", "password": "admin123"})
+            response.raise_for_status()
+
+        burst = asyncio.gather(*(login() for _ in range(logins)))
+        during = await self.sample_reads(samples)
+        await burst
+
+        results = {}
+        for endpoint in baseline:
+            results[endpoint] = {
+                "baseline": summarize(baseline[endpoint]),
+                "during_burst": summarize(during[endpoint]),
+            }
+            print(f"   {endpoint} baseline: {results[endpoint]['baseline']}")
+            print(f"   {endpoint} burst:    {results[endpoint]['during_burst']}")
+        self.results['login_burst'] = results
+
+    async def bench_pagination(self, total_bills, page_size, pages):
+        """GET /bills latency by page depth, cursor walk vs. skip"""
+        print(f"\n📋 Pagination over {total_bills:,} bills, {page_size} per page")
+        await self.grow_bills(total_bills)
+        checkpoints = sorted({1, 10, 100, pages})
+
+        cursor_latency = {}
+        cursor = ""
+        for page in range(1, pages + 1):
+            elapsed, response = await self.timed("GET", "/bills", params={"cursor": cursor, "limit": page_size})
+            if page in checkpoints:
+                cursor_latency[page] = elapsed
+            cursor = response.json()['next_cursor']
+            if not cursor:
+                break
+
+        skip_latency = {}
+        for page in checkpoints:
+            elapsed, _ = await self.timed("GET", "/bills", params={"skip": (page - 1) * page_size, "limit": page_size})
+            skip_latency[page] = elapsed
+
+        results = {}
+        for page in checkpoints:
+            results[str(page)] = {
+                "cursor_ms": round(cursor_latency.get(page, 0), 3),
+                "skip_ms": round(skip_latency[page], 3),
+            }
+            print(f"   page {page:>5}: {results[str(page)]}")
+        self.results['pagination'] = results
+
+    def sample_docs(self, endpoint, rows):
+        server = self.server
+        now = datetime.now(timezone.utc)
+        item = server.BillItem(plant_id=str(uuid.uuid4()), plant_name="Rose Plant", quantity=2, unit_price=50.0, total_price=100.0)
+        factories = {
+            "/plants": lambda i: server.Plant(
+                name=f"Plant {i}", category="Flowering", variants=["Red", "White"], current_stock=i,
+                cost_price=25.0, selling_price=50.0, investment=1250.0, location="Section A-1"
+            ),
+            "/customers": lambda i: server.Customer(name=f"Customer {i}", phone=f"98765{i:05d}", email="c@example.com"),
+            "/bills": lambda i: server.Bill(
+                bill_number=f"SKN-{i:06d}", customer_id="c", customer_name="Customer", items=[item] * 3,
+                subtotal=300.0, total_amount=300.0, payment_method="cash", created_by="u"
+            ),
+            "/quotations": lambda i: server.Quotation(
+                quotation_number=f"SKN-Q-{i:06d}", customer_id="c", customer_name="Customer", items=[item] * 3,
+                subtotal=300.0, total_amount=300.0, valid_until=now, created_by="u"
+            ),
+        }
+        return [factories[endpoint](i).dict() for i in range(rows)]
+
+    def bench_serialization(self, rows, rounds):
+        """Per-endpoint list serialization: model rebuild + response_model pass vs. TrustedDocs"""
+        from pydantic import TypeAdapter
+        from fastapi.encoders import jsonable_encoder
+
+        print(f"\n📋 Serializing {rows} rows per list endpoint, {rounds} rounds")
+        server = self.server
+        endpoints = {
+            "/plants": (server.Plant, server.plant_reads),
+            "/customers": (server.Customer, server.customer_reads),
+            "/bills": (server.Bill, server.bill_reads),
+            "/quotations": (server.Quotation, server.quotation_reads),
+        }
+        results = {}
+        for endpoint, (model, reads) in endpoints.items():
+            docs = self.sample_docs(endpoint, rows)
+            adapter = TypeAdapter(List[model])
+
+            def before():
+                models = [model(**doc) for doc in docs]
+                validated = adapter.validate_python(models, from_attributes=True)
+                return json.dumps(jsonable_encoder(validated)).encode()
+
+            def after():
+                return reads.response(docs).body
+
+            timings = {}
+            for name, fn in (("before", before), ("after", after)):
+                latencies = []
+                for _ in range(rounds):
+                    start = time.perf_counter()
+                    fn()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                timings[name] = summarize(latencies)
+            timings['speedup'] = round(timings['before']['p50_ms'] / max(timings['after']['p50_ms'], 1e-6), 1)
+            results[endpoint] = timings
+            print(f"   {endpoint:<12} before p50 {timings['before']['p50_ms']} ms, after p50 {timings['after']['p50_ms']} ms ({timings['speedup']}x)")
+        self.results['serialization'] = results
+
+    async def bench_chat_ttfb(self, samples):
+        """Time to first token on /chat/stream vs. the full reply on /chat, against the fake LLM"""
+        print(f"\n📋 Chat time-to-first-byte, fake LLM delay {os.environ['FAKE_LLM_DELAY_SECONDS']}s")
+        if not self.live:
+            await self.start_live_server()
+        first_token, stream_total, blocking = [], [], []
+        for i in range(samples):
+            payload = {"session_id": f"bench-{i}", "user_message": "How often should I water tulsi?"}
+            start = time.perf_counter()
+            async with self.live.stream("POST", "/chat/stream", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line == "event: token" and len(first_token) == i:
+                        first_token.append((time.perf_counter() - start) * 1000)
+            stream_total.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            response = await self.live.post("/chat", json=payload)
+            response.raise_for_status()
+            blocking.append((time.perf_counter() - start) * 1000)
+
+        results = {
+            "stream_first_token": summarize(first_token),
+            "stream_complete": summarize(stream_total),
+            "blocking_chat": summarize(blocking),
+        }
+        for name, summary in results.items():
+            print(f"   {name:<20} {summary}")
+        self.results['chat_ttfb'] = results
+
+
+BENCHMARKS = ["bill_creation", "login_burst", "pagination", "serialization", "chat_ttfb"]
+
+
+async def run(args):
+    bench = NurseryBenchmark(mongo_url=args.mongo_url, db_name=args.db_name, capture_query_plans=bool(args.query_report))
+    await bench.setup()
+    try:
+        if "bill_creation" in args.bench:
+            await bench.bench_bill_creation(args.sizes, args.samples)
+        if "login_burst" in args.bench:
+            await bench.bench_login_burst(args.logins, args.samples)
+        if "pagination" in args.bench:
+            await bench.bench_pagination(args.page_size * args.pages, args.page_size, args.pages)
+        if "serialization" in args.bench:
+            bench.bench_serialization(args.rows, args.samples)
+        if "chat_ttfb" in args.bench:
+            await bench.bench_chat_ttfb(args.chat_samples)
+        if args.query_report:
+            await bench.server.write_query_plan_report(args.query_report)
+            print(f"\n🔎 Query plan report written to {args.query_report}")
+    finally:
+        await bench.teardown()
+    return bench.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local benchmarks for the nursery backend")
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default=os.environ.get("BENCH_DB_NAME", "nursery_bench"))
+    parser.add_argument("--bench", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[0, 10_000, 100_000, 500_000])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=50, help="Concurrent logins for login_burst")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=1000, help="Deepest page fetched by pagination")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per response for serialization")
+    parser.add_argument("--chat-samples", type=int, default=10)
+    parser.add_argument("--query-report", help="Explain every query shape the run issued and write the report to this JSON file")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    print("🌱 Shree Krishna Nursery backend benchmarks")
+    print(f"   Database: {args.db_name} (dropped before and after the run)")
+    results = asyncio.run(run(args))
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+        print(f"\n📊 Results written to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from backend_bench import NurseryBenchmark, summarize
+
+PLANT_NAMES = ["Rose", "Tulsi", "Money Plant", "Jasmine", "Hibiscus", "Aloe Vera", "Areca Palm", "Snake Plant",
+               "Marigold", "Bougainvillea", "Neem", "Curry Leaf", "Croton", "Fern", "Ficus", "Lemon"]
+CATEGORIES = ["Flowering", "Medicinal", "Indoor", "Outdoor", "Fruit", "Herbs"]
+PASSWORD = "loadtest123"
+
+
+class LoadRecorder:
+    """Latencies and failures per endpoint label across all virtual users"""
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, label, elapsed_ms, status_code):
+        self.latencies[label].append(elapsed_ms)
+        self.statuses[label][status_code] += 1
+        if status_code >= 400:
+            self.errors[label] += 1
+
+    def report(self, duration):
+        endpoints = {}
+        for label in sorted(self.latencies):
+            latencies = self.latencies[label]
+            endpoints[label] = {
+                **summarize(latencies),
+                "errors": self.errors[label],
+                "statuses": {str(code): count for code, count in sorted(self.statuses[label].items())},
+                "throughput_rps": round(len(latencies) / duration, 2),
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "duration_s": round(duration, 2),
+            "total_requests": total,
+            "total_errors": sum(self.errors.values()),
+            "throughput_rps": round(total / duration, 2),
+            "endpoints": endpoints,
+        }
+
+
+class VirtualUser:
+    def __init__(self, role, client, load, rng):
+        self.role = role
+        self.client = client
+        self.load = load
+        self.rng = rng
+
+    async def request(self, label, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status_code = response.status_code
+        except httpx.HTTPError:
+            response, status_code = None, 599
+        self.load.recorder.record(label, (time.perf_counter() - start) * 1000, status_code)
+        return response
+
+    def bill_payload(self):
+        items = []
+        for plant in self.rng.sample(self.load.plants, self.rng.randint(1, 3)):
+            quantity = self.rng.randint(1, 3)
+            items.append({
+                "plant_id": plant['id'],
+                "plant_name": plant['name'],
+                "quantity": quantity,
+                "unit_price": plant['selling_price'],
+                "total_price": plant['selling_price'] * quantity,
+            })
+        return {
+            "customer_id": self.rng.choice(self.load.customers)['id'],
+            "items": items,
+            "payment_method": self.rng.choice(["cash", "upi", "card"]),
+        }
+
+    # Cashier actions
+    async def search_plants(self):
+        term = self.rng.choice(self.load.plants)['name'][:self.rng.randint(2, 5)]
+        await self.request("GET /search", "GET", "/search", params={"q": term, "types": "plants"})
+
+    async def browse_plants(self):
+        await self.request("GET /plants", "GET", "/plants", params={"cursor": "", "limit": 50})
+
+    async def view_plant(self):
+        plant = self.rng.choice(self.load.plants)
+        await self.request("GET /plants/{plant_id}", "GET", f"/plants/{plant['id']}")
+
+    async def search_customers(self):
+        # Customer search matches phone-number prefixes, like a cashier typing the first digits
+        phone = self.rng.choice(self.load.customers)['phone']
+        await self.request("GET /customers/search", "GET", "/customers/search", params={"q": phone[:5]})
+
+    async def create_bill(self):
+        response = await self.request("POST /bills", "POST", "/bills", json=self.bill_payload())
+        if response is not None and response.status_code == 200 and response.json()['status'] == "pending":
+            self.load.pending_bills.append(response.json()['id'])
+
+    # Manager actions
+    async def browse_bills(self):
+        await self.request("GET /bills", "GET", "/bills", params={"cursor": "", "limit": 50})
+
+    async def browse_customers(self):
+        await self.request("GET /customers", "GET", "/customers", params={"cursor": "", "limit": 50})
+
+    async def dashboard(self):
+        await self.request("GET /analytics/dashboard", "GET", "/analytics/dashboard")
+
+    async def low_stock(self):
+        await self.request("GET /plants/low-stock", "GET", "/plants/low-stock")
+
+    async def restock_plant(self):
+        plant = self.rng.choice(self.load.plants)
+        response = await self.request("GET /plants/{plant_id}", "GET", f"/plants/{plant['id']}")
+        if response is not None and response.status_code == 200:
+            stock = response.json()['current_stock'] + self.rng.randint(10, 100)
+            await self.request("PUT /plants/{plant_id}", "PUT", f"/plants/{plant['id']}", json={"current_stock": stock})
+
+    # Admin actions
+    async def approve_bill(self):
+        if not self.load.pending_bills:
+            response = await self.request("GET /bills/pending", "GET", "/bills/pending")
+            if response is None or response.status_code != 200:
+                return
+            self.load.pending_bills.extend(bill['id'] for bill in response.json())
+            if not self.load.pending_bills:
+                return
+        bill_id = self.load.pending_bills.pop(0)
+        await self.request("PUT /bills/{bill_id}/approve", "PUT", f"/bills/{bill_id}/approve")
+
+    async def pending_bills(self):
+        await self.request("GET /bills/pending", "GET", "/bills/pending")
+
+    async def daily_sales(self):
+        await self.request("GET /analytics/daily", "GET", "/analytics/daily", params={"days": 30})
+
+    async def cache_stats(self):
+        await self.request("GET /admin/cache-stats", "GET", "/admin/cache-stats")
+
+
+# Relative weights of each action per role
+ROLE_MIXES = {
+    "cashier": [
+        (30, VirtualUser.search_plants),
+        (20, VirtualUser.browse_plants),
+        (10, VirtualUser.view_plant),
+        (15, VirtualUser.search_customers),
+        (25, VirtualUser.create_bill),
+    ],
+    "manager": [
+        (20, VirtualUser.browse_bills),
+        (15, VirtualUser.browse_customers),
+        (15, VirtualUser.dashboard),
+        (15, VirtualUser.low_stock),
+        (15, VirtualUser.restock_plant),
+        (20, VirtualUser.create_bill),
+    ],
+    "admin": [
+        (40, VirtualUser.approve_bill),
+        (25, VirtualUser.dashboard),
+        (15, VirtualUser.daily_sales),
+        (10, VirtualUser.pending_bills),
+        (10, VirtualUser.cache_stats),
+    ],
+}
+
+
+class LoadTest(NurseryBenchmark):
+    """Seeds a realistic dataset, then runs concurrent cashier/manager/admin sessions against it"""
+    def __init__(self, args):
+        if args.in_memory:
+            # Must replace the client class before server.py is imported
+            import motor.motor_asyncio
+            import mongomock_motor
+            motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+        super().__init__(mongo_url=args.mongo_url, db_name=args.db_name, capture_query_plans=bool(args.query_report))
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.recorder = LoadRecorder()
+        self.plants = []
+        self.customers = []
+        self.pending_bills = []
+        self.clients = []
+
+    async def seed(self):
+        args = self.args
+        print(f"🌱 Seeding {args.plants:,} plants, {args.customers:,} customers, {args.bills:,} bills")
+        start = time.perf_counter()
+        plant_rows = (
+            (i, {
+                "name": f"{self.rng.choice(PLANT_NAMES)} {i}",
+                "category": self.rng.choice(CATEGORIES),
+                # A few plants start below their threshold so low-stock reads return something
+                "current_stock": self.rng.randint(0, 9) if self.rng.random() < 0.05 else self.rng.randint(1_000, 100_000),
+                "cost_price": 20.0,
+                "selling_price": float(self.rng.choice([40, 60, 80, 120, 250])),
+                "investment": 0.0,
+                "location": f"Section {chr(65 + i % 6)}-{i % 40}",
+            })
+            for i in range(1, args.plants + 1)
+        )
+        await self.server.import_records("plants", plant_rows, user_id="loadtest")
+        customer_rows = (
+            (i, {"name": f"Customer {i}", "phone": f"9{i:09d}"})
+            for i in range(1, args.customers + 1)
+        )
+        await self.server.import_records("customers", customer_rows, user_id="loadtest")
+
+        self.plants = await self.db.plants.find({}, {"_id": 0, "id": 1, "name": 1, "selling_price": 1}).to_list(None)
+        self.customers = await self.db.customers.find({}, {"_id": 0, "id": 1, "name": 1, "phone": 1}).to_list(None)
+        await self.seed_bills(args.bills, args.history_days)
+        await self.server.reconcile_dashboard_rollups(apply=True)
+        print(f"   seeded in {time.perf_counter() - start:.1f}s")
+
+    async def seed_bills(self, count, history_days):
+        """Historical bills spread over the last `history_days`; they do not move stock"""
+        now = datetime.now(timezone.utc)
+        batch = []
+        for i in range(count):
+            customer = self.rng.choice(self.customers)
+            items = []
+            for plant in self.rng.sample(self.plants, min(len(self.plants), self.rng.randint(1, 4))):
+                quantity = self.rng.randint(1, 5)
+                items.append({
+                    "plant_id": plant['id'],
+                    "plant_name": plant['name'],
+                    "variant": None,
+                    "quantity": quantity,
+                    "unit_price": plant['selling_price'],
+                    "total_price": plant['selling_price'] * quantity,
+                })
+            subtotal = sum(item['total_price'] for item in items)
+            bill = {
+                "id": str(uuid.uuid4()),
+                "bill_number": f"SEED-{i:09d}",
+                "customer_id": customer['id'],
+                "customer_name": customer['name'],
+                "items": items,
+                "subtotal": subtotal,
+                "tax": 0,
+                "discount": 0,
+                "total_amount": subtotal,
+                "payment_method": self.rng.choice(["cash", "upi", "card"]),
+                "status": "pending" if self.rng.random() < 0.02 else "approved",
+                "created_by": "loadtest",
+                "approved_by": None,
+                "created_at": now - timedelta(seconds=self.rng.randint(0, history_days * 86400)),
+            }
+            bill.update(self.server.search_fields("bills", bill))
+            batch.append(bill)
+            if len(batch) == 10_000:
+                await self.db.bills.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await self.db.bills.insert_many(batch, ordered=False)
+
+    async def login_users(self):
+        """Register the virtual staff and give each an authenticated client"""
+        if self.args.transport == "http":
+            await self.start_live_server()
+            base_url = str(self.live.base_url)
+            make_client = lambda headers: httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60)
+        else:
+            transport = httpx.ASGITransport(app=self.server.app)
+            make_client = lambda headers: httpx.AsyncClient(
+                transport=transport, base_url="http://loadtest/api", headers=headers, timeout=60
+            )
+
+        users = []
+        for role in ROLE_MIXES:
+            for i in range(getattr(self.args, f"{role}s")):
+                username = f"load_{role}_{i}"
+                response = await self.http.post("/auth/register", headers=self.headers, json={
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "full_name": f"Load {role.title()} {i}",
+                    "password": PASSWORD,
+                    "role": role,
+                })
+                response.raise_for_status()
+                response = await self.http.post("/auth/login", json={"username": username, "password": PASSWORD})
+                response.raise_for_status()
+                client = make_client({"Authorization": f"Bearer {response.json()['access_token']}"})
+                self.clients.append(client)
+                users.append(VirtualUser(role, client, self, random.Random(self.rng.random())))
+        return users
+
+    async def run_user(self, user, deadline):
+        weights, actions = zip(*ROLE_MIXES[user.role])
+        think = self.args.think_ms / 1000
+        while time.perf_counter() < deadline:
+            action = user.rng.choices(actions, weights=weights)[0]
+            await action(user)
+            # Always yield: the in-memory stand-in never suspends on I/O
+            await asyncio.sleep(user.rng.uniform(0, 2 * think) if think else 0)
+
+    async def run(self):
+        args = self.args
+        await self.setup()
+        try:
+            await self.seed()
+            users = await self.login_users()
+            print(f"🚦 {args.cashiers} cashiers, {args.managers} managers, {args.admins} admins "
+                  f"for {args.duration}s over {args.transport}")
+            if args.warmup:
+                await asyncio.gather(*(self.run_user(user, time.perf_counter() + args.warmup) for user in users))
+                self.recorder = LoadRecorder()
+            start = time.perf_counter()
+            await asyncio.gather(*(self.run_user(user, start + args.duration) for user in users))
+            report = self.recorder.report(time.perf_counter() - start)
+            if args.query_report:
+                await self.server.write_query_plan_report(args.query_report)
+        finally:
+            for client in self.clients:
+                await client.aclose()
+            await self.teardown()
+        report["config"] = {
+            key: getattr(args, key)
+            for key in ("plants", "customers", "bills", "cashiers", "managers", "admins",
+                        "duration", "think_ms", "transport", "in_memory", "seed")
+        }
+        return report
+
+
+def print_report(report, baseline=None):
+    print(f"\n📊 {report['total_requests']:,} requests in {report['duration_s']}s "
+          f"= {report['throughput_rps']} req/s, {report['total_errors']} errors")
+    print(f"   {'endpoint':<32}{'count':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}")
+    for label, stats in report['endpoints'].items():
+        line = (f"   {label:<32}{stats['count']:>8}{stats['throughput_rps']:>9}"
+                f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['errors']:>8}")
+        previous = (baseline or {}).get('endpoints', {}).get(label)
+        if previous:
+            line += f"   p95 {p95_change(previous, stats):+.1f}%"
+        print(line)
+
+
+def p95_change(previous, current):
+    return (current['p95_ms'] - previous['p95_ms']) / max(previous['p95_ms'], 0.001) * 100
+
+
+def regressions(report, baseline, tolerance):
+    """Endpoints whose p95 grew by more than `tolerance` percent over the baseline run"""
+    return [
+        label
+        for label, stats in report['endpoints'].items()
+        if label in baseline['endpoints'] and p95_change(baseline['endpoints'][label], stats) > tolerance
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the nursery backend against a local database")
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default=os.environ.get("BENCH_DB_NAME", "nursery_loadtest"))
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock-motor instead of MongoDB (functional smoke runs only)")
+    parser.add_argument("--plants", type=int, default=2_000)
+    parser.add_argument("--customers", type=int, default=5_000)
+    parser.add_argument("--bills", type=int, default=50_000)
+    parser.add_argument("--history-days", type=int, default=90, help="Seeded bills are spread over this many days")
+    parser.add_argument("--cashiers", type=int, default=8)
+    parser.add_argument("--managers", type=int, default=2)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds of load before measuring")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a user's requests")
+    parser.add_argument("--transport", choices=["http", "asgi"], default="http",
+                        help="http serves the app with uvicorn; asgi calls it in-process")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Earlier --json report to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, help="Exit non-zero if any endpoint's p95 grew more than this percent")
+    parser.add_argument("--query-report", help="Explain every query shape the run issued and write the report to this JSON file")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = asyncio.run(LoadTest(args).run())
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+    if baseline and args.max_regression is not None:
+        regressed = regressions(report, baseline, args.max_regression)
+        if regressed:
+            print(f"\n❌ p95 regressed more than {args.max_regression}% on: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 import requests
+import os
 import sys
 import json
 from datetime import datetime, timedelta
 import uuid
 
 class NurseryAPITester:
-    def __init__(self, base_url="https://plant-manager.preview.emergentagent.com/api"):
+    def __init__(self, base_url=os.environ.get("BACKEND_TEST_URL", "https://plant-manager.preview.emergentagent.com/api")):
         self.base_url = base_url
         self.token = None
         self.tests_run = 0
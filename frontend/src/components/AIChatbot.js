@@ -21,8 +21,10 @@ const AIChatbot = () => {
   const [messages, setMessages] = useState([]);
   const [currentMessage, setCurrentMessage] = useState('');
   const [loading, setLoading] = useState(false);
+  const [historyCursor, setHistoryCursor] = useState(null);
   const [sessionId] = useState(() => `session_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`);
   const messagesEndRef = useRef(null);
+  const keepScrollRef = useRef(false);
 
   useEffect(() => {
     if (isOpen && !isMinimized) {
@@ -31,6 +33,10 @@ const AIChatbot = () => {
   }, [isOpen, isMinimized]);
 
   useEffect(() => {
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -38,13 +44,23 @@ const AIChatbot = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
-  const loadChatHistory = async () => {
+  const loadChatHistory = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API}/chat/history/${sessionId}`);
-      setMessages(response.data.map(chat => [
+      const response = await axios.get(`${API}/chat/history/${sessionId}`, {
+        params: cursor ? { cursor } : {}
+      });
+      // Pages come newest first
+      const turns = [...response.data.items].reverse().map(chat => [
         { type: 'user', content: chat.user_message, timestamp: chat.timestamp },
         { type: 'ai', content: chat.ai_response, timestamp: chat.timestamp }
-      ]).flat());
+      ]).flat();
+      if (cursor) {
+        keepScrollRef.current = true;
+        setMessages(prev => [...turns, ...prev]);
+      } else {
+        setMessages(turns);
+      }
+      setHistoryCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error loading chat history:', error);
     }
@@ -63,19 +79,59 @@ const AIChatbot = () => {
     setCurrentMessage('');
     setLoading(true);
 
+    const aiMessage = {
+      type: 'ai',
+      content: '',
+      timestamp: new Date().toISOString()
+    };
+    const updateAiMessage = (changes) => {
+      Object.assign(aiMessage, changes);
+      setMessages(prev => [...prev.slice(0, -1), { ...aiMessage }]);
+    };
+
     try {
-      const response = await axios.post(`${API}/chat`, {
-        session_id: sessionId,
-        user_message: currentMessage
+      const response = await fetch(`${API}/chat/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: axios.defaults.headers.common['Authorization']
+        },
+        body: JSON.stringify({
+          session_id: sessionId,
+          user_message: userMessage.content
+        })
       });
+      if (!response.ok) throw new Error(`Chat request failed with ${response.status}`);
 
-      const aiMessage = {
-        type: 'ai',
-        content: response.data.ai_response,
-        timestamp: response.data.timestamp
-      };
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let started = false;
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
 
-      setMessages(prev => [...prev, aiMessage]);
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+          if (event === 'token') {
+            if (!started) {
+              started = true;
+              setMessages(prev => [...prev, { ...aiMessage }]);
+              setLoading(false);
+            }
+            updateAiMessage({ content: aiMessage.content + data.text });
+          } else if (event === 'done' && started) {
+            updateAiMessage({ content: data.ai_response, timestamp: data.timestamp });
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
     } catch (error) {
       console.error('Error sending message:', error);
       const errorMessage = {
@@ -154,6 +210,17 @@ const AIChatbot = () => {
             <>
               {/* Chat Messages */}
               <div className="flex-1 overflow-y-auto p-4 h-[450px]">
+                {historyCursor && (
+                  <div className="text-center mb-4">
+                    <button
+                      onClick={() => loadChatHistory(historyCursor)}
+                      className="text-xs text-emerald-700 hover:text-emerald-800 hover:underline"
+                    >
+                      Load earlier messages
+                    </button>
+                  </div>
+                )}
+
                 {messages.length === 0 && (
                   <div className="text-center text-gray-500 mt-8">
                     <Bot className="w-12 h-12 mx-auto mb-4 text-gray-300" />
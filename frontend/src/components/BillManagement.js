@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useAuth } from '../App';
+import { useLiveUpdates } from '../hooks/use-live-updates';
 import { 
   Plus, 
   Search, 
@@ -26,6 +27,7 @@ const BillManagement = () => {
   const [showModal, setShowModal] = useState(false);
   const [showPendingModal, setShowPendingModal] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
 
   const [formData, setFormData] = useState({
     customer_id: '',
@@ -48,11 +50,46 @@ const BillManagement = () => {
     fetchBills();
     fetchPlants();
     fetchCustomers();
-    if (user?.role === 'admin') {
-      fetchPendingBills();
-    }
   }, [user]);
 
+  const billCreated = (bill) => {
+    setBills(prev => (prev.some(b => b.id === bill.id) ? prev : [bill, ...prev]));
+    if (bill.status === 'pending') {
+      setPendingBills(prev => (prev.some(b => b.id === bill.id) ? prev : [bill, ...prev]));
+    }
+  };
+
+  const billSettled = (bill) => {
+    setBills(prev => prev.map(b => (b.id === bill.id ? { ...b, ...bill } : b)));
+    setPendingBills(prev => prev.filter(b => b.id !== bill.id));
+  };
+
+  // Pending bills arrive with the live snapshot; new, approved and rejected bills arrive as deltas.
+  // This user's own changes are applied from the response too, in case the event is late or lost.
+  useLiveUpdates({
+    snapshot: (data) => setPendingBills(data.pending_bills),
+    bill_created: billCreated,
+    bill_approved: billSettled,
+    bill_rejected: billSettled
+  }, Boolean(user));
+
+  useEffect(() => {
+    const query = searchTerm.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API}/search`, { params: { q: query, types: 'bills', limit: 50 } });
+        setSearchResults(response.data.bills);
+      } catch (error) {
+        console.error('Error searching bills:', error);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   const fetchBills = async () => {
     try {
       const response = await axios.get(`${API}/bills`);
@@ -64,15 +101,6 @@ const BillManagement = () => {
     }
   };
 
-  const fetchPendingBills = async () => {
-    try {
-      const response = await axios.get(`${API}/bills/pending`);
-      setPendingBills(response.data);
-    } catch (error) {
-      console.error('Error fetching pending bills:', error);
-    }
-  };
-
   const fetchPlants = async () => {
     try {
       const response = await axios.get(`${API}/plants`);
@@ -94,13 +122,14 @@ const BillManagement = () => {
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
-      await axios.post(`${API}/bills`, formData);
+      const response = await axios.post(`${API}/bills`, {
+        ...formData,
+        // Names and prices are resolved on the server from the plant
+        items: formData.items.map(({ plant_id, variant, quantity }) => ({ plant_id, variant, quantity }))
+      });
+      billCreated(response.data);
       setShowModal(false);
       resetForm();
-      fetchBills();
-      if (user?.role === 'admin') {
-        fetchPendingBills();
-      }
     } catch (error) {
       console.error('Error creating bill:', error);
       alert('Error creating bill: ' + (error.response?.data?.detail || error.message));
@@ -110,14 +139,34 @@ const BillManagement = () => {
   const approveBill = async (billId) => {
     try {
       await axios.put(`${API}/bills/${billId}/approve`);
-      fetchBills();
-      fetchPendingBills();
+      billSettled({ id: billId, status: 'approved', approved_by: user.id });
     } catch (error) {
       console.error('Error approving bill:', error);
       alert('Error approving bill: ' + (error.response?.data?.detail || error.message));
     }
   };
 
+  const bulkUpdateBills = async (action) => {
+    try {
+      const response = await axios.post(`${API}/bills/bulk-status`, {
+        action,
+        bill_ids: pendingBills.map(bill => bill.id)
+      });
+      const outcome = { approve: 'approved', reject: 'rejected' }[action];
+      response.data.results
+        .filter(result => result.outcome === outcome)
+        .forEach(result => billSettled({ id: result.bill_id, status: outcome, approved_by: user.id }));
+      const failures = response.data.results.filter(result => result.outcome !== outcome);
+      if (failures.length > 0) {
+        alert(`${response.data.succeeded} bills ${outcome}, ${failures.length} skipped:\n` +
+          failures.map(result => `${result.bill_number || result.bill_id}: ${result.detail || result.outcome}`).join('\n'));
+      }
+    } catch (error) {
+      console.error(`Error bulk ${action === 'approve' ? 'approving' : 'rejecting'} bills:`, error);
+      alert('Error updating bills: ' + (error.response?.data?.detail || error.message));
+    }
+  };
+
   const resetForm = () => {
     setFormData({
       customer_id: '',
@@ -185,10 +234,7 @@ const BillManagement = () => {
     return subtotal + formData.tax - formData.discount;
   };
 
-  const filteredBills = bills.filter(bill =>
-    bill.bill_number.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    bill.customer_name.toLowerCase().includes(searchTerm.toLowerCase())
-  );
+  const filteredBills = searchResults ?? bills;
 
   const formatCurrency = (amount) => {
     return new Intl.NumberFormat('en-IN', {
@@ -414,12 +460,7 @@ const BillManagement = () => {
                         step="0.01"
                         className="form-input"
                         value={currentItem.unit_price}
-                        onChange={(e) => setCurrentItem({
-                          ...currentItem, 
-                          unit_price: parseFloat(e.target.value) || 0,
-                          total_price: currentItem.quantity * (parseFloat(e.target.value) || 0)
-                        })}
-                        min="0"
+                        readOnly
                       />
                     </div>
 
@@ -592,6 +633,21 @@ const BillManagement = () => {
             </div>
 
             <div className="modal-footer">
+              <button
+                onClick={() => bulkUpdateBills('reject')}
+                className="btn btn-secondary"
+                disabled={pendingBills.length === 0}
+              >
+                Reject All
+              </button>
+              <button
+                onClick={() => bulkUpdateBills('approve')}
+                className="btn btn-success flex items-center"
+                disabled={pendingBills.length === 0}
+              >
+                <CheckCircle className="w-4 h-4 mr-1" />
+                Approve All
+              </button>
               <button
                 onClick={() => setShowPendingModal(false)}
                 className="btn btn-secondary"
@@ -1,6 +1,6 @@
-import React, { useState, useEffect } from 'react';
-import axios from 'axios';
+import React, { useState } from 'react';
 import { useAuth } from '../App';
+import { useLiveUpdates } from '../hooks/use-live-updates';
 import { 
   TrendingUp, 
   Package, 
@@ -13,28 +13,36 @@ import {
   FileText
 } from 'lucide-react';
 
-const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
-const API = `${BACKEND_URL}/api`;
-
 const Dashboard = () => {
   const { user } = useAuth();
   const [analytics, setAnalytics] = useState(null);
   const [loading, setLoading] = useState(true);
 
-  useEffect(() => {
-    fetchDashboardData();
-  }, []);
-
-  const fetchDashboardData = async () => {
-    try {
-      const response = await axios.get(`${API}/analytics/dashboard`);
-      setAnalytics(response.data);
-    } catch (error) {
-      console.error('Error fetching dashboard data:', error);
-    } finally {
+  // One snapshot on connect, then deltas as bills and stock change
+  useLiveUpdates({
+    snapshot: (data) => {
+      setAnalytics(data.dashboard);
       setLoading(false);
-    }
-  };
+    },
+    bill_created: (bill) => setAnalytics(prev => {
+      if (!prev || prev.recent_bills.some(b => b.id === bill.id)) return prev;
+      return { ...prev, recent_bills: [bill, ...prev.recent_bills].slice(0, 5) };
+    }),
+    bill_approved: (bill) => setAnalytics(prev => prev && {
+      ...prev,
+      recent_bills: prev.recent_bills.map(b => (b.id === bill.id ? bill : b))
+    }),
+    // Totals are versioned, so one counted in the snapshot or delivered twice is never added again
+    sales_total: (totals) => setAnalytics(prev => {
+      if (!prev || totals.sales_version <= prev.sales_version) return prev;
+      return { ...prev, total_sales: totals.total_sales, sales_version: totals.sales_version };
+    }),
+    stock_changed: (change) => setAnalytics(prev => prev && {
+      ...prev,
+      total_plants: prev.total_plants + (change.created ? 1 : 0),
+      low_stock_alerts: change.low_stock_alerts
+    })
+  });
 
   const formatCurrency = (amount) => {
     return new Intl.NumberFormat('en-IN', {
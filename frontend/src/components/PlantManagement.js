@@ -21,6 +21,7 @@ const PlantManagement = () => {
   const [showModal, setShowModal] = useState(false);
   const [editingPlant, setEditingPlant] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
   const [showLowStock, setShowLowStock] = useState(false);
 
   const [formData, setFormData] = useState({
@@ -40,6 +41,23 @@ const PlantManagement = () => {
     fetchPlants();
   }, [showLowStock]);
 
+  useEffect(() => {
+    const query = searchTerm.trim();
+    if (!query || showLowStock) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API}/search`, { params: { q: query, types: 'plants', limit: 50 } });
+        setSearchResults(response.data.plants);
+      } catch (error) {
+        console.error('Error searching plants:', error);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchTerm, showLowStock]);
+
   const fetchPlants = async () => {
     try {
       const endpoint = showLowStock ? `${API}/plants/low-stock` : `${API}/plants`;
@@ -119,7 +137,8 @@ const PlantManagement = () => {
     setShowModal(true);
   };
 
-  const filteredPlants = plants.filter(plant =>
+  // Searches run on the server; the low-stock list is short enough to filter here
+  const filteredPlants = searchResults ?? plants.filter(plant =>
     plant.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
     plant.category.toLowerCase().includes(searchTerm.toLowerCase()) ||
     plant.location.toLowerCase().includes(searchTerm.toLowerCase())
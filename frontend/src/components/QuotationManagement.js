@@ -22,6 +22,7 @@ const QuotationManagement = () => {
   const [loading, setLoading] = useState(true);
   const [showModal, setShowModal] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
 
   const [formData, setFormData] = useState({
     customer_id: '',
@@ -46,6 +47,23 @@ const QuotationManagement = () => {
     fetchCustomers();
   }, []);
 
+  useEffect(() => {
+    const query = searchTerm.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API}/search`, { params: { q: query, types: 'quotations', limit: 50 } });
+        setSearchResults(response.data.quotations);
+      } catch (error) {
+        console.error('Error searching quotations:', error);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   const fetchQuotations = async () => {
     try {
       const response = await axios.get(`${API}/quotations`);
@@ -78,7 +96,11 @@ const QuotationManagement = () => {
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
-      await axios.post(`${API}/quotations`, formData);
+      await axios.post(`${API}/quotations`, {
+        ...formData,
+        // Names and prices are resolved on the server from the plant
+        items: formData.items.map(({ plant_id, variant, quantity }) => ({ plant_id, variant, quantity }))
+      });
       setShowModal(false);
       resetForm();
       fetchQuotations();
@@ -159,10 +181,7 @@ const QuotationManagement = () => {
     return new Date(validUntil) < new Date();
   };
 
-  const filteredQuotations = quotations.filter(quotation =>
-    quotation.quotation_number.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    quotation.customer_name.toLowerCase().includes(searchTerm.toLowerCase())
-  );
+  const filteredQuotations = searchResults ?? quotations;
 
   const formatCurrency = (amount) => {
     return new Intl.NumberFormat('en-IN', {
@@ -398,12 +417,7 @@ const QuotationManagement = () => {
                         step="0.01"
                         className="form-input"
                         value={currentItem.unit_price}
-                        onChange={(e) => setCurrentItem({
-                          ...currentItem, 
-                          unit_price: parseFloat(e.target.value) || 0,
-                          total_price: currentItem.quantity * (parseFloat(e.target.value) || 0)
-                        })}
-                        min="0"
+                        readOnly
                       />
                     </div>
 
@@ -0,0 +1,57 @@
+import { useEffect, useRef } from 'react';
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+
+// Subscribes to /api/live and calls handlers[event](data) for the snapshot and each delta.
+// Reconnects after errors and resync events; every reconnect starts with a fresh snapshot.
+export function useLiveUpdates(handlers, enabled = true) {
+  const handlersRef = useRef(handlers);
+  handlersRef.current = handlers;
+
+  useEffect(() => {
+    if (!enabled) return undefined;
+    const controller = new AbortController();
+    let retryDelay = 1000;
+
+    const connect = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          const response = await fetch(`${API}/live`, {
+            headers: { Authorization: axios.defaults.headers.common['Authorization'] },
+            signal: controller.signal
+          });
+          if (!response.ok) throw new Error(`Live updates failed with ${response.status}`);
+
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = '';
+          while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const raw of events) {
+              const event = raw.match(/^event: (.*)$/m)?.[1];
+              if (!event) continue;
+              const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+              if (event === 'snapshot') retryDelay = 1000;
+              handlersRef.current[event]?.(data);
+            }
+          }
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          console.error('Live updates disconnected:', error);
+        }
+        await new Promise(resolve => setTimeout(resolve, retryDelay));
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      }
+    };
+
+    connect();
+    return () => controller.abort();
+  }, [enabled]);
+}
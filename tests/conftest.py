@@ -0,0 +1,94 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+# server.py reads its settings and builds its Mongo client at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "nursery_tests")
+os.environ["LLM_BACKEND"] = "fake"
+
+import motor.motor_asyncio
+import mongomock_motor
+
+motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def api():
+    """One app and event loop for the whole run; tests isolate themselves with fresh plants"""
+    with TestClient(server.app) as client:
+        client.post("/api/init-admin")
+        yield client
+
+
+def login(api, username, password):
+    response = api.post("/api/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin(api):
+    return login(api, "admin", "admin123")
+
+
+@pytest.fixture(scope="session")
+def cashier(api, admin):
+    api.post("/api/auth/register", headers=admin, json={
+        "username": "cashier", "email": "cashier@example.com", "full_name": "Test Cashier",
+        "password": "cashier123", "role": "cashier",
+    })
+    return login(api, "cashier", "cashier123")
+
+
+@pytest.fixture
+def customer(api, admin):
+    response = api.post("/api/customers", headers=admin, json={
+        "name": "Test Customer", "phone": f"9{uuid.uuid4().int % 10**9:09d}",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def make_plant(api, admin):
+    def make(stock, selling_price=10.0):
+        response = api.post("/api/plants", headers=admin, json={
+            "name": f"Plant {uuid.uuid4().hex[:8]}", "category": "Test", "current_stock": stock,
+            "min_stock_threshold": 0, "cost_price": 1, "selling_price": selling_price,
+            "investment": 0, "location": "Bench",
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return make
+
+
+@pytest.fixture
+def make_bill(api, customer):
+    def make(headers, *lines):
+        return api.post("/api/bills", headers=headers, json={
+            "customer_id": customer['id'],
+            "items": [
+                {"plant_id": plant['id'], "quantity": quantity}
+                for plant, quantity in lines
+            ],
+            "payment_method": "cash",
+        })
+    return make
+
+
+@pytest.fixture
+def plant_state(api):
+    """current_stock, stock_holds and ledger entries for a plant, read straight from the database"""
+    def state(plant_id):
+        plant = api.portal.call(server.db.plants.find_one, {"id": plant_id})
+        ledger = api.portal.call(lambda: server.db.stock_ledger.find({"plant_id": plant_id}).to_list(None))
+        return plant['current_stock'], plant.get('stock_holds', []), ledger
+    return state
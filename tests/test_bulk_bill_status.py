@@ -0,0 +1,112 @@
+import server
+
+
+def pending_bills(make_bill, cashier, plant, *quantities):
+    bills = [make_bill(cashier, (plant, quantity)).json() for quantity in quantities]
+    assert all(bill['status'] == "pending" for bill in bills)
+    return [bill['id'] for bill in bills]
+
+
+def outcomes(response):
+    return {result['bill_id']: result['outcome'] for result in response.json()['results']}
+
+
+def stored_statuses(api, bill_ids):
+    bills = api.portal.call(lambda: server.db.bills.find({"id": {"$in": bill_ids}}).to_list(None))
+    assert all("bulk_claim" not in bill for bill in bills)
+    return {bill['id']: bill['status'] for bill in bills}
+
+
+def test_bulk_approve_fills_oldest_bills_while_stock_lasts(api, admin, cashier, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=10)
+    ids = pending_bills(make_bill, cashier, plant, 4, 4, 4)
+
+    response = api.post("/api/bills/bulk-status", headers=admin, json={"action": "approve", "bill_ids": ids + ["missing"]})
+
+    assert response.status_code == 200
+    assert response.json()['succeeded'] == 2
+    assert outcomes(response) == {ids[0]: "approved", ids[1]: "approved", ids[2]: "insufficient_stock", "missing": "not_found"}
+    assert stored_statuses(api, ids) == {ids[0]: "approved", ids[1]: "approved", ids[2]: "pending"}
+    stock, holds, ledger = plant_state(plant['id'])
+    assert (stock, holds) == (2, [])
+    assert sorted(entry['bill_id'] for entry in ledger if entry['reason'] == "sale") == sorted(ids[:2])
+
+
+def test_bulk_approve_skips_bills_that_are_no_longer_pending(api, admin, cashier, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=10)
+    ids = pending_bills(make_bill, cashier, plant, 2, 2)
+    api.put(f"/api/bills/{ids[0]}/approve", headers=admin)
+
+    response = api.post("/api/bills/bulk-status", headers=admin, json={"action": "approve", "bill_ids": ids})
+
+    assert outcomes(response) == {ids[0]: "not_pending", ids[1]: "approved"}
+    assert plant_state(plant['id'])[0] == 6
+
+
+def test_bulk_approve_settles_bill_by_bill_after_a_concurrent_sale(api, admin, cashier, make_plant, make_bill, plant_state, monkeypatch):
+    plant = make_plant(stock=10)
+    ids = pending_bills(make_bill, cashier, plant, 4, 4)
+    take_stock = server.take_stock
+    calls = []
+
+    async def racing_take_stock(quantities, hold, now):
+        # Another sale takes 3 units between the stock read and the batched decrement
+        if not calls:
+            await server.db.plants.update_one({"id": plant['id']}, {"$inc": {"current_stock": -3}})
+        calls.append(hold)
+        return await take_stock(quantities, hold, now)
+
+    monkeypatch.setattr(server, "take_stock", racing_take_stock)
+    response = api.post("/api/bills/bulk-status", headers=admin, json={"action": "approve", "bill_ids": ids})
+
+    assert len(calls) == 3
+    assert outcomes(response) == {ids[0]: "approved", ids[1]: "insufficient_stock"}
+    assert stored_statuses(api, ids) == {ids[0]: "approved", ids[1]: "pending"}
+    assert plant_state(plant['id'])[:2] == (3, [])
+
+
+def test_bulk_reject_leaves_stock_alone(api, admin, cashier, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=10)
+    ids = pending_bills(make_bill, cashier, plant, 3, 3)
+
+    response = api.post("/api/bills/bulk-status", headers=admin, json={"action": "reject", "bill_ids": ids})
+
+    assert outcomes(response) == {bill_id: "rejected" for bill_id in ids}
+    assert stored_statuses(api, ids) == {bill_id: "rejected" for bill_id in ids}
+    stock, _, ledger = plant_state(plant['id'])
+    assert stock == 10
+    assert [entry['reason'] for entry in ledger] == ["opening"]
+
+
+def test_rejected_bill_cannot_be_approved(api, admin, cashier, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=5)
+    bill = make_bill(cashier, (plant, 1)).json()
+    api.post("/api/bills/bulk-status", headers=admin, json={"action": "reject", "bill_ids": [bill['id']]})
+
+    response = api.put(f"/api/bills/{bill['id']}/approve", headers=admin)
+
+    assert response.status_code == 409
+    assert response.json()['detail'] == "Bill is rejected"
+    assert plant_state(plant['id'])[0] == 5
+
+
+def test_bulk_status_rejects_more_ids_than_the_limit(api, admin, cashier, make_plant, make_bill):
+    plant = make_plant(stock=10)
+    ids = pending_bills(make_bill, cashier, plant, 1, 1, 1)
+
+    response = api.post("/api/bills/bulk-status", headers=admin, json={"action": "approve", "bill_ids": ids, "limit": 2})
+
+    assert response.status_code == 400
+    assert set(stored_statuses(api, ids).values()) == {"pending"}
+
+
+def test_bulk_status_needs_ids_or_a_filter(api, admin):
+    response = api.post("/api/bills/bulk-status", headers=admin, json={"action": "approve"})
+
+    assert response.status_code == 400
+
+
+def test_bulk_status_is_admin_only(api, cashier):
+    response = api.post("/api/bills/bulk-status", headers=cashier, json={"action": "reject", "max_amount": 100})
+
+    assert response.status_code == 403
@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+def add_session(api, last_message_at, *message_times):
+    session_id = str(uuid.uuid4())
+    api.portal.call(server.db.chat_sessions.insert_one, {
+        "session_id": session_id, "title": "Watering", "message_count": len(message_times),
+        "started_at": min(message_times), "last_message_at": last_message_at,
+    })
+    for timestamp in message_times:
+        api.portal.call(server.db.chat_history.insert_one, server.ChatMessage(
+            session_id=session_id, user_message="How often?", ai_response="Weekly", timestamp=timestamp,
+        ).dict())
+    return session_id
+
+
+def stored(api, session_id):
+    session = api.portal.call(server.db.chat_sessions.find_one, {"session_id": session_id})
+    messages = api.portal.call(server.db.chat_history.count_documents, {"session_id": session_id})
+    return session, messages
+
+
+def test_idle_sessions_expire_with_their_history_and_active_ones_keep_theirs(api):
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=server.CHAT_SESSION_TTL_DAYS + 1)
+    idle = add_session(api, old, old - timedelta(days=1), old)
+    active = add_session(api, now, old, now)
+
+    expired = api.portal.call(server.expire_chat_sessions)
+
+    assert expired >= 1
+    assert stored(api, idle) == (None, 0)
+    session, messages = stored(api, active)
+    assert (session['message_count'], messages) == (2, 2)
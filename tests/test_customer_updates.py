@@ -0,0 +1,31 @@
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("field", ["name", "phone"])
+def test_required_customer_fields_cannot_be_cleared(api, admin, customer, field):
+    response = api.put(f"/api/customers/{customer['id']}", headers=admin, json={field: None})
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == f"Fields cannot be null: {field}"
+    stored = api.portal.call(server.db.customers.find_one, {"id": customer['id']})
+    assert (stored['name'], stored['phone']) == (customer['name'], customer['phone'])
+
+
+def test_optional_customer_fields_can_be_cleared(api, admin, customer):
+    api.put(f"/api/customers/{customer['id']}", headers=admin, json={"address": "12 Garden Road"})
+
+    response = api.put(f"/api/customers/{customer['id']}", headers=admin, json={"address": None})
+
+    assert response.status_code == 200
+    assert response.json()['address'] is None
+
+
+def test_customer_phone_change_updates_its_search_keys(api, admin, customer):
+    response = api.put(f"/api/customers/{customer['id']}", headers=admin, json={"phone": "+91 98450 12345"})
+
+    assert response.status_code == 200
+    stored = api.portal.call(server.db.customers.find_one, {"id": customer['id']})
+    assert stored['dedupe_key'] == "9845012345"
+    assert "9845012345" in stored['phone_keys']
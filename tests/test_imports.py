@@ -0,0 +1,80 @@
+import json
+import uuid
+
+import server
+
+PLANT_COLUMNS = "name,category,current_stock,min_stock_threshold,cost_price,selling_price,investment,location"
+
+
+def upload(api, headers, collection, filename, content):
+    response = api.post(f"/api/{collection}/import", headers=headers, files={"file": (filename, content.encode())})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def stored_plants(api, name):
+    return api.portal.call(lambda: server.db.plants.find({"name": name}).to_list(None))
+
+
+def test_import_counts_duplicate_rows_once_and_reports_invalid_rows(api, admin, plant_state):
+    name = f"Fern {uuid.uuid4().hex[:8]}"
+    content = "\n".join([
+        PLANT_COLUMNS,
+        f"{name},Ferns,5,1,2,10,0,Bench",
+        f"{name},Ferns,5,1,2,12,0,Bench",
+        ",Ferns,5,1,2,10,0,Bench",
+        f"{name} Two,Ferns,many,1,2,10,0,Bench",
+    ])
+
+    report = upload(api, admin, "plants", "plants.csv", content)
+
+    assert {key: report[key] for key in ("received", "inserted", "updated", "duplicates", "failed")} == {
+        "received": 4, "inserted": 1, "updated": 0, "duplicates": 1, "failed": 2,
+    }
+    assert [error['row'] for error in report['errors']] == [3, 4]
+    assert any(message.startswith("name") for message in report['errors'][0]['errors'])
+    assert any(message.startswith("current_stock") for message in report['errors'][1]['errors'])
+    [plant] = stored_plants(api, name)
+    # The last copy of a duplicated row wins
+    assert plant['selling_price'] == 12
+    assert [entry['quantity_change'] for entry in plant_state(plant['id'])[2]] == [5]
+
+
+def test_import_reports_unparseable_ndjson_lines(api, admin):
+    report = upload(api, admin, "plants", "plants.ndjson", '{"name": "broken"\n[1, 2]\n')
+
+    assert report['received'] == 2
+    assert report['errors'][0]['row'] == 1
+    assert report['errors'][0]['errors'][0].startswith("Invalid JSON")
+    assert report['errors'][1] == {"row": 2, "errors": ["Row must be an object"]}
+
+
+def test_reimport_updates_the_existing_plant_and_keeps_its_stock(api, admin, make_plant, plant_state):
+    plant = make_plant(stock=10)
+    row = {
+        "name": plant['name'].upper(), "category": "Test", "current_stock": 50, "min_stock_threshold": 0,
+        "cost_price": 1, "selling_price": 25, "investment": 0, "location": " bench ",
+    }
+
+    report = upload(api, admin, "plants", "plants.ndjson", json.dumps(row) + "\n")
+
+    assert (report['inserted'], report['updated'], report['errors']) == (0, 1, [])
+    stored = api.portal.call(server.db.plants.find_one, {"id": plant['id']})
+    assert (stored['selling_price'], stored['name']) == (25, row['name'])
+    stock, _, ledger = plant_state(plant['id'])
+    assert stock == 10
+    assert [entry['reason'] for entry in ledger] == ["opening"]
+
+
+def test_customer_import_matches_existing_customers_by_phone(api, admin, customer):
+    content = "\n".join([
+        "name,phone,address",
+        f"Renamed Customer,+91 {customer['phone'][:5]} {customer['phone'][5:]},Market Road",
+        f"New Customer,8{uuid.uuid4().int % 10**9:09d},",
+    ])
+
+    report = upload(api, admin, "customers", "customers.csv", content)
+
+    assert (report['inserted'], report['updated'], report['errors']) == (1, 1, [])
+    matches = api.portal.call(lambda: server.db.customers.find({"dedupe_key": customer['phone']}).to_list(None))
+    assert [(doc['id'], doc['name'], doc['address']) for doc in matches] == [(customer['id'], "Renamed Customer", "Market Road")]
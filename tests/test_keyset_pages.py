@@ -0,0 +1,48 @@
+import uuid
+from datetime import datetime, timedelta
+
+import server
+
+
+def test_keyset_pages_visit_every_document_once_across_shared_timestamps(api):
+    collection = server.db[f"pages_{uuid.uuid4().hex[:8]}"]
+    start = datetime(2026, 1, 1)
+    # Three documents per timestamp, so page boundaries fall inside groups
+    docs = [{"id": f"{index:03d}", "created_at": start + timedelta(minutes=index // 3)} for index in range(20)]
+    api.portal.call(collection.insert_many, [dict(doc) for doc in docs])
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = api.portal.call(server.keyset_page, collection, {}, cursor, 4)
+        seen.extend(doc['id'] for doc in page)
+        if cursor is None:
+            break
+
+    expected = sorted(docs, key=lambda doc: (doc['created_at'], doc['id']), reverse=True)
+    assert seen == [doc['id'] for doc in expected]
+
+
+def test_cursor_round_trips_to_the_position_after_the_document():
+    doc = {"id": "b", "created_at": datetime(2026, 3, 1, 12, 0)}
+
+    query = server.decode_cursor(server.encode_cursor(doc))
+
+    assert query == {"$or": [
+        {"created_at": {"$lt": doc['created_at']}},
+        {"created_at": doc['created_at'], "id": {"$lt": "b"}},
+    ]}
+    ascending = server.decode_cursor(server.encode_cursor(doc), ascending=True)
+    assert ascending["$or"][0] == {"created_at": {"$gt": doc['created_at']}}
+    assert ascending["$or"][1]["id"] == {"$gt": "b"}
+
+
+def test_list_endpoints_page_by_cursor_and_reject_bad_ones(api, admin, make_plant):
+    for _ in range(3):
+        make_plant(stock=1)
+
+    first = api.get("/api/plants", headers=admin, params={"cursor": "", "limit": 2}).json()
+    second = api.get("/api/plants", headers=admin, params={"cursor": first['next_cursor'], "limit": 2}).json()
+
+    assert len(first['items']) == 2 and first['next_cursor']
+    assert not {plant['id'] for plant in first['items']} & {plant['id'] for plant in second['items']}
+    assert api.get("/api/plants", headers=admin, params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,37 @@
+def test_bill_lines_are_priced_from_the_plant(api, admin, customer, make_plant):
+    plant = make_plant(stock=10, selling_price=12.5)
+
+    response = api.post("/api/bills", headers=admin, json={
+        "customer_id": customer['id'],
+        "items": [{"plant_id": plant['id'], "variant": "Large", "quantity": 3}],
+        "tax": 2, "payment_method": "cash",
+    })
+
+    assert response.status_code == 200
+    bill = response.json()
+    assert bill['items'] == [{
+        "plant_id": plant['id'], "plant_name": plant['name'], "variant": "Large",
+        "quantity": 3, "unit_price": 12.5, "total_price": 37.5,
+    }]
+    assert (bill['subtotal'], bill['total_amount']) == (37.5, 39.5)
+
+
+def test_client_prices_on_quotation_lines_are_ignored(api, admin, customer, make_plant):
+    plant = make_plant(stock=10, selling_price=8)
+
+    response = api.post("/api/quotations", headers=admin, json={
+        "customer_id": customer['id'],
+        "items": [{"plant_id": plant['id'], "quantity": 2, "plant_name": "Free plant", "unit_price": 0, "total_price": 0}],
+    })
+
+    assert response.status_code == 200
+    line = response.json()['items'][0]
+    assert (line['plant_name'], line['unit_price'], line['total_price']) == (plant['name'], 8, 16)
+
+
+def test_unknown_plant_returns_404(api, admin, customer):
+    response = api.post("/api/bills", headers=admin, json={
+        "customer_id": customer['id'], "items": [{"plant_id": "missing", "quantity": 1}], "payment_method": "cash",
+    })
+
+    assert response.status_code == 404
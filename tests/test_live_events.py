@@ -0,0 +1,47 @@
+import json
+
+import server
+
+
+def sse_events(api, queue):
+    def drain():
+        payloads = []
+        while not queue.empty():
+            payloads.append(queue.get_nowait())
+        return payloads
+    events = []
+    for payload in api.portal.call(drain):
+        event, data = payload.decode().strip().split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_bus_source_reaches_subscribers_through_the_invalidation_bus(api, admin, make_plant, make_bill, monkeypatch):
+    hub = server.LiveEventHub("bus")
+    monkeypatch.setattr(server, "live_events", hub)
+    monkeypatch.setitem(server.cache_bus.handlers, "live", [])
+    api.portal.call(hub.start)
+    queue = hub.subscribe()
+    plant = make_plant(stock=10)
+    before = api.get("/api/analytics/dashboard", headers=admin).json()
+
+    bill = make_bill(admin, (plant, 2)).json()
+
+    events = dict(sse_events(api, queue))
+    assert events["bill_created"]['id'] == bill['id']
+    assert events["stock_changed"]['current_stock'] == 8
+    assert events["sales_total"] == {
+        "total_sales": before['total_sales'] + bill['total_amount'],
+        "sales_version": before['sales_version'] + 1,
+    }
+
+
+def test_bus_reconnect_sends_subscribers_a_resync(api, monkeypatch):
+    hub = server.LiveEventHub("bus")
+    monkeypatch.setitem(server.cache_bus.handlers, "live", [])
+    api.portal.call(hub.start)
+    queue = hub.subscribe()
+
+    server.cache_bus.deliver_all()
+
+    assert sse_events(api, queue) == [("resync", {})]
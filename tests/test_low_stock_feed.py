@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+def read_feed(api, headers, since, limit):
+    """Plant ids the feed returns, polling with next_cursor until a page comes back empty, and that cursor"""
+    seen, params = [], {"since": since.isoformat(), "limit": limit}
+    while True:
+        page = api.get("/api/plants/low-stock/feed", headers=headers, params=params).json()
+        if not page['plants']:
+            return seen, page['next_cursor']
+        seen.extend(plant['id'] for plant in page['plants'])
+        params = {"cursor": page['next_cursor'], "limit": limit}
+
+
+def test_feed_cursor_returns_every_plant_marked_low_by_one_bill(api, admin, make_plant, make_bill):
+    plants = [make_plant(stock=2) for _ in range(3)]
+    since = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    assert make_bill(admin, *((plant, 2) for plant in plants)).status_code == 200
+
+    marked = {plant['id']: api.portal.call(server.db.plants.find_one, {"id": plant['id']})['low_stock_since'] for plant in plants}
+    assert len(set(marked.values())) == 1
+    seen, _ = read_feed(api, admin, since, limit=1)
+    assert len(seen) == len(set(seen))
+    assert set(marked) <= set(seen)
+
+
+def test_polling_with_the_last_cursor_returns_only_plants_that_went_low_since(api, admin, make_plant, make_bill):
+    plant = make_plant(stock=1)
+    since = datetime.now(timezone.utc) - timedelta(seconds=1)
+    make_bill(admin, (plant, 1))
+    seen, cursor = read_feed(api, admin, since, limit=5)
+
+    later = make_plant(stock=1)
+    make_bill(admin, (later, 1))
+    page = api.get("/api/plants/low-stock/feed", headers=admin, params={"cursor": cursor}).json()
+
+    assert plant['id'] in seen
+    assert [low['id'] for low in page['plants']] == [later['id']]
+
+
+def test_feed_needs_since_or_cursor(api, admin):
+    response = api.get("/api/plants/low-stock/feed", headers=admin)
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == "Pass since or cursor"
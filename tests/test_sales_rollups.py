@@ -0,0 +1,54 @@
+import server
+
+
+def backfill_state(api):
+    return api.portal.call(server.db.backfill_state.find_one, {"_id": server.SALES_BACKFILL_ID})
+
+
+def test_rerun_rewrites_rollups_in_place_and_only_restart_empties_them(api):
+    sentinel = {"_id": "2000-01-01|all|all", "date": "2000-01-01", "dimension": "all", "key": "all", "revenue": 1}
+    api.portal.call(server.db.sales_daily.insert_one, sentinel)
+
+    state = api.portal.call(server.backfill_sales_rollups)
+
+    assert state['status'] == "done"
+    assert api.portal.call(server.db.sales_daily.find_one, {"_id": sentinel['_id']}) is not None
+
+    api.portal.call(server.backfill_sales_rollups, True)
+
+    assert api.portal.call(server.db.sales_daily.find_one, {"_id": sentinel['_id']}) is None
+
+
+def test_startup_resumes_a_backfill_left_running(api, admin, make_plant, make_bill):
+    make_bill(admin, (make_plant(stock=5), 1))
+    api.portal.call(server.db.backfill_state.update_one, {"_id": server.SALES_BACKFILL_ID}, {"$set": {
+        "status": "running", "next_month": None, "months": 0, "bills": 0, "run_id": "crashed",
+    }})
+
+    async def seed_and_wait():
+        await server.seed_sales_rollups()
+        return await server.sales_backfill_task
+
+    state = api.portal.call(seed_and_wait)
+
+    assert state['status'] == "done"
+    stored = backfill_state(api)
+    assert (stored['status'], stored['months']) == ("done", state['months'])
+    assert stored['run_id'] != "crashed"
+
+
+def test_a_superseded_run_stops_without_marking_the_backfill_done(api, admin, make_plant, make_bill, monkeypatch):
+    make_bill(admin, (make_plant(stock=5), 1))
+    lookup_plants = server.lookup_plants
+
+    async def taken_over(plant_ids):
+        # Another worker claims the backfill while this one rebuilds its first month
+        await server.db.backfill_state.update_one({"_id": server.SALES_BACKFILL_ID}, {"$set": {"run_id": "newer"}})
+        return await lookup_plants(plant_ids)
+
+    monkeypatch.setattr(server, "lookup_plants", taken_over)
+    state = api.portal.call(server.backfill_sales_rollups)
+
+    assert state['status'] == "running"
+    stored = backfill_state(api)
+    assert (stored['status'], stored['run_id']) == ("running", "newer")
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+
+def plant_sales(api, plant_id):
+    return api.portal.call(server.db.plants.find_one, {"id": plant_id}).get("sales", {})
+
+
+def velocity_claim(api):
+    return api.portal.call(server.db.backfill_state.find_one, {"_id": server.SALES_VELOCITY_ID})
+
+
+def test_refresh_sets_rolling_windows_from_the_daily_rollups(api, admin, make_plant, make_bill):
+    plant = make_plant(stock=10, selling_price=4.0)
+    make_bill(admin, (plant, 3))
+
+    assert api.portal.call(server.refresh_sales_velocity, True) is True
+
+    sales = plant_sales(api, plant['id'])
+    assert (sales['units_7d'], sales['units_30d'], sales['units']) == (3, 3, 3)
+    assert (sales['revenue_7d'], sales['revenue_30d']) == (12, 12)
+    velocity = api.get(f"/api/plants/{plant['id']}/velocity", headers=admin).json()
+    assert velocity['sales']['units_30d'] == 3
+
+
+def test_refresh_zeroes_plants_whose_sales_left_the_window(api, make_plant):
+    plant = make_plant(stock=10)
+    old_day = server.rollup_day(datetime.now(timezone.utc) - timedelta(days=40))
+    api.portal.call(server.db.sales_daily.insert_one, {
+        "_id": f"{old_day}|plant|{plant['id']}", "date": old_day, "dimension": "plant", "key": plant['id'], "units": 5, "revenue": 50,
+    })
+    api.portal.call(server.db.plants.update_one, {"id": plant['id']}, {"$set": {"sales.units_30d": 5, "sales.revenue_30d": 50}})
+
+    api.portal.call(server.refresh_sales_velocity, True)
+
+    sales = plant_sales(api, plant['id'])
+    assert (sales['units_30d'], sales['revenue_30d'], sales['units_7d']) == (0, 0, 0)
+
+
+def test_refresh_runs_once_a_day_unless_forced(api, monkeypatch):
+    calls = []
+
+    async def counting_apply():
+        calls.append(True)
+
+    monkeypatch.setattr(server, "apply_sales_velocity", counting_apply)
+
+    assert api.portal.call(server.refresh_sales_velocity, True) is True
+    assert api.portal.call(server.refresh_sales_velocity) is False
+    assert api.portal.call(server.refresh_sales_velocity, True) is True
+    assert len(calls) == 2
+    assert velocity_claim(api)['day'] == server.rollup_day(datetime.now(timezone.utc))
+
+
+def test_failed_refresh_releases_the_day_for_the_next_check(api, monkeypatch):
+    async def failing_apply():
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(server, "apply_sales_velocity", failing_apply)
+    with pytest.raises(RuntimeError):
+        api.portal.call(server.refresh_sales_velocity, True)
+
+    assert "day" not in velocity_claim(api)
+    monkeypatch.undo()
+    assert api.portal.call(server.refresh_sales_velocity) is True
@@ -0,0 +1,31 @@
+import uuid
+
+
+def test_exact_match_ranks_first_however_many_prefix_matches_precede_it(api, admin):
+    token = f"zq{uuid.uuid4().hex[:8]}"
+    for index in range(55):
+        api.post("/api/plants", headers=admin, json={
+            "name": f"{token}ia {index}", "category": "Test", "current_stock": 1,
+            "min_stock_threshold": 0, "cost_price": 1, "selling_price": 1, "investment": 0, "location": "Bench",
+        })
+    api.post("/api/plants", headers=admin, json={
+        "name": token, "category": "Test", "current_stock": 1,
+        "min_stock_threshold": 0, "cost_price": 1, "selling_price": 1, "investment": 0, "location": "Bench",
+    })
+
+    results = api.get("/api/search", headers=admin, params={"q": token.upper(), "types": "plants", "limit": 5}).json()
+
+    names = [plant['name'] for plant in results['plants']]
+    assert names[0] == token
+    assert len(names) == 5
+    assert all(name.startswith(token) for name in names)
+
+
+def test_customer_phone_search_prefers_the_exact_number(api, admin):
+    phone = f"7{uuid.uuid4().int % 10**9:09d}"
+    longer = api.post("/api/customers", headers=admin, json={"name": "Longer", "phone": f"{phone}1"}).json()
+    exact = api.post("/api/customers", headers=admin, json={"name": "Exact", "phone": phone}).json()
+
+    results = api.get("/api/customers/search", headers=admin, params={"q": phone}).json()
+
+    assert [customer['id'] for customer in results] == [exact['id'], longer['id']]
@@ -0,0 +1,43 @@
+import asyncio
+import uuid
+
+import server
+
+
+def allocate(api, allocator, count):
+    async def run():
+        return await asyncio.gather(*(allocator.next() for _ in range(count)))
+    return api.portal.call(run)
+
+
+def test_workers_draw_disjoint_blocks_from_one_counter(api):
+    name = f"test-{uuid.uuid4().hex}"
+    first, second = server.SequenceAllocator(name, block_size=5), server.SequenceAllocator(name, block_size=5)
+
+    numbers = allocate(api, first, 3) + allocate(api, second, 3) + allocate(api, first, 4)
+
+    assert sorted(numbers) == sorted(set(numbers))
+    assert numbers[:3] == [1, 2, 3]
+    assert numbers[3:6] == [6, 7, 8]
+    # The first block runs out after 5, so the next one starts past the second worker's block
+    assert numbers[6:] == [4, 5, 11, 12]
+    assert api.portal.call(server.db.counters.find_one, {"_id": name})['seq'] == 15
+
+
+def test_seed_continues_after_existing_numbers_and_never_goes_back(api):
+    name = f"test-{uuid.uuid4().hex}"
+    allocator = server.SequenceAllocator(name, block_size=10)
+
+    api.portal.call(allocator.seed, 41)
+    api.portal.call(allocator.seed, 7)
+
+    assert allocate(api, allocator, 2) == [42, 43]
+
+
+def test_bills_get_distinct_numbers(api, admin, make_plant, make_bill):
+    plant = make_plant(stock=100)
+
+    numbers = [make_bill(admin, (plant, 1)).json()['bill_number'] for _ in range(12)]
+
+    assert len(set(numbers)) == 12
+    assert all(number.startswith("SKN-") for number in numbers)
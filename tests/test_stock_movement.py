@@ -0,0 +1,154 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+
+def test_oversell_returns_409_and_moves_nothing(api, admin, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=3)
+
+    response = make_bill(admin, (plant, 5))
+
+    assert response.status_code == 409
+    assert "Insufficient stock" in response.json()['detail']
+    stock, holds, ledger = plant_state(plant['id'])
+    assert (stock, holds) == (3, [])
+    assert [entry['reason'] for entry in ledger] == ["opening"]
+
+
+def test_partial_shortage_rolls_back_every_line(api, admin, make_plant, make_bill, plant_state):
+    plenty, scarce = make_plant(stock=10), make_plant(stock=1)
+
+    response = make_bill(admin, (plenty, 4), (scarce, 2))
+
+    assert response.status_code == 409
+    assert plant_state(plenty['id'])[:2] == (10, [])
+    assert plant_state(scarce['id'])[:2] == (1, [])
+
+
+def test_take_stock_returns_false_and_restores_held_plants(api, make_plant, plant_state):
+    plenty, scarce = make_plant(stock=10), make_plant(stock=1)
+    now = datetime.now(timezone.utc)
+
+    taken = api.portal.call(server.take_stock, {plenty['id']: 4, scarce['id']: 2}, "test-hold", now)
+
+    assert taken is False
+    assert plant_state(plenty['id'])[:2] == (10, [])
+    assert plant_state(scarce['id'])[:2] == (1, [])
+
+
+def test_take_stock_decrements_and_clears_holds(api, make_plant, plant_state):
+    plant = make_plant(stock=10)
+
+    taken = api.portal.call(server.take_stock, {plant['id']: 4}, "test-hold", datetime.now(timezone.utc))
+
+    assert taken is True
+    assert plant_state(plant['id'])[:2] == (6, [])
+
+
+def test_admin_bill_moves_stock_and_writes_ledger(api, admin, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=10)
+
+    response = make_bill(admin, (plant, 4), (plant, 1))
+
+    assert response.status_code == 200
+    assert response.json()['status'] == "approved"
+    stock, holds, ledger = plant_state(plant['id'])
+    assert (stock, holds) == (5, [])
+    assert sorted(entry['quantity_change'] for entry in ledger) == [-5, 10]
+
+
+def test_double_approval_moves_stock_once(api, admin, cashier, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=10)
+    bill = make_bill(cashier, (plant, 3)).json()
+    assert bill['status'] == "pending"
+    assert plant_state(plant['id'])[0] == 10
+
+    first = api.put(f"/api/bills/{bill['id']}/approve", headers=admin)
+    second = api.put(f"/api/bills/{bill['id']}/approve", headers=admin)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json()['message'] == "Bill already approved"
+    stock, _, ledger = plant_state(plant['id'])
+    assert stock == 7
+    assert [entry['quantity_change'] for entry in ledger if entry['reason'] == "sale"] == [-3]
+
+
+def test_approval_without_stock_returns_409_and_keeps_bill_pending(api, admin, cashier, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=5)
+    bill = make_bill(cashier, (plant, 4)).json()
+    assert make_bill(admin, (plant, 3)).status_code == 200
+
+    response = api.put(f"/api/bills/{bill['id']}/approve", headers=admin)
+
+    assert response.status_code == 409
+    stored = api.portal.call(server.db.bills.find_one, {"id": bill['id']})
+    assert (stored['status'], stored['approved_by']) == ("pending", None)
+    assert plant_state(plant['id'])[:2] == (2, [])
+
+
+def test_ledger_rebuild_restores_drifted_stock(api, admin, make_plant, make_bill, plant_state):
+    plant = make_plant(stock=10)
+    make_bill(admin, (plant, 4))
+    api.portal.call(server.db.plants.update_one, {"id": plant['id']}, {"$set": {"current_stock": 99}})
+
+    report = api.get("/api/admin/stock/verify", headers=admin, params={"plant_id": plant['id']}).json()
+    assert report['drift'] == [{"plant_id": plant['id'], "name": plant['name'], "current_stock": 99, "ledger_stock": 6}]
+
+    api.get("/api/admin/stock/verify", headers=admin, params={"plant_id": plant['id'], "rebuild": True})
+
+    assert plant_state(plant['id'])[0] == 6
+    repeat = api.get("/api/admin/stock/verify", headers=admin, params={"plant_id": plant['id']}).json()
+    assert repeat['drift'] == []
+
+
+def test_plants_without_an_opening_entry_are_seeded_before_any_rebuild(api, admin, make_plant, plant_state):
+    plant = make_plant(stock=100)
+    # A plant from before the ledger: its only entry is the adjustment made since
+    api.portal.call(server.db.stock_ledger.delete_many, {"plant_id": plant['id']})
+    api.put(f"/api/plants/{plant['id']}", headers=admin, json={"current_stock": 90})
+
+    report = api.get("/api/admin/stock/verify", headers=admin, params={"plant_id": plant['id'], "rebuild": True}).json()
+
+    assert (report['drift'], report['unseeded']) == ([], [plant['id']])
+    assert plant_state(plant['id'])[0] == 90
+
+    api.portal.call(server.seed_opening_ledger, True)
+
+    stock, _, ledger = plant_state(plant['id'])
+    assert stock == 90
+    assert sorted((entry['reason'], entry['quantity_change']) for entry in ledger) == [("adjustment", -10), ("opening", 100)]
+    report = api.get("/api/admin/stock/verify", headers=admin, params={"plant_id": plant['id']}).json()
+    assert (report['drift'], report['unseeded']) == ([], [])
+
+
+def test_failed_ledger_write_returns_stock_and_drops_the_admin_bill(api, admin, make_plant, make_bill, plant_state, monkeypatch):
+    plant = make_plant(stock=10)
+
+    def failing_ledger(*args):
+        raise RuntimeError("ledger unavailable")
+
+    monkeypatch.setattr(server, "sale_ledger_entries", failing_ledger)
+    with pytest.raises(RuntimeError):
+        make_bill(admin, (plant, 4))
+
+    assert plant_state(plant['id'])[:2] == (10, [])
+    assert api.portal.call(server.db.bills.count_documents, {"items.plant_id": plant['id']}) == 0
+
+
+def test_failed_approval_puts_the_bill_back_to_pending(api, admin, cashier, make_plant, make_bill, plant_state, monkeypatch):
+    plant = make_plant(stock=10)
+    bill = make_bill(cashier, (plant, 4)).json()
+
+    async def failing_movement(bill, user_id):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(server, "apply_bill_stock_movement", failing_movement)
+    with pytest.raises(RuntimeError):
+        api.put(f"/api/bills/{bill['id']}/approve", headers=admin)
+
+    stored = api.portal.call(server.db.bills.find_one, {"id": bill['id']})
+    assert (stored['status'], stored['approved_by']) == ("pending", None)
+    assert plant_state(plant['id'])[0] == 10